@@ -1,40 +1,130 @@
-from fastapi import FastAPI, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from typing import List, Optional
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel
-from arcadepy import Arcade
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, ValidationError
 from dotenv import load_dotenv
 import uvicorn
 import os
+import time
 import uuid
+import json
 import logging
 
-logging.basicConfig(level=logging.DEBUG)
+load_dotenv()
+logging.basicConfig(level=os.getenv("FACTORY_LOG_LEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
 from factory.builder import WorkflowConfig
 from factory.runner import WorkflowRunner
+from factory.scheduler import WorkflowScheduler, QueueFullError
+from factory.tool_cache import tool_cache
+from factory.result_cache import result_cache
+from factory.clients import arcade_clients, openai_clients
+from factory.mcp_pool import mcp_pool
+from factory.workflow_cache import workflow_cache, workflow_config_hash
+from factory.events import run_events
+from factory.run_store import RunRecord, create_run_store
+from factory.job_queue import SQLiteJobQueue
+from factory.trace_stream import trace_exporter_stats, shutdown_trace_exporter
+from factory.metrics import metrics
+from factory.rate_limit import rate_limiter
+from factory.batch import FACTORY_BATCH_CONCURRENCY, FACTORY_BATCH_MAX_ITEMS, BatchItem, WorkflowBatch, batches
 
 # Authentication configuration
 load_dotenv()
 BEARER_TOKEN = os.getenv("FACTORY_BEARER_TOKEN", "bearer-token-2024")
 
+# Seconds between keep-alives on idle event streams
+STREAM_KEEPALIVE_SECONDS = float(os.getenv("FACTORY_STREAM_KEEPALIVE", "15"))
+
+# Deployment mode: "local" runs workflows in this process, "distributed" only enqueues them
+# to the shared job queue served by `python -m factory.worker` processes
+FACTORY_MODE = os.getenv("FACTORY_MODE", "local")
+DISTRIBUTED = FACTORY_MODE == "distributed"
+
+# Workflow scheduler: bounded job queue served by a small pool of event loops
+scheduler = WorkflowScheduler()
+scheduler.add_shutdown_hook(arcade_clients.aclose_current)
+scheduler.add_shutdown_hook(openai_clients.aclose_current)
+scheduler.add_shutdown_hook(mcp_pool.close_current)
+
+# Shared job queue of the distributed mode
+job_queue = SQLiteJobQueue() if DISTRIBUTED else None
+
+# Status, timings and results of submitted runs (RUN_STORE=memory|sqlite), shared with the
+# workers in distributed mode
+run_store = create_run_store(os.getenv("RUN_STORE", "sqlite") if DISTRIBUTED else None)
+
+
+def _collect_metrics():
+    """Scheduler and result cache values for /metrics"""
+    if job_queue is not None:
+        queue = job_queue.stats()
+        yield "factory_queue_depth", "gauge", "Queued workflow runs", [({}, queue["queue_depth"])]
+        yield "factory_runs_claimed", "gauge", "Workflow runs claimed by workers", [({}, queue["claimed"])]
+    else:
+        stats = scheduler.stats()
+        yield "factory_queue_depth", "gauge", "Queued workflow runs", [({}, stats["queue_depth"])]
+        yield "factory_runs_running", "gauge", "Workflow runs executing", [({}, stats["running"])]
+        yield "factory_runs_total", "counter", "Workflow runs by outcome", [
+            ({"outcome": outcome}, stats[outcome]) for outcome in ("submitted", "rejected", "completed", "failed", "cancelled")
+        ]
+    yield "factory_batches_running", "gauge", "Workflow batches dispatching runs", [({}, batches.stats()["running"])]
+    cache = result_cache.stats()
+    yield "factory_result_cache_lookups_total", "counter", "Tool and delegation result cache lookups", [
+        ({"result": "hit"}, cache["hits"]), ({"result": "miss"}, cache["misses"]),
+    ]
+
+metrics.add_collector(_collect_metrics)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pooled Arcade client for the API loop, worker loops create theirs on first use
+    arcade_clients.async_client()
+    if not DISTRIBUTED:
+        scheduler.start()
+    yield
+    await batches.aclose()
+    scheduler.stop()
+    await arcade_clients.aclose_current()
+    shutdown_trace_exporter()
+    if job_queue is not None:
+        job_queue.close()
+    run_store.close()
+
 # FastAPI app
 app = FastAPI(
     title="Factory API", 
-    description="API for creating and deploying AI agent workflows with Bearer token authentication"
+    description="API for creating and deploying AI agent workflows with Bearer token authentication",
+    lifespan=lifespan
 )
 
 # Security scheme
 security = HTTPBearer()
 
-# Track running workflows
-running_workflows = {}
-
 class RunWorkflowRequest(BaseModel):
     workflow_config: WorkflowConfig
     user_id: str
     user_task: str
+    # Graph workflows: reuse the completed nodes of an earlier run, only failed nodes run again
+    resume_from: Optional[str] = None
+    # Keep a timeline of every span of the run, served by /workflow/profile/{trace_id}
+    profile: bool = False
+    # Cancel the run when it has not finished this many seconds after it started
+    deadline_seconds: Optional[float] = None
+
+class BatchWorkflowOptions(BaseModel):
+    workflow_config: WorkflowConfig
+    user_id: str
+    # Runs of the batch queued or running at a time (FACTORY_BATCH_CONCURRENCY by default)
+    max_concurrency: Optional[int] = None
+    profile: bool = False
+    deadline_seconds: Optional[float] = None
+
+class RunWorkflowBatchRequest(BatchWorkflowOptions):
+    user_tasks: List[str]
 
 class RunWorkflowResponse(BaseModel):
     success: bool
@@ -62,44 +152,438 @@ async def verify_workflow(workflow_config: WorkflowConfig, token: str = Depends(
 @app.post("/run/workflow/local", response_model=RunWorkflowResponse)
 async def run_workflow(run_workflow_request: RunWorkflowRequest, token: str = Depends(verify_token)):
     """Deploy a workflow with the specified settings"""
-    global running_workflows
     trace_id = str(uuid.uuid4())
 
     logger.info(f"run_workflow_request: {run_workflow_request}")
 
+    resume_nodes = resumable_nodes(run_workflow_request)
+    try:
+        submit_run(run_workflow_request, trace_id, resume_nodes)
+    except QueueFullError as e:
+        logger.warning(f"Workflow {trace_id} rejected: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": "5"},
+        )
+    return JSONResponse(content={"success": True, "trace_id": trace_id})
+
+def resumable_nodes(run_workflow_request: RunWorkflowRequest) -> Optional[dict]:
+    """
+    Node results of the run to resume, which must belong to the same user and have run the same
+    workflow_config and user_task: its node results would not be valid for anything else
+    """
+    if not run_workflow_request.resume_from:
+        return None
+    previous = run_store.get(run_workflow_request.resume_from)
+    if previous is None or previous.user_id != run_workflow_request.user_id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Run to resume not found")
+    if not previous.finished:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Run to resume has not finished")
+    if previous.config_hash != workflow_config_hash(run_workflow_request.workflow_config.model_dump()):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Run to resume used a different workflow_config")
+    if previous.user_task != run_workflow_request.user_task:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Run to resume used a different user_task")
+    return previous.nodes
+
+def submit_run(run_workflow_request: RunWorkflowRequest, trace_id: str, resume_nodes: Optional[dict] = None) -> None:
+    """Queue a run on the local scheduler, or for the workers; raises QueueFullError when it is rejected"""
+    if job_queue is not None:
+        enqueue_workflow(run_workflow_request, trace_id, resume_nodes)
+        return
+
     runner = WorkflowRunner(
         workflow_config=run_workflow_request.workflow_config,
         user_id=run_workflow_request.user_id,
         user_task=run_workflow_request.user_task,
-        trace_id=trace_id
+        trace_id=trace_id,
+        run_store=run_store,
+        resume_nodes=resume_nodes,
+        profile=run_workflow_request.profile,
+        deadline_seconds=run_workflow_request.deadline_seconds,
     )
-    logger.info(f"-------Workflow Runner Started-------")
-    runner.start()
-    running_workflows[trace_id] = runner
-    logger.info(f"-------Workflow Runner Added to Running Workflows-------")
-    return JSONResponse(content={"success": True, "trace_id": trace_id})
+    runner.events.publish("run.queued", user_id=runner.user_id)
+    try:
+        scheduler.submit(runner)
+    except QueueFullError:
+        run_events.discard(trace_id)
+        run_store.delete(trace_id)
+        raise
+    logger.info(f"-------Workflow Runner Queued-------")
+
+def enqueue_workflow(run_workflow_request: RunWorkflowRequest, trace_id: str, resume_nodes: Optional[dict] = None) -> None:
+    """Hand a run to the worker processes through the shared job queue"""
+    run_store.put(RunRecord(
+        trace_id=trace_id,
+        user_id=run_workflow_request.user_id,
+        config_hash=workflow_config_hash(run_workflow_request.workflow_config.model_dump()),
+        user_task=run_workflow_request.user_task,
+    ))
+    try:
+        job_queue.put(trace_id, run_workflow_request.user_id, {
+            "workflow_config": run_workflow_request.workflow_config.model_dump(mode="json"),
+            "user_task": run_workflow_request.user_task,
+            "resume_nodes": resume_nodes,
+            "profile": run_workflow_request.profile,
+            "deadline_seconds": run_workflow_request.deadline_seconds,
+        })
+    except QueueFullError:
+        run_store.delete(trace_id)
+        raise
+    logger.info(f"-------Workflow Queued for Workers-------")
+
+def cancel_run(trace_id: str) -> Optional[str]:
+    """Cancel a queued or running run: "cancelled", "cancelling", or None when it already finished"""
+    if job_queue is not None:
+        outcome = job_queue.cancel(trace_id)
+        if outcome == "cancelled":
+            # Nobody claimed the job yet, finish its record here
+            run_store.update(trace_id, status="cancelled", result="Workflow cancelled", finished_at=time.time())
+            return "cancelled"
+        return "cancelling" if outcome == "requested" else None
+    if not scheduler.cancel(trace_id):
+        return None
+    record = run_store.get(trace_id)
+    return record.status if record is not None and record.finished else "cancelling"
+
+def start_batch(options: BatchWorkflowOptions) -> WorkflowBatch:
+    """Create a batch running its items against `options.workflow_config` and start its dispatcher"""
+    def submit(item: BatchItem) -> None:
+        # The config was validated once for the whole batch
+        submit_run(RunWorkflowRequest.model_construct(
+            workflow_config=options.workflow_config,
+            user_id=options.user_id,
+            user_task=item.user_task,
+            resume_from=None,
+            profile=options.profile,
+            deadline_seconds=options.deadline_seconds,
+        ), item.trace_id)
+
+    batch = WorkflowBatch(
+        user_id=options.user_id,
+        submit=submit,
+        run_store=run_store,
+        max_concurrency=options.max_concurrency or FACTORY_BATCH_CONCURRENCY,
+    )
+    batches.start(batch)
+    return batch
+
+def require_local_batches():
+    """Batches live in the API process that accepted them, so they are refused in distributed mode"""
+    if DISTRIBUTED:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Batches are only available in local mode, submit the runs one by one to /run/workflow/local",
+        )
+
+@app.post("/run/workflow/batch")
+async def run_workflow_batch(batch_request: RunWorkflowBatchRequest, token: str = Depends(verify_token)):
+    """Run many user_tasks against one workflow config, at most max_concurrency at a time"""
+    require_local_batches()
+    if not batch_request.user_tasks:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="user_tasks is empty")
+    if len(batch_request.user_tasks) > FACTORY_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Batch has more than {FACTORY_BATCH_MAX_ITEMS} items")
+
+    batch = start_batch(batch_request)
+    for user_task in batch_request.user_tasks:
+        batch.add(user_task)
+    batch.close()
+    logger.info(f"Batch {batch.batch_id} accepted with {len(batch.items)} items")
+    return JSONResponse(content={"success": True, "batch_id": batch.batch_id, "total": len(batch.items)})
+
+@app.post("/run/workflow/batch/jsonl")
+async def run_workflow_batch_jsonl(request: Request, token: str = Depends(verify_token)):
+    """
+    Streamed variant of /run/workflow/batch for large batches, as JSON lines.
+
+    The first line holds the batch options (workflow_config, user_id, max_concurrency, profile,
+    deadline_seconds), every following line one item: a JSON string or {"user_task": ...}.
+    Items start running while the upload is still in progress.
+    """
+    require_local_batches()
+    batch = None
+    line_number = 0
+    buffer = b""
+    try:
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                line_number += 1
+                batch = _batch_line(batch, line)
+        line_number += 1
+        batch = _batch_line(batch, buffer)
+    except (ValueError, ValidationError) as e:
+        if batch is not None:
+            batch.cancel(cancel_run)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Line {line_number}: {e}")
+    except BaseException:
+        # Client disconnected or the upload broke off: stop the items already started, otherwise
+        # the batch never closes and its dispatcher polls forever
+        if batch is not None:
+            batch.cancel(cancel_run)
+        raise
+
+    if batch is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing batch options line")
+    batch.close()
+    logger.info(f"Batch {batch.batch_id} accepted with {len(batch.items)} items")
+    return JSONResponse(content={"success": True, "batch_id": batch.batch_id, "total": len(batch.items)})
+
+def _batch_line(batch: Optional[WorkflowBatch], line: bytes) -> Optional[WorkflowBatch]:
+    """Apply one line of a JSONL batch upload, the first one creates the batch"""
+    line = line.strip()
+    if not line:
+        return batch
+    if batch is None:
+        return start_batch(BatchWorkflowOptions.model_validate_json(line))
+    item = json.loads(line)
+    if isinstance(item, dict):
+        item = item.get("user_task")
+    if not isinstance(item, str):
+        raise ValueError("expected a user_task string")
+    batch.add(item)
+    return batch
+
+@app.get("/workflow/batch/{batch_id}")
+async def get_workflow_batch(batch_id: str, offset: int = 0, limit: int = 100, results: bool = False, token: str = Depends(verify_token)):
+    """Progress of a batch: item counts per status and a page of items, with their results if asked"""
+    require_local_batches()
+    batch = batches.get(batch_id)
+    if batch is None:
+        return JSONResponse(content={"success": False, "batch_id": batch_id, "status": "not_found"})
+    progress = batch.progress(offset=max(offset, 0), limit=min(max(limit, 0), 1000), include_results=results)
+    return JSONResponse(content={"success": True, **progress})
+
+@app.delete("/workflow/batch/{batch_id}")
+async def cancel_workflow_batch(batch_id: str, token: str = Depends(verify_token)):
+    """Cancel a batch: items not started yet are dropped, running ones are cancelled"""
+    require_local_batches()
+    batch = batches.get(batch_id)
+    if batch is None:
+        return JSONResponse(content={"success": False, "batch_id": batch_id, "status": "not_found"})
+    if batch.finished_at is not None:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"success": False, "batch_id": batch_id, "status": batch.status},
+        )
+    batch.cancel(cancel_run)
+    return JSONResponse(content={"success": True, "batch_id": batch_id, "status": "cancelling"})
 
 @app.get("/workflow/status/{trace_id}")
 async def get_workflow_status(trace_id: str):
     """Get the status of a workflow"""
-    if trace_id not in running_workflows:
+    record = run_store.get(trace_id)
+    if record is None:
         return JSONResponse(content={"success": False, "trace_id": trace_id, "status": "not_found"})
-    return JSONResponse(content={"success": True, "trace_id": trace_id, "status": running_workflows[trace_id].status})
+    return JSONResponse(content={"success": True, "trace_id": trace_id, "status": record.status})
 
 @app.get("/workflow/result/{trace_id}")
 async def get_workflow_result(trace_id: str):
-    """Get the result of a workflow"""
+    """Get the result of a workflow; results stay available until they expire (RUN_STORE_TTL)"""
+    record = run_store.get(trace_id)
+    if record is None:
+        return JSONResponse(content={"success": False, "trace_id": trace_id, "status": "not_found"})
+
+    if record.status in ['pending', 'running']:
+        return JSONResponse(content={"success": False, "trace_id": trace_id, "status": "not_completed"})
 
-    if trace_id not in running_workflows:
+    return JSONResponse(content={
+        "success": True,
+        "trace_id": trace_id,
+        "status": record.status,
+        "result": record.result,
+        "build_timings": record.build_timings,
+        "workflow_cache_hit": record.workflow_cache_hit,
+        "nodes": record.nodes,
+        "turns": record.turns,
+        "usage": record.usage,
+        "timings": record.timings,
+    })
+
+@app.delete("/workflow/{trace_id}")
+async def cancel_workflow(trace_id: str, token: str = Depends(verify_token)):
+    """Cancel a queued or running workflow; its worker slot is freed right away"""
+    record = run_store.get(trace_id)
+    if record is None:
         return JSONResponse(content={"success": False, "trace_id": trace_id, "status": "not_found"})
-    
-    if running_workflows[trace_id].status in ['pending', 'running']:
+    if record.finished:
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={"success": False, "trace_id": trace_id, "status": record.status},
+        )
+
+    outcome = cancel_run(trace_id)
+    if outcome is not None:
+        return JSONResponse(content={"success": True, "trace_id": trace_id, "status": outcome})
+
+    # The run finished (or its job was lost) while we were looking
+    record = run_store.get(trace_id)
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={"success": False, "trace_id": trace_id, "status": record.status if record else "not_found"},
+    )
+
+@app.get("/workflow/profile/{trace_id}")
+async def get_workflow_profile(trace_id: str, token: str = Depends(verify_token)):
+    """Span timeline of a finished run submitted with "profile": true"""
+    record = run_store.get(trace_id)
+    if record is None:
+        return JSONResponse(content={"success": False, "trace_id": trace_id, "status": "not_found"})
+    if not record.finished:
         return JSONResponse(content={"success": False, "trace_id": trace_id, "status": "not_completed"})
+    if record.profile is None:
+        return JSONResponse(content={"success": False, "trace_id": trace_id, "status": "not_profiled"})
+
+    slowest = sorted(record.profile, key=lambda span: span["seconds"], reverse=True)[:20]
+    return JSONResponse(content={
+        "success": True,
+        "trace_id": trace_id,
+        "timings": record.timings,
+        "spans": record.profile,
+        "slowest": slowest,
+    })
+
+@app.get("/workflow/stream/{trace_id}")
+async def stream_workflow(
+    trace_id: str,
+    cursor: int = 0,
+    last_event_id: Optional[str] = Header(default=None),
+    token: str = Depends(verify_token),
+):
+    """
+    Server-sent events of a workflow: run lifecycle, agent/tool spans, token deltas and the final output.
+
+    Every event carries its sequence number as the SSE id; reconnect with `Last-Event-ID` (or
+    `?cursor=`) to resume after the last event received.
+    """
+    events = run_events.get(trace_id)
+    if events is None:
+        return JSONResponse(content={"success": False, "trace_id": trace_id, "status": "not_found"})
+
+    if last_event_id and last_event_id.isdigit():
+        cursor = max(cursor, int(last_event_id))
+
+    async def event_source():
+        position = cursor
+        while True:
+            batch, closed = events.since(position)
+            for event in batch:
+                position = event["id"]
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+            if closed and not batch:
+                return
+            if not batch and not await events.wait(position, timeout=STREAM_KEEPALIVE_SECONDS):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/workflow/ws/{trace_id}")
+async def stream_workflow_ws(websocket: WebSocket, trace_id: str, cursor: int = 0, token: Optional[str] = None):
+    """
+    WebSocket variant of /workflow/stream: sends each event as a JSON message.
+
+    Browsers cannot set headers on WebSockets, so the bearer token may also be passed as `?token=`.
+    """
+    authorization = websocket.headers.get("authorization", "")
+    if (token or authorization.removeprefix("Bearer ").strip()) != BEARER_TOKEN:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    events = run_events.get(trace_id)
+    await websocket.accept()
+    if events is None:
+        await websocket.send_json({"success": False, "trace_id": trace_id, "status": "not_found"})
+        await websocket.close()
+        return
+
+    position = cursor
+    try:
+        while True:
+            batch, closed = events.since(position)
+            for event in batch:
+                position = event["id"]
+                await websocket.send_text(json.dumps(event, default=str))
+            if closed and not batch:
+                break
+            if not batch:
+                await events.wait(position, timeout=STREAM_KEEPALIVE_SECONDS)
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Event stream of workflow {trace_id} disconnected at event {position}")
+
+@app.get("/admin/runs")
+async def run_store_stats(token: str = Depends(verify_token)):
+    """Run store backend and record counts per status"""
+    return JSONResponse(content=run_store.stats())
+
+@app.get("/scheduler/metrics")
+async def scheduler_metrics(token: str = Depends(verify_token)):
+    """Queue depth, worker utilisation and queue wait-time metrics"""
+    if job_queue is not None:
+        return JSONResponse(content={"mode": FACTORY_MODE, **job_queue.stats()})
+    return JSONResponse(content=scheduler.stats())
+
+@app.get("/metrics")
+async def prometheus_metrics(token: str = Depends(verify_token)):
+    """Tool call counters and latency histograms, scheduler and cache metrics in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/admin/limits")
+async def rate_limit_stats(token: str = Depends(verify_token)):
+    """Calls, retries, concurrency and circuit state per LLM model and Arcade tool"""
+    return JSONResponse(content=rate_limiter.stats())
+
+@app.get("/admin/cache/tools")
+async def tool_cache_stats(token: str = Depends(verify_token)):
+    """Arcade tool definition cache statistics"""
+    return JSONResponse(content=tool_cache.stats())
+
+@app.delete("/admin/cache/tools")
+async def invalidate_tool_cache(tool_name: Optional[str] = None, toolkit: Optional[str] = None, token: str = Depends(verify_token)):
+    """Invalidate cached Arcade tool definitions for a tool, a toolkit, or all tools"""
+    removed = tool_cache.invalidate(tool_name=tool_name, toolkit=toolkit)
+    # Compiled workflows hold the old tool definitions
+    workflow_cache.clear()
+    logger.info(f"Invalidated {removed} cached tool definitions (tool_name={tool_name}, toolkit={toolkit})")
+    return JSONResponse(content={"success": True, "removed": removed})
+
+@app.get("/admin/cache/results")
+async def result_cache_stats(token: str = Depends(verify_token)):
+    """Tool and delegation result cache hit/miss statistics"""
+    return JSONResponse(content=result_cache.stats())
+
+@app.delete("/admin/cache/results")
+async def clear_result_cache(user_id: Optional[str] = None, token: str = Depends(verify_token)):
+    """Drop cached tool and delegation results, for one user or everybody"""
+    removed = result_cache.clear(user_id=user_id)
+    return JSONResponse(content={"success": True, "removed": removed})
+
+@app.get("/admin/cache/workflows")
+async def workflow_cache_stats(token: str = Depends(verify_token)):
+    """Compiled workflow cache statistics"""
+    return JSONResponse(content=workflow_cache.stats())
+
+@app.delete("/admin/cache/workflows")
+async def clear_workflow_cache(token: str = Depends(verify_token)):
+    """Drop all compiled workflows"""
+    removed = workflow_cache.clear()
+    return JSONResponse(content={"success": True, "removed": removed})
 
-    result = running_workflows[trace_id].result
-    del running_workflows[trace_id]
+@app.get("/admin/tracing")
+async def tracing_stats(token: str = Depends(verify_token)):
+    """Trace sink, export queue depth, flushed/dropped counters and per-sink overhead"""
+    return JSONResponse(content=trace_exporter_stats())
 
-    return JSONResponse(content={"success": True, "trace_id": trace_id, "result": result})
+@app.get("/admin/mcp/pool")
+async def mcp_pool_stats(token: str = Depends(verify_token)):
+    """MCP session pool statistics"""
+    return JSONResponse(content=mcp_pool.stats())
 
 @app.get("/health")
 async def health_check():
@@ -114,8 +598,7 @@ async def auth_status(token: str = Depends(verify_token)):
 @app.get("/auth/authorize/{user_id}/{tool_name}")
 async def authorize(user_id: str, tool_name: str, token: str = Depends(verify_token)):
     """Authorize a tool for a user"""
-    client = Arcade()
-    auth_response = client.tools.authorize(tool_name=tool_name, user_id=user_id)
+    auth_response = await arcade_clients.authorize(tool_name=tool_name, user_id=user_id)
     if auth_response.status != "completed":
         return JSONResponse(content={"authenticated": False, "message": "Valid token", "url": auth_response.url})
     return JSONResponse(content={"authenticated": True, "message": "Valid token"})
@@ -2,19 +2,25 @@ import asyncio
 import os
 from pydantic import BaseModel  # type: ignore
 from contextlib import AsyncExitStack
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 import time
 
-from agents import Agent, set_trace_processors, function_tool # type: ignore
-from agents.mcp import MCPServerStreamableHttp, MCPServerSse # type: ignore
+from agents import Agent, function_tool # type: ignore
 from agents.model_settings import ModelSettings # type: ignore
 from agents.extensions.models.litellm_model import LitellmModel # type: ignore
 
-from arcadepy import AsyncArcade # type: ignore
-from agents_arcade import get_arcade_tools # type: ignore
+from factory.clients import arcade_clients
+from factory.mcp_pool import mcp_pool, normalize_mcp_config
+from factory.metrics import LazyPayload, record_tool_call, sample_payload
+from factory.profiling import record_stage, timed
+from factory.prompts import agent_prompt, cache_settings, context_prompt
+from factory.rate_limit import rate_limiter
+from factory.result_cache import has_side_effects, result_cache
+from factory.tool_cache import tool_cache
 import logging
 import functools
-import json
+
+logger = logging.getLogger(__name__)
 
 
 default_timeout = 60
@@ -23,7 +29,7 @@ default_cache_tools_list = True
 
 def create_logged_tool_wrapper(original_tool, agent_name: str):
     """
-    Wraps an Arcade FunctionTool to add comprehensive logging before and after execution.
+    Wraps an Arcade FunctionTool to add logging, call metrics and result caching around execution.
     Returns the original FunctionTool object with its on_invoke_tool replaced by the logged wrapper.
     """
     # FunctionTool objects have 'on_invoke_tool' attribute, not 'function'
@@ -34,47 +40,58 @@ def create_logged_tool_wrapper(original_tool, agent_name: str):
     # Store the original invocation function
     original_invoke = original_tool.on_invoke_tool
     tool_name = getattr(original_tool, 'name', 'unknown')
+    cache_ttl = result_cache.ttl(tool_name)
+    # A tool that changes something may have run before a 5xx or a dropped connection: only 429s are retried
+    retry_server_errors = not has_side_effects(tool_name)
 
     @functools.wraps(original_invoke)
     async def logged_wrapper(*args, **kwargs):
-        # Log the tool call attempt
         logging.info(f"[TOOL_CALL] 🔧 Agent '{agent_name}' calling tool: {tool_name}")
-        logging.info(f"[TOOL_CALL]   Args: {args}")
-        logging.info(f"[TOOL_CALL]   Kwargs: {json.dumps(kwargs, default=str, indent=2)}")
-
+        # Payloads can be whole mailboxes: only a sample is logged, rendered when the record is emitted
+        sampled = sample_payload()
+        if sampled:
+            logger.debug("[TOOL_CALL]   %s args: %s", tool_name, LazyPayload(args[1:]))
+
+        # Side-effect-free tools reuse results of identical calls by the same user
+        user_id = None
+        if cache_ttl > 0 and len(args) >= 2 and isinstance(getattr(args[0], "context", None), dict):
+            user_id = args[0].context.get("user_id")
+        if user_id is not None:
+            hit, cached = result_cache.get(user_id, tool_name, args[1])
+            if hit:
+                record_tool_call(tool_name, agent_name, "cache_hit")
+                logging.info(f"[TOOL_CALL] ♻️  Tool '{tool_name}' result served from cache")
+                return cached
+
+        started = time.perf_counter()
         try:
             # Execute the original tool invocation
-            result = await original_invoke(*args, **kwargs)
-
-            # Log success
-            logging.info(f"[TOOL_CALL] ✅ Tool '{tool_name}' completed successfully")
-            logging.info(f"[TOOL_CALL]   Result type: {type(result)}")
-
-            # Try to log result in a readable way
-            try:
-                if isinstance(result, (str, int, float, bool, type(None))):
-                    logging.info(f"[TOOL_CALL]   Result: {result}")
-                elif isinstance(result, dict):
-                    logging.info(f"[TOOL_CALL]   Result: {json.dumps(result, default=str, indent=2)}")
-                else:
-                    logging.info(f"[TOOL_CALL]   Result: {str(result)[:500]}")  # Truncate long results
-            except Exception as log_err:
-                logging.warning(f"[TOOL_CALL]   Could not log result: {log_err}")
-
-            return result
-
+            result = await rate_limiter.call(
+                "arcade", tool_name, lambda: original_invoke(*args, **kwargs),
+                api_key=os.getenv("ARCADE_API_KEY"), retry_server_errors=retry_server_errors,
+            )
         except Exception as e:
-            # Log failure with full details
-            logging.error(f"[TOOL_CALL] ❌ Tool '{tool_name}' failed with error: {type(e).__name__}: {e}")
-            logging.error(f"[TOOL_CALL]   Tool: {tool_name}")
-            logging.error(f"[TOOL_CALL]   Agent: {agent_name}")
-            logging.error(f"[TOOL_CALL]   Args: {args}")
-            logging.error(f"[TOOL_CALL]   Kwargs: {kwargs}")
-            logging.exception(f"[TOOL_CALL]   Full traceback:")
-
+            elapsed = time.perf_counter() - started
+            record_tool_call(tool_name, agent_name, "error", elapsed)
+            record_stage("tool_execution", elapsed, agent_name)
+            logging.error(
+                f"[TOOL_CALL] ❌ Tool '{tool_name}' (agent '{agent_name}') failed after {elapsed:.2f}s: "
+                f"{type(e).__name__}: {e}"
+            )
+            logger.debug("[TOOL_CALL]   %s args: %s", tool_name, LazyPayload(args[1:]), exc_info=True)
             # Re-raise to let the agent handle it
             raise
 
+        elapsed = time.perf_counter() - started
+        record_tool_call(tool_name, agent_name, "ok", elapsed)
+        record_stage("tool_execution", elapsed, agent_name)
+        if user_id is not None:
+            result_cache.put(user_id, tool_name, args[1], result, cache_ttl)
+        logging.info(f"[TOOL_CALL] ✅ Tool '{tool_name}' completed in {elapsed:.2f}s")
+        if sampled:
+            logger.debug("[TOOL_CALL]   %s result: %s", tool_name, LazyPayload(result))
+        return result
+
     # Replace the on_invoke_tool with our logged wrapper
     original_tool.on_invoke_tool = logged_wrapper
     return original_tool
@@ -88,19 +105,21 @@ Reasoning:
 - Check the params required for each tool and their format
 """
 
-BASE_PROMPT = """You are a {persona}. Use your tools to answer the users request. Format your final answer as desribed in "Expected output".
-Think step by step and make sure to solve your issues. Always start by explaining how you achieved the answer.
+class AgentInstructions:
+    """
+    Dynamic agent instructions: the static system prompt followed by the run's context.
 
-Guidelines:
-- Perform the task requested by the user and answer the user's question. Do not ask new questions to the user. Only explain what you have done to get to the answer.
-{guidelines}
+    The static prompt is the same for every run of a workflow config, so a built agent can be
+    reused across runs and users (see factory.workflow_cache) and the provider can serve the prompt
+    from its prompt cache; the time and any `__system__` notes of the run are appended at the tail.
+    """
 
-Expected output:
-{output}
+    def __init__(self, static_prompt: str):
+        self.static_prompt = static_prompt
 
-Context:
-{context}
-"""
+    def __call__(self, run_context_wrapper, agent) -> str:
+        run_context = run_context_wrapper.context if isinstance(run_context_wrapper.context, dict) else {}
+        return self.static_prompt + context_prompt(run_context)
 
 
 class MCPConfig(BaseModel):
@@ -120,92 +139,72 @@ class AgentConfig(BaseModel):
     context: Dict[str, Any] = {}
 
 
+def _release_mcp_session(session: Any, exc_type, exc, tb) -> bool:
+    # Sessions of a cancelled run may be left mid-call, they are not handed to the next run
+    mcp_pool.release(session, discard=exc_type is not None and issubclass(exc_type, asyncio.CancelledError))
+    return False
+
+
 async def _build_mcp_servers(
     stack: AsyncExitStack,
     servers: List[Dict[str, Any]],
 ) -> List[Any]:
-    servers: List[Any] = []
+    """Lease pooled MCP sessions for `servers`; the leases are released when `stack` closes."""
+    built_servers: List[Any] = []
     for index, server_cfg in enumerate(servers, start=1):
-        print("make config:", server_cfg)
         if not isinstance(server_cfg, dict):
             continue
 
-        name = server_cfg.get("name") or f"MCP {index}"
-        server_type = server_cfg.get("server_type") or f"HTTP"
-
         # Params need to include url
-        if not server_cfg.get("params", {}).get("url"):
-            if not server_cfg.get("url"):
-                raise Exception("URL is required")
-            server_cfg["params"]["url"] = server_cfg["url"]
-            continue
+        server_cfg = normalize_mcp_config(server_cfg, index)
 
-        timeout = int(server_cfg.get("timeout_seconds", 60))
-        cache_tools_list = bool(server_cfg.get("cache_tools_list", True))
-        
-        if server_type.lower() == "sse":
-            server = await stack.enter_async_context(
-                MCPServerSse(
-                    name=name,
-                    params=server_cfg['params'],
-                    client_session_timeout_seconds=timeout,
-                    cache_tools_list=cache_tools_list,
-                )
-            )
-
-        else:
-            server = await stack.enter_async_context(
-                MCPServerStreamableHttp(
-                    name=name,
-                    params=server_cfg['params'],
-                    cache_tools_list=cache_tools_list,
-                    client_session_timeout_seconds=timeout,
-                )
-            )
+        session = await mcp_pool.acquire(server_cfg)
+        stack.push(functools.partial(_release_mcp_session, session))
 
         # Add to the list
-        servers.append(server)
+        built_servers.append(session.server)
     
     # Return ALL
-    return servers
+    return built_servers
 
 
 async def build_agent(
     agent_name: str, user_id: str, model_name: str, mcp_servers: List[Dict[str, Any]],
     toolkits: List[str], api_key: str, persona: str, output: str,
-    guidelines: str, context: Dict[str, Any] = {}, tracer: List[Any] = None
+    guidelines: str, context: Optional[Dict[str, Any]] = None, exit_stack: Optional[AsyncExitStack] = None
 ) -> Agent:
-    # set_tracing_disabled(True)
+    """
+    Builds a single agent with its Arcade tools and MCP servers.
 
-    if tracer:
-        set_trace_processors(tracer)
+    MCP sessions are leased from the pool and released when `exit_stack` is closed; pass the
+    run's stack so the sessions go back to the pool when the run ends.
+    """
+    # set_tracing_disabled(True)
+    context = context or {}
 
     # if '/' not in model_name:
     #     raise Exception("USE LITELLM MODEL NAME")
 
-    # Initialize Arcade client - keep alive for agent lifetime
-    # The AsyncArcade client maintains a persistent HTTP session
+    # Shared Arcade client of this event loop, connections are pooled across runs
     arcade_api_key = os.getenv("ARCADE_API_KEY")
-    if arcade_api_key:
-        logging.info(f"[TOOL_INIT] Arcade API key found (length: {len(arcade_api_key)})")
-    else:
+    if not arcade_api_key:
         logging.warning(f"[TOOL_INIT] ⚠️  No ARCADE_API_KEY found in environment")
-    
-    arcade_client = AsyncArcade()
-    logging.info(f"[TOOL_INIT] Arcade client initialized: {arcade_client}")
+
+    arcade_client = arcade_clients.async_client()
 
     tools = None
     if len(toolkits) > 0:
         logging.info(f"[TOOL_INIT] Fetching tools for agent {agent_name} with toolkits: {toolkits}")
         logging.info(f"[TOOL_INIT] User ID for tools: {user_id}")
-        context["user_id"] = user_id
         try:
             # Get Arcade tools - these are function wrappers that use the arcade_client
             # The 'toolkits' parameter here actually contains specific tool names (e.g., "Gmail.SendEmail")
             # not toolkit names (e.g., "Gmail"), so we pass them as 'tools' not 'toolkits'
-            logging.info(f"[TOOL_INIT] Calling get_arcade_tools with client={arcade_client}, tools={toolkits}")
-            raw_tools = await get_arcade_tools(arcade_client, tools=toolkits)
-            logging.info(f"[TOOL_INIT] ✅ Agent {agent_name} retrieved {len(raw_tools)} tools from Arcade")
+            # Definitions come from the process-wide cache, only misses go to Arcade
+            logging.info(f"[TOOL_INIT] Resolving tools with client={arcade_client}, tools={toolkits}")
+            with timed("arcade_tool_fetch", agent_name):
+                raw_tools = await tool_cache.get_tools(arcade_client, toolkits)
+            logging.info(f"[TOOL_INIT] ✅ Agent {agent_name} retrieved {len(raw_tools)} tools")
             
             # Wrap each tool with logging
             tools = []
@@ -220,35 +219,17 @@ async def build_agent(
             logging.error(f"[TOOL_INIT] ❌ Failed to get Arcade tools for {agent_name}: {e}", exc_info=True)
             raise
 
-    # Build MCP servers if needed
-    # TODO: MCP servers currently use AsyncExitStack which may cause issues
-    # if servers need to persist after this function returns
+    # Lease pooled MCP sessions if needed
     built_mcp_servers = None
     if mcp_servers and len(mcp_servers) > 0:
-        # Create a stack that won't be automatically closed
-        # The servers will remain open for the agent's lifetime
-        stack = AsyncExitStack()
-        built_mcp_servers = await _build_mcp_servers(stack, mcp_servers)
-        logging.debug(f"Agent {agent_name} built {len(built_mcp_servers)} MCP servers")
-        # Note: stack is NOT used in 'async with' so it won't auto-close
-
-    # Context: Time and __system__
-    context_string = f"- The time is: {time.asctime()}\n"
-    context_string += (context.get("__system__") or "")
-
-    # Guidelines
-    if len(guidelines) > 0:
-        guidelines_string = "- " + "\n- ".join(guidelines)
-    else:
-        guidelines_string = ""
-
-    # System prompt
-    system_prompt = BASE_PROMPT.format(
-        persona=persona,
-        guidelines=guidelines_string,
-        output=output,
-        context=context_string
-    )
+        if exit_stack is None:
+            exit_stack = AsyncExitStack()
+            logging.warning(f"[AGENT_BUILD] ⚠️  No exit stack given for agent {agent_name}, its MCP sessions stay leased")
+        built_mcp_servers = await _build_mcp_servers(exit_stack, mcp_servers)
+        logging.debug(f"Agent {agent_name} leased {len(built_mcp_servers)} MCP servers")
+
+    # System prompt: static prefix from the config, the run's context is appended when the agent runs
+    system_prompt = AgentInstructions(agent_prompt(persona, guidelines, output, context))
 
     # Build agent
     agent_kwargs: Dict[str, Any] = {
@@ -257,6 +238,7 @@ async def build_agent(
         # "model": LitellmModel(model=model_name, api_key=api_key),
         # "model_settings": ModelSettings(tool_choice="required", temperature=0.0),
         "model": model_name,
+        "model_settings": cache_settings(system_prompt.static_prompt, model_name),
     }
 
     # Optional params
@@ -0,0 +1,231 @@
+import asyncio
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from factory.run_store import FINISHED_STATUSES, RunStore
+from factory.scheduler import QueueFullError
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Batch configuration
+FACTORY_BATCH_MAX_ITEMS = int(os.getenv("FACTORY_BATCH_MAX_ITEMS", "10000"))
+FACTORY_BATCH_CONCURRENCY = int(os.getenv("FACTORY_BATCH_CONCURRENCY", "8"))
+FACTORY_BATCH_POLL_INTERVAL = float(os.getenv("FACTORY_BATCH_POLL_INTERVAL", "0.5"))
+# Seconds a finished batch stays queryable
+FACTORY_BATCH_RETENTION = float(os.getenv("FACTORY_BATCH_RETENTION", "3600"))
+
+
+class BatchItem:
+    """One user_task of a batch and the run executing it."""
+
+    __slots__ = ("index", "user_task", "trace_id", "status")
+
+    def __init__(self, index: int, user_task: str):
+        self.index = index
+        self.user_task = user_task
+        self.trace_id = str(uuid.uuid4())
+        # "waiting" until submitted, then the status of its run
+        self.status = "waiting"
+
+
+class WorkflowBatch:
+    """
+    Many user_tasks run against one workflow config.
+
+    Items are submitted through `submit` (which raises QueueFullError when admission control
+    rejects them) with at most `max_concurrency` runs queued or running at a time, so a large
+    batch neither floods the scheduler nor trips the per-user queue limit. Every run uses the
+    same validated config, so the workflow is compiled once and reused from the workflow cache.
+    Items can be added while the batch runs until close() is called.
+    """
+
+    def __init__(
+        self,
+        user_id: str,
+        submit: Callable[[BatchItem], None],
+        run_store: RunStore,
+        max_concurrency: int = FACTORY_BATCH_CONCURRENCY,
+        max_items: int = FACTORY_BATCH_MAX_ITEMS,
+        poll_interval: float = FACTORY_BATCH_POLL_INTERVAL,
+    ):
+        self.batch_id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.submit = submit
+        self.run_store = run_store
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_items = max_items
+        self.poll_interval = poll_interval
+        self.items: List[BatchItem] = []
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.closed = False
+        self.cancelled = False
+        self._next = 0
+        self._in_flight: Dict[str, BatchItem] = {}
+        self._wakeup = asyncio.Event()
+
+    def add(self, user_task: str) -> BatchItem:
+        if self.closed:
+            raise ValueError("Batch input is closed")
+        if len(self.items) >= self.max_items:
+            raise ValueError(f"Batch has more than {self.max_items} items")
+        item = BatchItem(len(self.items), user_task)
+        self.items.append(item)
+        self._wakeup.set()
+        return item
+
+    def close(self) -> None:
+        """No more items will be added."""
+        self.closed = True
+        self._wakeup.set()
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is not None:
+            return "cancelled" if self.cancelled else "completed"
+        return "running"
+
+    async def run(self) -> None:
+        logger.info(f"[BATCH] Batch {self.batch_id} started (concurrency {self.max_concurrency})")
+        try:
+            while True:
+                self._refresh()
+                if not self.cancelled:
+                    self._dispatch()
+                if not self._in_flight and (self.cancelled or (self.closed and self._next >= len(self.items))):
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.finished_at = time.time()
+            logger.info(f"[BATCH] Batch {self.batch_id} {self.status}: {self.counts()}")
+
+    def cancel(self, cancel_run: Callable[[str], Any]) -> None:
+        """Stop submitting items and cancel the runs in flight with `cancel_run(trace_id)`."""
+        self.cancelled = True
+        self.closed = True
+        for item in self.items[self._next:]:
+            item.status = "cancelled"
+        for trace_id in list(self._in_flight):
+            try:
+                cancel_run(trace_id)
+            except Exception as e:
+                logger.warning(f"[BATCH] Could not cancel run {trace_id} of batch {self.batch_id}: {e}")
+        self._wakeup.set()
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for item in self.items:
+            counts[item.status] = counts.get(item.status, 0) + 1
+        return counts
+
+    def progress(self, offset: int = 0, limit: int = 100, include_results: bool = False) -> Dict[str, Any]:
+        counts = self.counts()
+        finished = sum(count for status, count in counts.items() if status in FINISHED_STATUSES)
+        items = []
+        for item in self.items[offset:offset + limit]:
+            entry: Dict[str, Any] = {"index": item.index, "trace_id": item.trace_id, "status": item.status}
+            if include_results and item.status in FINISHED_STATUSES:
+                record = self.run_store.get(item.trace_id)
+                entry["result"] = record.result if record is not None else None
+            items.append(entry)
+        return {
+            "batch_id": self.batch_id,
+            "status": self.status,
+            "input_closed": self.closed,
+            "total": len(self.items),
+            "finished": finished,
+            "counts": counts,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "items": items,
+        }
+
+    def _refresh(self) -> None:
+        for trace_id, item in list(self._in_flight.items()):
+            record = self.run_store.get(trace_id)
+            if record is None:
+                # Expired or lost, nothing more will happen to it
+                item.status = "failed"
+            else:
+                item.status = record.status
+            if item.status in FINISHED_STATUSES:
+                del self._in_flight[trace_id]
+
+    def _dispatch(self) -> None:
+        while len(self._in_flight) < self.max_concurrency and self._next < len(self.items):
+            item = self.items[self._next]
+            try:
+                self.submit(item)
+            except QueueFullError as e:
+                logger.info(f"[BATCH] Batch {self.batch_id} waiting for queue capacity: {e}")
+                return
+            except Exception as e:
+                logger.error(f"[BATCH] Item {item.index} of batch {self.batch_id} could not be submitted: {e}")
+                item.status = "failed"
+                self._next += 1
+                continue
+            item.status = "pending"
+            self._in_flight[item.trace_id] = item
+            self._next += 1
+
+
+class BatchRegistry:
+    """Batches of this process by id; finished batches are dropped after FACTORY_BATCH_RETENTION."""
+
+    def __init__(self, retention: float = FACTORY_BATCH_RETENTION):
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._batches: Dict[str, WorkflowBatch] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, batch: WorkflowBatch) -> None:
+        """Register `batch` and run its dispatcher on the running event loop."""
+        self._purge()
+        with self._lock:
+            self._batches[batch.batch_id] = batch
+            self._tasks[batch.batch_id] = asyncio.get_running_loop().create_task(batch.run())
+
+    def get(self, batch_id: str) -> Optional[WorkflowBatch]:
+        with self._lock:
+            return self._batches.get(batch_id)
+
+    async def aclose(self) -> None:
+        """Stop every dispatcher; runs already submitted carry on."""
+        with self._lock:
+            tasks = list(self._tasks.values())
+            self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            batches = list(self._batches.values())
+        return {
+            "batches": len(batches),
+            "running": sum(1 for batch in batches if batch.finished_at is None),
+            "items": sum(len(batch.items) for batch in batches),
+        }
+
+    def _purge(self) -> None:
+        now = time.time()
+        with self._lock:
+            expired = [
+                batch_id for batch_id, batch in self._batches.items()
+                if batch.finished_at is not None and now - batch.finished_at >= self.retention
+            ]
+            for batch_id in expired:
+                del self._batches[batch_id]
+                self._tasks.pop(batch_id, None)
+
+
+batches = BatchRegistry()
@@ -2,29 +2,41 @@ from agents import Agent, Runner, function_tool
 from dotenv import load_dotenv
 import asyncio
 from pydantic import BaseModel
-from datetime import datetime
 from enum import Enum
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from agents import Agent, RunContextWrapper, Runner, function_tool
 # from agents.extensions.models.litellm_model import LitellmModel # type: ignore
 import os
+import time
 import logging
 
-from factory.agent_one import build_agent, AgentConfig
-from factory.trace_stream import OpenAIAgentsTracingProcessor
+from factory.agent_one import build_agent, AgentConfig, _build_mcp_servers
+from factory.mcp_pool import normalize_mcp_config
+from factory.context import RunContext, traced_run
+from factory.graph import WorkflowEdge, WorkflowGraph, run_graph
+from factory.group_chat import GroupChat
+from factory.handoff import HandoffPolicy, run_chain
+from factory.profiling import record_stage, timed
+from factory.prompts import TIME_KEY, cache_settings, manager_prompt, run_time
+from factory.trace_stream import OpenAIAgentsTracingProcessor, get_trace_exporter
+from factory.workflow_cache import CompiledWorkflow, workflow_cache, workflow_config_hash
 
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Global variables
-agents = {}
-global_context = None
+# Number of agents of a workflow built concurrently
+BUILD_CONCURRENCY = int(os.getenv("FACTORY_BUILD_CONCURRENCY", "4"))
+
+# Number of branches of a parallel workflow run concurrently
+PARALLEL_CONCURRENCY = int(os.getenv("FACTORY_PARALLEL_CONCURRENCY", "8"))
 
 class RelationsType(str, Enum):
     manager = "manager"
     chain = "chain"
     group_chat = "group-chat"
     triage = "triage"
+    parallel = "parallel"
+    graph = "graph"
 
 class WorkflowConfig(BaseModel):
     objective: str
@@ -32,125 +44,191 @@ class WorkflowConfig(BaseModel):
     model_name: str
     api_key: str
     agents: List[AgentConfig]
-
-@function_tool
-async def delegate_task(agent_name: str, task: str):
-    logging.info(f"[DELEGATE] 🔄 Delegating to agent '{agent_name}'")
-    logging.info(f"[DELEGATE]   Task: {task}")
-    
-    if agent_name not in agents:
-        logging.error(f"[DELEGATE] ❌ Agent '{agent_name}' not found in agents dict. Available: {list(agents.keys())}")
-        raise ValueError(f"Agent '{agent_name}' not found")
-    
-    agent = agents[agent_name]
-    
-    # Log agent capabilities
-    has_tools = hasattr(agent, 'tools')
-    tool_count = len(agent.tools) if has_tools else 0
-    logging.info(f"[DELEGATE]   Agent has tools: {has_tools}, count: {tool_count}")
-    
-    if has_tools and tool_count > 0:
-        tool_names = [getattr(t, 'name', str(t)) for t in agent.tools]
-        logging.info(f"[DELEGATE]   Available tools: {tool_names}")
-    
-    logging.info(f"[DELEGATE]   Context: {global_context}")
-    
-    try:
-        logging.info(f"[DELEGATE] 🚀 Running agent '{agent_name}'...")
-        result = await Runner.run(agent, task, context=global_context)
-        logging.info(f"[DELEGATE] ✅ Agent '{agent_name}' completed successfully")
-        logging.info(f"[DELEGATE]   Output: {result.final_output}")
-        return result.final_output
-    except Exception as e:
-        logging.error(f"[DELEGATE] ❌ Agent '{agent_name}' failed: {type(e).__name__}: {e}")
-        logging.exception(f"[DELEGATE]   Full traceback:")
-        raise
-
-
-async def builder(json_config: Dict[str, Any], user_id: str, tracer: list):
+    # Parallel mode: agent combining the branch outputs (default: a generated reducer agent),
+    # branches run at the same time and per-branch timeout
+    reducer: Optional[str] = None
+    max_parallel: int = PARALLEL_CONCURRENCY
+    branch_timeout_seconds: Optional[float] = None
+    # Graph mode: dependencies between agents, ready agents run concurrently (up to max_parallel)
+    edges: List[WorkflowEdge] = []
+    # Group-chat mode: agent that ends the chat with [DONE], speaker selection ("round_robin" or
+    # "auto"), caps on turns and total tokens, and messages kept verbatim in the prompt
+    finisher: Optional[str] = None
+    speaker_selection: str = "round_robin"
+    max_turns: int = 12
+    max_chat_tokens: Optional[int] = None
+    chat_window: int = 6
+    # Chain mode: how each agent's output is handed to the next one, by default and per agent
+    # name (full, truncate, fields or summarize); token usage per step is returned in "turns"
+    handoff: HandoffPolicy = HandoffPolicy()
+    handoffs: Dict[str, HandoffPolicy] = {}
+
+async def builder(json_config: Dict[str, Any], run_context: RunContext, build_concurrency: int = BUILD_CONCURRENCY):
     """
     Builds the manager agent and returns it.
 
     Manager agent contains all the agents and can call them to solve the user's task.
+    Identical workflow configs reuse the compiled agents from the workflow cache; the agents
+    are bound to the run and registered on `run_context.agents`.
+    """
+    config_hash = workflow_config_hash(json_config)
+    run_context.config_hash = config_hash
+
+    cache_hit = True
+    compiled = workflow_cache.get(config_hash)
+    if compiled is None:
+        # One compile per config and loop, concurrent submissions wait for it
+        async with workflow_cache.build_lock(config_hash):
+            # Already counted as a miss above
+            compiled = workflow_cache.get(config_hash, count=False)
+            if compiled is None:
+                compiled = await compile_workflow(json_config, config_hash, run_context.user_id, build_concurrency)
+                workflow_cache.put(compiled)
+                run_context.build_timings.update(compiled.build_timings)
+                cache_hit = False
+
+    run_context.workflow_cache_hit = cache_hit
+    if cache_hit:
+        logging.info(f"[BUILDER] ♻️  Reusing compiled workflow {config_hash[:12]}")
+
+    agents = await bind_workflow(compiled, run_context)
+    return agents, compiled.overview
+
+
+async def compile_workflow(json_config: Dict[str, Any], config_hash: str, user_id: str, build_concurrency: int = BUILD_CONCURRENCY) -> CompiledWorkflow:
+    """
+    Builds every agent of a workflow, up to `build_concurrency` at the same time.
+
+    MCP servers are not attached here, they are leased per run in bind_workflow().
     """
-    global agents
-    
     logging.info(f"[BUILDER] 🏗️  Starting builder for user: {user_id}")
     logging.info(f"[BUILDER]   Model: {json_config.get('model_name')}")
     logging.info(f"[BUILDER]   Number of agents to build: {len(json_config.get('agents', []))}")
     
-    # Build overview for manager agent
-    overview = "You are a manager agent. Solve the user's task by delegating tasks to the appropriate agents and delegating the tasks to them.\n"
-    overview += "Think step by step and do not ask the user for clarification, just execute the task as best as you can."
-    overview += "You have access to the following agents:\n"
-
+    # Overview for the manager and triage agents, static for the config so it is compiled once
+    overview = manager_prompt(json_config["agents"])
     for agent in json_config["agents"]:
-        overview += f"{agent['name']}: {agent['persona']}\n"
         logging.info(f"[BUILDER]   Agent to build: {agent['name']} with {len(agent.get('toolkits', []))} toolkits")
 
-    agents = {}
-    for i, agent in enumerate(json_config["agents"], 1):
-        logging.info(f"[BUILDER] Building agent {i}/{len(json_config['agents'])}: {agent['name']}")
-        logging.info(f"[BUILDER]   Toolkits: {agent.get('toolkits', [])}")
-        logging.info(f"[BUILDER]   MCP Servers: {len(agent.get('mcp_servers', []))}")
-
-        agent['context'] = {
-            "__system__": f"The time is {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-        }
-
-        try:
-            built_agent = await build_agent(
-                agent_name=agent['name'],
-                user_id=user_id,
-                model_name=json_config["model_name"],
-                mcp_servers=agent['mcp_servers'],
-                toolkits=agent['toolkits'],
-                api_key=json_config["api_key"],
-                persona=agent['persona'],
-                output=agent['output'],
-                guidelines=agent['guidelines'],
-                context=agent['context'],
-                tracer=tracer
-            )
-            agents[agent['name']] = built_agent
-            logging.info(f"[BUILDER] ✅ Successfully built agent: {agent['name']}")
-        except Exception as e:
-            logging.error(f"[BUILDER] ❌ Failed to build agent {agent['name']}: {e}")
-            raise
+    total = len(json_config["agents"])
+    semaphore = asyncio.Semaphore(max(1, build_concurrency))
+    build_timings: Dict[str, float] = {}
+
+    async def _build(i: int, agent: Dict[str, Any]) -> Agent:
+        async with semaphore:
+            logging.info(f"[BUILDER] Building agent {i}/{total}: {agent['name']}")
+            logging.info(f"[BUILDER]   Toolkits: {agent.get('toolkits', [])}")
+            logging.info(f"[BUILDER]   MCP Servers: {len(agent.get('mcp_servers', []))}")
+
+            started = time.perf_counter()
+            try:
+                built_agent = await build_agent(
+                    agent_name=agent['name'],
+                    user_id=user_id,
+                    model_name=json_config["model_name"],
+                    mcp_servers=[],
+                    toolkits=agent['toolkits'],
+                    api_key=json_config["api_key"],
+                    persona=agent['persona'],
+                    output=agent['output'],
+                    guidelines=agent['guidelines'],
+                    context=agent.get('context'),
+                )
+            except Exception as e:
+                logging.error(f"[BUILDER] ❌ Failed to build agent {agent['name']}: {e}")
+                raise
+
+            elapsed = time.perf_counter() - started
+            build_timings[agent['name']] = elapsed
+            record_stage("agent_build", elapsed, agent['name'])
+            logging.info(f"[BUILDER] ✅ Successfully built agent: {agent['name']} in {elapsed:.2f}s")
+            return built_agent
+
+    # Build all agents concurrently, the task group cancels the remaining builds if one fails
+    try:
+        async with asyncio.TaskGroup() as task_group:
+            tasks = [
+                task_group.create_task(_build(i, agent))
+                for i, agent in enumerate(json_config["agents"], 1)
+            ]
+    except BaseExceptionGroup as group:
+        raise group.exceptions[0]
+
+    # Keep config order, chain mode relies on it
+    agents = {agent['name']: task.result() for agent, task in zip(json_config["agents"], tasks)}
+    mcp_configs = {
+        agent['name']: [normalize_mcp_config(cfg, index) for index, cfg in enumerate(agent.get('mcp_servers') or [], start=1)]
+        for agent in json_config["agents"]
+    }
 
     logging.info(f"[BUILDER] ✅ All {len(agents)} agents built successfully")
-    return agents, overview
+    return CompiledWorkflow(
+        config_hash=config_hash,
+        agents=agents,
+        overview=overview,
+        mcp_configs=mcp_configs,
+        build_timings=build_timings,
+    )
+
+
+async def bind_workflow(compiled: CompiledWorkflow, run_context: RunContext) -> Dict[str, Agent]:
+    """Attach leased MCP sessions to the compiled agents and register them on the run."""
+
+    async def _bind(name: str, agent: Agent) -> Agent:
+        configs = compiled.mcp_configs.get(name) or []
+        if not configs:
+            return agent
+        with timed("mcp_connect", name):
+            servers = await _build_mcp_servers(run_context.resources, configs)
+        logging.info(f"[BUILDER] Agent {name} leased {len(servers)} MCP servers")
+        return agent.clone(mcp_servers=servers)
 
+    try:
+        async with asyncio.TaskGroup() as task_group:
+            tasks = [task_group.create_task(_bind(name, agent)) for name, agent in compiled.agents.items()]
+    except BaseExceptionGroup as group:
+        raise group.exceptions[0]
 
-async def start_agents(workflow_config: WorkflowConfig, user_task: str, user_id: str):
-    global global_context
-    
+    agents = run_context.agents
+    agents.clear()
+    for name, task in zip(compiled.agents, tasks):
+        agents[name] = task.result()
+    return agents
+
+
+async def start_agents(workflow_config: WorkflowConfig, user_task: str, user_id: str, run_context: Optional[RunContext] = None):
     logging.info(f"[WORKFLOW] 🚀 Starting workflow for user: {user_id}")
     logging.info(f"[WORKFLOW]   Relations type: {workflow_config.relations_type}")
     logging.info(f"[WORKFLOW]   User task: {user_task}")
     logging.info(f"[WORKFLOW]   Number of agents: {len(workflow_config.agents)}")
     
-    global_context = {
-        "user_id": user_id,
-    }
+    if run_context is None:
+        run_context = RunContext(user_id=user_id)
 
-    tracer = None
-    if os.getenv("FIREBASE_PROJECT_ID") and os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH"):
-        logging.info(f"[WORKFLOW] Firebase tracing enabled")
-        tracer = [OpenAIAgentsTracingProcessor(
-            firebase_project_id=os.getenv("FIREBASE_PROJECT_ID"),
-            firebase_service_account_path=os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH"),
-            user_id=user_id
-        )]
-    else:
-        logging.info(f"[WORKFLOW] Firebase tracing disabled (no credentials)")
+    if run_context.tracer is None:
+        exporter = get_trace_exporter()
+        if exporter is not None:
+            logging.info(f"[WORKFLOW] Tracing enabled ({exporter.sink.name})")
+            run_context.tracer = OpenAIAgentsTracingProcessor(exporter=exporter, user_id=user_id)
+        else:
+            logging.info(f"[WORKFLOW] Tracing disabled (no trace sink configured)")
 
     if len(workflow_config.agents) == 0:
         raise ValueError("No agents provided")
 
+    # Rendered at the tail of the system prompts, fixed for the run so every turn shares the prefix
+    run_context.context[TIME_KEY] = run_time()
+
+    with traced_run(run_context):
+        async with run_context.resources:
+            return await _execute_workflow(workflow_config, user_task, run_context)
+
+
+async def _execute_workflow(workflow_config: WorkflowConfig, user_task: str, run_context: RunContext):
     builder_json = workflow_config.model_dump()
     logging.info(f"[WORKFLOW] Building agents...")
-    agents, overview = await builder(builder_json, user_id=user_id, tracer=tracer)
+    agents, overview = await builder(builder_json, run_context)
+    run_config = run_context.run_config()
 
     logging.info(f"[WORKFLOW] Executing workflow with relations_type: {workflow_config.relations_type}")
     
@@ -160,51 +238,49 @@ async def start_agents(workflow_config: WorkflowConfig, user_task: str, user_id:
             name="manager agent", 
             instructions=overview, 
             model=workflow_config.model_name,
-            tools=[delegate_task]
+            tools=[run_context.delegate_tool()],
+            # Independent delegations are issued in one turn and run concurrently
+            model_settings=cache_settings(overview, workflow_config.model_name, parallel_tool_calls=True),
         )
         logging.info(f"[WORKFLOW] Running manager agent...")
-        result = await Runner.run(manager_agent, user_task)
+        result = await run_context.run_agent(manager_agent, user_task, run_config)
         logging.info(f"[WORKFLOW] ✅ Workflow completed successfully")
         logging.info(f"[WORKFLOW]   Final output: {result.final_output}")
         return result.final_output
 
     elif workflow_config.relations_type == "chain":
         logging.info(f"[WORKFLOW] Chain mode - sequential execution of agents")
-        logging.info(f"[WORKFLOW]   Agent chain order: {[a.name for a in workflow_config.agents]}")
-        
-        # Get agents in order
-        agent_list = list(agents.values())
-        agent_names = [a.name for a in workflow_config.agents]
-        
-        # Sequential execution: each agent's output becomes next agent's input
-        current_task = user_task
-        
-        for i, agent in enumerate(agent_list):
-            agent_name = agent_names[i]
-            logging.info(f"[WORKFLOW] 🔗 Chain step {i+1}/{len(agent_list)}: Running agent '{agent_name}'")
-            logging.info(f"[WORKFLOW]   Input: {current_task[:200]}...")  # Log first 200 chars
-            
-            # Run the agent with the current task and context
-            result = await Runner.run(agent, current_task, context=global_context)
-            current_output = result.final_output
-            
-            logging.info(f"[WORKFLOW] ✅ Agent '{agent_name}' completed")
-            logging.info(f"[WORKFLOW]   Output: {current_output[:200]}...")  # Log first 200 chars
-            
-            # Output of this agent becomes input for next agent
-            if i < len(agent_list) - 1:
-                next_agent_name = agent_names[i + 1]
-                # Format the task for the next agent: include context from previous step
-                current_task = f"Previous step output from {agent_name}: {current_output}\n\nYour task: Continue the workflow by processing this output."
-                logging.info(f"[WORKFLOW]   Passing output to next agent: {next_agent_name}")
-            else:
-                # Last agent - return its output
-                logging.info(f"[WORKFLOW] ✅ Chain completed successfully")
-                return current_output
+        # Each agent's output, handed off as its policy says, becomes the next agent's input
+        output = await run_chain(
+            agents,
+            user_task,
+            run_context,
+            run_config,
+            model_name=workflow_config.model_name,
+            handoff=workflow_config.handoff,
+            handoffs=workflow_config.handoffs,
+        )
+        logging.info(f"[WORKFLOW] ✅ Chain completed successfully")
+        return output
 
     elif workflow_config.relations_type == "group-chat":
-        logging.info(f"[WORKFLOW] Group chat mode not implemented yet")
-        pass # Build script that adds all agents to each other
+        logging.info(f"[WORKFLOW] Group chat mode - {workflow_config.speaker_selection} speaker selection, up to {workflow_config.max_turns} turns")
+        chat = GroupChat(
+            agents=agents,
+            run_context=run_context,
+            objective=workflow_config.objective,
+            model_name=workflow_config.model_name,
+            run_config=run_config,
+            finisher=workflow_config.finisher,
+            speaker_selection=workflow_config.speaker_selection,
+            max_turns=workflow_config.max_turns,
+            max_tokens=workflow_config.max_chat_tokens,
+            window=workflow_config.chat_window,
+        )
+        output = await chat.run(user_task)
+        logging.info(f"[WORKFLOW] ✅ Group chat completed after {len(chat.turns)} turns, {chat.total_tokens} tokens")
+        logging.info(f"[WORKFLOW]   Final output: {output}")
+        return output
 
     elif workflow_config.relations_type == "triage":
         logging.info(f"[WORKFLOW] Creating triage agent with handoffs")
@@ -213,26 +289,116 @@ async def start_agents(workflow_config: WorkflowConfig, user_task: str, user_id:
             name="handoff agent", 
             instructions=overview, 
             model=workflow_config.model_name,
-            handoffs=[a for a in agents.values()]
+            handoffs=[a for a in agents.values()],
+            model_settings=cache_settings(overview, workflow_config.model_name),
         )
-        logging.info(f"[WORKFLOW] Running triage agent with context: {global_context}")
-        result = await Runner.run(manager_agent, user_task, context=global_context)
+        logging.info(f"[WORKFLOW] Running triage agent with context: {run_context.context}")
+        result = await run_context.run_agent(manager_agent, user_task, run_config)
         logging.info(f"[WORKFLOW] ✅ Workflow completed successfully")
         logging.info(f"[WORKFLOW]   Final output: {result.final_output}")
         return result.final_output
 
+    elif workflow_config.relations_type == "parallel":
+        logging.info(f"[WORKFLOW] Parallel mode - fan out to agents, then reduce")
+        output = await _run_parallel(workflow_config, agents, user_task, run_context, run_config)
+        logging.info(f"[WORKFLOW] ✅ Workflow completed successfully")
+        logging.info(f"[WORKFLOW]   Final output: {output}")
+        return output
+
+    elif workflow_config.relations_type == "graph":
+        graph = WorkflowGraph([a.name for a in workflow_config.agents], workflow_config.edges)
+        logging.info(f"[WORKFLOW] Graph mode - {len(graph.nodes)} agents, {len(workflow_config.edges)} edges, order: {graph.order}")
+        output = await run_graph(graph, agents, user_task, run_context, run_config, max_parallel=workflow_config.max_parallel)
+        logging.info(f"[WORKFLOW] ✅ Workflow completed successfully")
+        logging.info(f"[WORKFLOW]   Final output: {output}")
+        return output
+
     elif workflow_config.relations_type == "single":
         first_agent_name = workflow_config.agents[0].name
         logging.info(f"[WORKFLOW] Running single agent: {first_agent_name}")
         first_agent = agents[first_agent_name]
-        logging.info(f"[WORKFLOW] Running with context: {global_context}")
-        result = await Runner.run(first_agent, user_task, context=global_context)
+        logging.info(f"[WORKFLOW] Running with context: {run_context.context}")
+        result = await run_context.run_agent(first_agent, user_task, run_config)
         logging.info(f"[WORKFLOW] ✅ Workflow completed successfully")
         logging.info(f"[WORKFLOW]   Final output: {result.final_output}")
         return result.final_output
 
 
 
+REDUCER_PROMPT = """You combine the work of several agents that worked on the same task in parallel.
+Merge their outputs into a single answer to the user's task. Do not drop information, resolve
+contradictions and mention which parts could not be completed.
+
+Objective:
+{objective}
+"""
+
+
+async def _run_parallel(
+    workflow_config: WorkflowConfig, agents: Dict[str, Agent], user_task: str, run_context: RunContext, run_config
+) -> str:
+    """
+    Runs every branch agent on the user task concurrently and feeds their outputs to the reducer.
+
+    Up to `max_parallel` branches run at the same time, each bounded by `branch_timeout_seconds`.
+    Failed or timed out branches are reported to the reducer instead of failing the workflow.
+    """
+    if workflow_config.reducer is not None and workflow_config.reducer not in agents:
+        raise ValueError(f"Reducer agent '{workflow_config.reducer}' not found")
+
+    branches = {name: agent for name, agent in agents.items() if name != workflow_config.reducer}
+    if not branches:
+        raise ValueError("Parallel mode needs at least one agent besides the reducer")
+
+    semaphore = asyncio.Semaphore(max(1, workflow_config.max_parallel))
+    timeout = workflow_config.branch_timeout_seconds
+
+    async def _branch(name: str, agent: Agent) -> str:
+        async with semaphore:
+            logging.info(f"[PARALLEL] 🔀 Running branch '{name}'")
+            started = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(run_context.run_agent(agent, user_task, run_config), timeout=timeout)
+            except asyncio.TimeoutError:
+                logging.warning(f"[PARALLEL] ⏱️  Branch '{name}' timed out after {timeout}s")
+                raise TimeoutError(f"timed out after {timeout}s")
+            except Exception as e:
+                logging.error(f"[PARALLEL] ❌ Branch '{name}' failed: {type(e).__name__}: {e}")
+                raise
+            logging.info(f"[PARALLEL] ✅ Branch '{name}' completed in {time.perf_counter() - started:.2f}s")
+            return str(result.final_output)
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(_branch(name, agent) for name, agent in branches.items()), return_exceptions=True)
+    logging.info(f"[PARALLEL] All {len(branches)} branches finished in {time.perf_counter() - started:.2f}s")
+
+    for outcome in outcomes:
+        if isinstance(outcome, asyncio.CancelledError):
+            raise outcome
+    if all(isinstance(outcome, BaseException) for outcome in outcomes):
+        raise RuntimeError(f"All parallel branches failed: {outcomes[0]}")
+
+    reducer_input = f"User task: {user_task}\n\nOutputs of the parallel agents:\n"
+    for name, outcome in zip(branches, outcomes):
+        if isinstance(outcome, BaseException):
+            reducer_input += f"\n### {name} (failed)\n{type(outcome).__name__}: {outcome}\n"
+        else:
+            reducer_input += f"\n### {name}\n{outcome}\n"
+
+    if workflow_config.reducer is not None:
+        reducer = agents[workflow_config.reducer]
+    else:
+        instructions = REDUCER_PROMPT.format(objective=workflow_config.objective)
+        reducer = Agent(
+            name="reducer agent",
+            instructions=instructions,
+            model=workflow_config.model_name,
+            model_settings=cache_settings(instructions, workflow_config.model_name),
+        )
+    logging.info(f"[PARALLEL] Running reducer '{reducer.name}'")
+    result = await run_context.run_agent(reducer, reducer_input, run_config)
+    return result.final_output
+
 ## TODO
 # https://openai.github.io/openai-agents-python/handoffs/
 # custom handoffs with predefined inputs!!!
@@ -241,13 +407,6 @@ async def start_agents(workflow_config: WorkflowConfig, user_task: str, user_id:
 ## OpenAI websearch support
 ## OpenAI file support
 
-## TODO
-## ASYNC tools calling
-## More agent patterns -> handoffs, chain, group-chat, etc.
-
-## TODO
-## Proper context passing for user_id
-
 ## TODO
 ## Add smitery API key resolution
 
@@ -0,0 +1,149 @@
+import asyncio
+import functools
+import os
+import threading
+from typing import Any, Dict, Optional
+
+import httpx
+import openai
+from arcadepy import AsyncArcade, DefaultAsyncHttpxClient  # type: ignore
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Connection pool configuration
+ARCADE_MAX_CONNECTIONS = int(os.getenv("ARCADE_MAX_CONNECTIONS", "100"))
+ARCADE_MAX_KEEPALIVE = int(os.getenv("ARCADE_MAX_KEEPALIVE", "20"))
+ARCADE_KEEPALIVE_EXPIRY = float(os.getenv("ARCADE_KEEPALIVE_EXPIRY", "30"))
+ARCADE_TIMEOUT = float(os.getenv("ARCADE_TIMEOUT", "60"))
+
+
+class ArcadeClientPool:
+    """
+    Shared Arcade clients with pooled keep-alive connections.
+
+    httpx connections belong to the event loop that opened them, so one AsyncArcade client is
+    kept per event loop (the API loop plus each scheduler loop) and reused by every run on it.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = ARCADE_MAX_CONNECTIONS,
+        max_keepalive_connections: int = ARCADE_MAX_KEEPALIVE,
+        keepalive_expiry: float = ARCADE_KEEPALIVE_EXPIRY,
+        timeout: float = ARCADE_TIMEOUT,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._clients: Dict[asyncio.AbstractEventLoop, AsyncArcade] = {}
+
+    def async_client(self) -> AsyncArcade:
+        """Return the AsyncArcade client of the running event loop, creating it on first use."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.get(loop)
+            if client is None:
+                client = AsyncArcade(
+                    timeout=self.timeout,
+                    # Retried by the rate limiter
+                    max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(limits=self.limits, timeout=self.timeout),
+                )
+                self._clients[loop] = client
+                logger.info(f"[ARCADE] Created pooled Arcade client for event loop {id(loop)}")
+            return client
+
+    async def authorize(self, tool_name: str, user_id: str) -> Any:
+        """Start (or check) the authorization of `tool_name` for `user_id`."""
+        return await self.async_client().tools.authorize(tool_name=tool_name, user_id=user_id)
+
+    async def aclose_current(self) -> None:
+        """Close the client of the running event loop. Call before the loop shuts down."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.close()
+            logger.info(f"[ARCADE] Closed Arcade client for event loop {id(loop)}")
+
+    def client_count(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+
+arcade_clients = ArcadeClientPool()
+
+
+class OpenAIClientPool:
+    """
+    OpenAI clients for the model calls of runs, one per event loop like ArcadeClientPool.
+
+    The clients do not retry on their own: failed requests are retried (and paced and circuit
+    broken) by factory.rate_limit only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: Dict[asyncio.AbstractEventLoop, openai.AsyncOpenAI] = {}
+        self._unavailable = False
+
+    def async_client(self) -> Optional[openai.AsyncOpenAI]:
+        """
+        Return the OpenAI client of the running event loop, creating it on first use. None when
+        no client can be built (no API key configured), the SDK then uses its default client.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._unavailable:
+                return None
+            client = self._clients.get(loop)
+            if client is None:
+                try:
+                    client = openai.AsyncOpenAI(max_retries=0, http_client=openai.DefaultAsyncHttpxClient())
+                except openai.OpenAIError as e:
+                    # Logged once, runs keep asking for a client
+                    self._unavailable = True
+                    logger.warning(f"[OPENAI] No pooled OpenAI client, models use the SDK default client: {e}")
+                    return None
+                self._clients[loop] = client
+                logger.info(f"[OPENAI] Created pooled OpenAI client for event loop {id(loop)}")
+            return client
+
+    async def aclose_current(self) -> None:
+        """Close the client of the running event loop. Call before the loop shuts down."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._clients.pop(loop, None)
+        if client is not None:
+            await client.close()
+            logger.info(f"[OPENAI] Closed OpenAI client for event loop {id(loop)}")
+
+    def client_count(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+
+openai_clients = OpenAIClientPool()
+
+
+def rebind_arcade_tool(tool: Any, client: Optional[AsyncArcade]) -> Any:
+    """
+    Point an agents_arcade FunctionTool at `client`.
+
+    agents_arcade binds the client that fetched the definition into on_invoke_tool, a
+    functools.partial; tools shared across runs must call Arcade through the current loop's client.
+    """
+    invoke = tool.on_invoke_tool
+    if client is None or not isinstance(invoke, functools.partial):
+        return tool
+    if "client" not in invoke.keywords or invoke.keywords["client"] is client:
+        return tool
+
+    tool.on_invoke_tool = functools.partial(invoke.func, *invoke.args, **{**invoke.keywords, "client": client})
+    return tool
@@ -0,0 +1,319 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import AsyncExitStack, contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from agents import Agent, Runner, RunConfig, custom_span, function_tool, set_trace_processors, tracing  # type: ignore
+from agents.models.multi_provider import MultiProvider  # type: ignore
+from agents.result import RunResultBase  # type: ignore
+
+from factory.events import RunEventLog, RunEventProcessor
+from factory.metrics import metrics
+from factory.profiling import RunTimings, StageTimingProcessor, reset_current_timings, set_current_timings
+from factory.clients import openai_clients
+from factory.rate_limit import RateLimitedModelProvider
+from factory.result_cache import result_cache
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Delegations of a manager agent running at the same time within one run
+MAX_CONCURRENT_DELEGATIONS = int(os.getenv("FACTORY_MAX_CONCURRENT_DELEGATIONS", "4"))
+
+llm_tokens = metrics.counter(
+    "factory_llm_tokens_total", "LLM tokens of agent runs (input excludes cached input)", ("type",),
+)
+
+
+def result_usage(result: Any) -> Dict[str, int]:
+    """Token usage of an agent run: input, cached input, output and total tokens."""
+    usage = getattr(getattr(result, "context_wrapper", None), "usage", None)
+    if usage is None:
+        return {"requests": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+    details = getattr(usage, "input_tokens_details", None)
+    return {
+        "requests": usage.requests,
+        "input_tokens": usage.input_tokens,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        "output_tokens": usage.output_tokens,
+        "total_tokens": usage.total_tokens,
+    }
+
+
+class RunContext:
+    """
+    Execution state for a single workflow run.
+
+    Holds the run's agent registry, the user context passed to tools, the trace processor and
+    the event log of the run, so concurrent workflows in one process (and one event loop) stay
+    isolated.
+    """
+
+    def __init__(
+        self,
+        user_id: str,
+        run_id: Optional[str] = None,
+        tracer: Optional[tracing.TracingProcessor] = None,
+        events: Optional[RunEventLog] = None,
+    ):
+        self.run_id = run_id or str(uuid4())
+        self.user_id = user_id
+        self.agents: Dict[str, Agent] = {}
+        self.context: Dict[str, Any] = {"user_id": user_id}
+        self.tracer = tracer
+        self.events = events
+        self.build_timings: Dict[str, float] = {}
+        # Seconds per stage and agent; `profile` collects a span timeline when the run is profiled
+        self.timings = RunTimings()
+        self.profile: Optional[List[Dict[str, Any]]] = None
+        self.started_at = time.time()
+        self.workflow_cache_hit: Optional[bool] = None
+        self.config_hash: Optional[str] = None
+        # Per-node status and output of graph workflows
+        self.node_results: Dict[str, Dict[str, Any]] = {}
+        # Token usage of every agent run, summed; cached_tokens shows the prompt cache savings
+        self.usage: Dict[str, int] = result_usage(None)
+        # Token usage per turn of group-chat workflows and per step and hand-off of chains
+        self.turn_usage: List[Dict[str, Any]] = []
+        # In-flight and finished delegations by (agent, task), identical delegations share a result
+        self._delegations: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._delegation_slots = asyncio.Semaphore(max(1, MAX_CONCURRENT_DELEGATIONS))
+        # Run-scoped resources such as MCP session leases, closed when the run ends
+        self.resources = AsyncExitStack()
+
+    def run_config(self, workflow_name: str = "Agent workflow") -> RunConfig:
+        """
+        RunConfig that tags the traces of this run so they reach the run's tracer, and sends its
+        model calls through the shared rate limiter.
+        """
+        return RunConfig(
+            workflow_name=workflow_name,
+            trace_metadata={"run_id": self.run_id, "user_id": self.user_id},
+            model_provider=RateLimitedModelProvider(MultiProvider(openai_client=openai_clients.async_client())),
+        )
+
+    def trace_processors(self) -> List[tracing.TracingProcessor]:
+        """Processors receiving the traces of this run."""
+        processors = []
+        if self.tracer is not None:
+            processors.append(self.tracer)
+        if self.events is not None:
+            processors.append(RunEventProcessor(self.events))
+        processors.append(StageTimingProcessor(self.timings, self.profile, self.started_at))
+        return processors
+
+    async def run_agent(self, agent: Agent, task: Any, run_config: Optional[RunConfig] = None) -> RunResultBase:
+        """
+        Run `agent` with this run's context.
+
+        When the run has an event log the agent is streamed and its text deltas are published
+        as `token.delta` events.
+        """
+        run_config = run_config or self.run_config()
+        if self.events is None:
+            result = await Runner.run(agent, task, context=self.context, run_config=run_config)
+            self._add_usage(result)
+            return result
+
+        result = Runner.run_streamed(agent, task, context=self.context, run_config=run_config)
+        current_agent = agent.name
+        try:
+            async for event in result.stream_events():
+                if event.type == "raw_response_event":
+                    if getattr(event.data, "type", None) == "response.output_text.delta":
+                        self.events.publish("token.delta", agent=current_agent, delta=event.data.delta)
+                elif event.type == "agent_updated_stream_event":
+                    current_agent = event.new_agent.name
+                    self.events.publish("agent.updated", agent=current_agent)
+        except asyncio.CancelledError:
+            # The streamed run executes in its own task, stop it with the run
+            result.cancel()
+            raise
+        self._add_usage(result)
+        return result
+
+    def _add_usage(self, result: RunResultBase) -> None:
+        usage = result_usage(result)
+        for key, value in usage.items():
+            self.usage[key] += value
+        llm_tokens.inc("input", amount=usage["input_tokens"] - usage["cached_tokens"])
+        llm_tokens.inc("cached", amount=usage["cached_tokens"])
+        llm_tokens.inc("output", amount=usage["output_tokens"])
+
+    def delegate_tool(self):
+        """
+        Build the delegate_task tool bound to this run's agents and context.
+
+        Delegations issued in the same turn run concurrently, up to FACTORY_MAX_CONCURRENT_DELEGATIONS
+        per run; an identical (agent, task) delegation reuses the result of the first one.
+        """
+        run_context = self
+
+        @function_tool
+        async def delegate_task(agent_name: str, task: str):
+            logging.info(f"[DELEGATE] 🔄 Delegating to agent '{agent_name}' (run {run_context.run_id})")
+            logging.info(f"[DELEGATE]   Task: {task}")
+
+            if agent_name not in run_context.agents:
+                logging.error(f"[DELEGATE] ❌ Agent '{agent_name}' not found in agents dict. Available: {list(run_context.agents.keys())}")
+                raise ValueError(f"Agent '{agent_name}' not found")
+
+            agent = run_context.agents[agent_name]
+
+            # Log agent capabilities
+            has_tools = hasattr(agent, 'tools')
+            tool_count = len(agent.tools) if has_tools else 0
+            logging.info(f"[DELEGATE]   Agent has tools: {has_tools}, count: {tool_count}")
+
+            if has_tools and tool_count > 0:
+                tool_names = [getattr(t, 'name', str(t)) for t in agent.tools]
+                logging.info(f"[DELEGATE]   Available tools: {tool_names}")
+
+            logging.info(f"[DELEGATE]   Context: {run_context.context}")
+
+            key = (agent_name, " ".join(task.split()))
+            delegation = run_context._delegations.get(key)
+            if delegation is not None:
+                logging.info(f"[DELEGATE] ♻️  Identical delegation to '{agent_name}' already issued in this run, reusing it")
+                with custom_span("delegate_task", data={"agent": agent_name, "deduplicated": True}):
+                    return await asyncio.shield(delegation)
+
+            # Delegations to read-only agents may be answered from earlier runs of the same workflow
+            cache_ttl = result_cache.delegate_ttl_for(agent)
+            cache_tool = f"delegate_task:{run_context.config_hash}:{agent_name}"
+            if cache_ttl > 0:
+                hit, cached = result_cache.get(run_context.user_id, cache_tool, key[1])
+                if hit:
+                    logging.info(f"[DELEGATE] ♻️  Delegation to '{agent_name}' served from the result cache")
+                    return cached
+
+            delegation = asyncio.ensure_future(run_context._delegate(agent, task))
+            run_context._delegations[key] = delegation
+            try:
+                output = await delegation
+                if cache_ttl > 0:
+                    result_cache.put(run_context.user_id, cache_tool, key[1], output, cache_ttl)
+                return output
+            except BaseException:
+                # Let the manager retry a failed delegation
+                if run_context._delegations.get(key) is delegation:
+                    del run_context._delegations[key]
+                raise
+
+        return delegate_task
+
+    async def _delegate(self, agent: Agent, task: str) -> Any:
+        async with self._delegation_slots:
+            started = time.perf_counter()
+            with custom_span("delegate_task", data={"agent": agent.name, "deduplicated": False}) as span:
+                try:
+                    logging.info(f"[DELEGATE] 🚀 Running agent '{agent.name}'...")
+                    result = await self.run_agent(agent, task)
+                    logging.info(f"[DELEGATE] ✅ Agent '{agent.name}' completed successfully")
+                    logging.info(f"[DELEGATE]   Output: {result.final_output}")
+                    return result.final_output
+                except Exception as e:
+                    logging.error(f"[DELEGATE] ❌ Agent '{agent.name}' failed: {type(e).__name__}: {e}")
+                    logging.exception(f"[DELEGATE]   Full traceback:")
+                    raise
+                finally:
+                    span.span_data.data["latency_seconds"] = time.perf_counter() - started
+
+
+class RunTraceRouter(tracing.TracingProcessor):  # type: ignore[misc]
+    """
+    Process-wide trace processor that forwards each trace to the tracer of the run that owns it.
+
+    The agents SDK only supports global trace processors, so runs are matched through the
+    `run_id` in the trace metadata set by RunContext.run_config().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runs: Dict[str, RunContext] = {}
+        self._traces: Dict[str, Tuple[RunContext, List[tracing.TracingProcessor]]] = {}
+
+    def register(self, run_context: RunContext) -> None:
+        with self._lock:
+            self._runs[run_context.run_id] = run_context
+
+    def unregister(self, run_context: RunContext) -> None:
+        with self._lock:
+            self._runs.pop(run_context.run_id, None)
+
+    def _forward(self, route: Optional[Tuple[RunContext, List[tracing.TracingProcessor]]], method: str, item: Any) -> None:
+        if route is None:
+            return
+        run_context, processors = route
+        # Trace processing runs inline with the agents, its cost is part of the run's timings
+        started = time.perf_counter()
+        for processor in processors:
+            getattr(processor, method)(item)
+        run_context.timings.add("tracing", time.perf_counter() - started)
+
+    def on_trace_start(self, trace: tracing.Trace) -> None:
+        metadata = (trace.export() or {}).get("metadata") or {}
+        with self._lock:
+            run_context = self._runs.get(metadata.get("run_id"))
+            if run_context is None:
+                return
+            route = self._traces[trace.trace_id] = (run_context, run_context.trace_processors())
+        self._forward(route, "on_trace_start", trace)
+
+    def on_trace_end(self, trace: tracing.Trace) -> None:
+        with self._lock:
+            route = self._traces.pop(trace.trace_id, None)
+        self._forward(route, "on_trace_end", trace)
+
+    def on_span_start(self, span: tracing.Span) -> None:
+        with self._lock:
+            route = self._traces.get(span.trace_id)
+        self._forward(route, "on_span_start", span)
+
+    def on_span_end(self, span: tracing.Span) -> None:
+        with self._lock:
+            route = self._traces.get(span.trace_id)
+        self._forward(route, "on_span_end", span)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            processors = {id(run.tracer): run.tracer for run in self._runs.values() if run.tracer}
+        for processor in processors.values():
+            processor.shutdown()
+
+    def force_flush(self) -> None:
+        with self._lock:
+            processors = {id(run.tracer): run.tracer for run in self._runs.values() if run.tracer}
+        for processor in processors.values():
+            processor.force_flush()
+
+
+trace_router = RunTraceRouter()
+_router_installed = False
+_router_install_lock = threading.Lock()
+
+
+@contextmanager
+def traced_run(run_context: RunContext) -> Iterator[RunContext]:
+    """
+    Route the traces of `run_context` to its processors for the duration of the block, and
+    record stage timings (see factory.profiling) of the block and the tasks it starts on the run.
+    """
+    global _router_installed
+
+    with _router_install_lock:
+        if not _router_installed:
+            set_trace_processors([trace_router])
+            _router_installed = True
+
+    trace_router.register(run_context)
+    token = set_current_timings(run_context.timings)
+    try:
+        yield run_context
+    finally:
+        reset_current_timings(token)
+        trace_router.unregister(run_context)
@@ -0,0 +1,186 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from agents import tracing  # type: ignore
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Event stream configuration
+RUN_EVENTS_MAX_PER_RUN = int(os.getenv("RUN_EVENTS_MAX_PER_RUN", "5000"))
+RUN_EVENTS_RETENTION = float(os.getenv("RUN_EVENTS_RETENTION", "900"))
+RUN_EVENTS_MAX_RUNS = int(os.getenv("RUN_EVENTS_MAX_RUNS", "2000"))
+
+# Events that end a run's stream
+TERMINAL_EVENTS = ("run.completed", "run.failed", "run.cancelled")
+
+
+class RunEventLog:
+    """
+    Append-only, bounded event log of a single run.
+
+    Every event gets a sequence number that clients use as a cursor: since(cursor) returns the
+    events after it, so a reconnecting client resumes where it stopped instead of replaying the
+    run. Events are published from the worker loop running the workflow and awaited from the API
+    loop, so waiters are woken across loops.
+    """
+
+    def __init__(self, run_id: str, max_events: int = RUN_EVENTS_MAX_PER_RUN):
+        self.run_id = run_id
+        self._lock = threading.Lock()
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self._waiters: List[asyncio.Future] = []
+        self._next_id = 1
+        self.closed_at: Optional[float] = None
+
+    @property
+    def closed(self) -> bool:
+        return self.closed_at is not None
+
+    def publish(self, event_type: str, **data: Any) -> int:
+        """Append an event and wake the subscribers. Returns its sequence number."""
+        with self._lock:
+            if self.closed:
+                return self._next_id - 1
+            event_id = self._next_id
+            self._next_id += 1
+            self._events.append({"id": event_id, "type": event_type, "time": time.time(), "data": data})
+            if event_type in TERMINAL_EVENTS:
+                self.closed_at = time.monotonic()
+            waiters, self._waiters = self._waiters, []
+
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.get_loop().call_soon_threadsafe(self._notify, waiter)
+        return event_id
+
+    def since(self, cursor: int = 0) -> Tuple[List[Dict[str, Any]], bool]:
+        """Events after `cursor` and whether the run has ended."""
+        with self._lock:
+            events = [event for event in self._events if event["id"] > cursor]
+            # Events the client missed were evicted, say so instead of silently skipping them
+            if self._events and cursor + 1 < self._events[0]["id"]:
+                events.insert(0, {
+                    "id": self._events[0]["id"] - 1,
+                    "type": "stream.truncated",
+                    "time": time.time(),
+                    "data": {"missed_from": cursor + 1, "missed_to": self._events[0]["id"] - 1},
+                })
+            return events, self.closed
+
+    async def wait(self, cursor: int, timeout: Optional[float] = None) -> bool:
+        """Wait until there are events after `cursor` or the run ends. Returns False on timeout."""
+        with self._lock:
+            if self.closed or self._next_id - 1 > cursor:
+                return True
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+    @staticmethod
+    def _notify(waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.set_result(None)
+
+
+class RunEventHub:
+    """Event logs of recent runs; ended runs are kept for `retention` seconds for late subscribers."""
+
+    def __init__(self, retention: float = RUN_EVENTS_RETENTION, max_runs: int = RUN_EVENTS_MAX_RUNS):
+        self.retention = retention
+        self.max_runs = max_runs
+        self._lock = threading.Lock()
+        self._logs: "OrderedDict[str, RunEventLog]" = OrderedDict()
+
+    def create(self, run_id: str) -> RunEventLog:
+        with self._lock:
+            self._evict()
+            log = self._logs[run_id] = RunEventLog(run_id)
+            return log
+
+    def get(self, run_id: str) -> Optional[RunEventLog]:
+        with self._lock:
+            self._evict()
+            return self._logs.get(run_id)
+
+    def discard(self, run_id: str) -> None:
+        with self._lock:
+            self._logs.pop(run_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "runs": len(self._logs),
+                "active": sum(1 for log in self._logs.values() if not log.closed),
+            }
+
+    def _evict(self) -> None:
+        # Lock must be held
+        now = time.monotonic()
+        for run_id, log in list(self._logs.items()):
+            if log.closed and now - log.closed_at >= self.retention:
+                del self._logs[run_id]
+
+        # Over capacity, drop the oldest ended runs first
+        ended = [run_id for run_id, log in self._logs.items() if log.closed]
+        while len(self._logs) >= self.max_runs and ended:
+            del self._logs[ended.pop(0)]
+
+
+class RunEventProcessor(tracing.TracingProcessor):  # type: ignore[misc]
+    """Publishes agent, tool and handoff span starts and ends of a run to its event log."""
+
+    def __init__(self, events: RunEventLog):
+        self.events = events
+
+    def on_trace_start(self, trace: tracing.Trace) -> None:
+        pass
+
+    def on_trace_end(self, trace: tracing.Trace) -> None:
+        pass
+
+    def on_span_start(self, span: tracing.Span) -> None:
+        self.events.publish("span.start", **self._describe(span))
+
+    def on_span_end(self, span: tracing.Span) -> None:
+        data = self._describe(span)
+        if span.error:
+            data["error"] = span.error.get("message")
+        self.events.publish("span.end", **data)
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self) -> None:
+        pass
+
+    @staticmethod
+    def _describe(span: tracing.Span) -> Dict[str, Any]:
+        span_data = span.span_data
+        data: Dict[str, Any] = {
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "span_type": span_data.type,
+        }
+        for attr in ("name", "from_agent", "to_agent"):
+            value = getattr(span_data, attr, None)
+            if value is not None:
+                data[attr] = value
+        return data
+
+
+run_events = RunEventHub()
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+from agents import Agent  # type: ignore
+from pydantic import BaseModel
+
+from factory.context import RunContext
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class WorkflowEdge(BaseModel):
+    """The output of `source` is an input of `target`."""
+    source: str
+    target: str
+
+
+class WorkflowGraph:
+    """Dependency graph of the agents of a `graph` workflow, validated to be acyclic."""
+
+    def __init__(self, nodes: List[str], edges: List[WorkflowEdge]):
+        self.nodes = list(nodes)
+        self.predecessors: Dict[str, List[str]] = {node: [] for node in self.nodes}
+        self.successors: Dict[str, List[str]] = {node: [] for node in self.nodes}
+        for edge in edges:
+            for node in (edge.source, edge.target):
+                if node not in self.predecessors:
+                    raise ValueError(f"Edge {edge.source} -> {edge.target} references unknown agent '{node}'")
+            if edge.source not in self.predecessors[edge.target]:
+                self.predecessors[edge.target].append(edge.source)
+                self.successors[edge.source].append(edge.target)
+        self.order = self._topological_order()
+
+    @property
+    def sinks(self) -> List[str]:
+        return [node for node in self.order if not self.successors[node]]
+
+    def descendants(self, node: str) -> List[str]:
+        seen: List[str] = []
+        pending = deque(self.successors[node])
+        while pending:
+            current = pending.popleft()
+            if current not in seen:
+                seen.append(current)
+                pending.extend(self.successors[current])
+        return seen
+
+    def _topological_order(self) -> List[str]:
+        in_degree = {node: len(preds) for node, preds in self.predecessors.items()}
+        ready = deque(node for node in self.nodes if in_degree[node] == 0)
+        order: List[str] = []
+        while ready:
+            node = ready.popleft()
+            order.append(node)
+            for successor in self.successors[node]:
+                in_degree[successor] -= 1
+                if in_degree[successor] == 0:
+                    ready.append(successor)
+        if len(order) != len(self.nodes):
+            cycle = [node for node in self.nodes if node not in order]
+            raise ValueError(f"Workflow graph has a cycle through: {cycle}")
+        return order
+
+
+def _render_outputs(outputs: Dict[str, Any]) -> str:
+    rendered = ""
+    for name, output in outputs.items():
+        text = output if isinstance(output, str) else json.dumps(output, default=str, indent=2)
+        rendered += f"\n### {name}\n{text}\n"
+    return rendered
+
+
+def _node_input(user_task: str, inputs: Dict[str, Any]) -> str:
+    if not inputs:
+        return user_task
+    return f"User task: {user_task}\n\nInputs from upstream agents:\n" + _render_outputs(inputs)
+
+
+def _output_value(output: Any) -> Any:
+    # Structured agent outputs travel along edges as plain data
+    if isinstance(output, BaseModel):
+        return output.model_dump(mode="json")
+    return output
+
+
+async def run_graph(
+    graph: WorkflowGraph,
+    agents: Dict[str, Agent],
+    user_task: str,
+    run_context: RunContext,
+    run_config=None,
+    max_parallel: int = 8,
+) -> Any:
+    """
+    Runs the agents of `graph` as soon as all their inputs are available.
+
+    Every ready node runs concurrently (up to `max_parallel`), so the workflow finishes in
+    critical-path time. A node receives the outputs of its predecessors; when a node fails its
+    descendants are skipped while independent branches carry on. Node results are kept on
+    `run_context.node_results`: nodes already marked completed there (from an earlier run, see
+    `resume_from`) are not executed again, so a resubmitted run only re-executes failed nodes.
+    """
+    results = run_context.node_results
+    semaphore = asyncio.Semaphore(max(1, max_parallel))
+
+    def _publish(event_type: str, node: str, **data: Any) -> None:
+        if run_context.events is not None:
+            run_context.events.publish(event_type, node=node, **data)
+
+    async def _run_node(node: str) -> None:
+        inputs = {pred: results[pred]["output"] for pred in graph.predecessors[node]}
+        async with semaphore:
+            logging.info(f"[GRAPH] ▶️  Running node '{node}' with inputs from {list(inputs)}")
+            _publish("node.started", node)
+            attempts = results.get(node, {}).get("attempts", 0) + 1
+            started = time.perf_counter()
+            try:
+                result = await run_context.run_agent(agents[node], _node_input(user_task, inputs), run_config)
+            except Exception as e:
+                logging.error(f"[GRAPH] ❌ Node '{node}' failed: {type(e).__name__}: {e}")
+                results[node] = {
+                    "status": "failed", "error": f"{type(e).__name__}: {e}",
+                    "seconds": time.perf_counter() - started, "attempts": attempts,
+                }
+                _publish("node.failed", node, error=results[node]["error"])
+                return
+
+            results[node] = {
+                "status": "completed", "output": _output_value(result.final_output),
+                "seconds": time.perf_counter() - started, "attempts": attempts,
+            }
+            logging.info(f"[GRAPH] ✅ Node '{node}' completed in {results[node]['seconds']:.2f}s")
+            _publish("node.completed", node, seconds=results[node]["seconds"])
+
+    done = {node for node, result in results.items() if node in agents and result.get("status") == "completed"}
+    if done:
+        logging.info(f"[GRAPH] Reusing outputs of completed nodes: {sorted(done)}")
+    blocked = set()
+    running: Dict[asyncio.Task, str] = {}
+
+    def _schedule() -> None:
+        for node in graph.order:
+            if node in done or node in blocked or node in running.values():
+                continue
+            if all(pred in done for pred in graph.predecessors[node]):
+                running[asyncio.ensure_future(_run_node(node))] = node
+
+    try:
+        _schedule()
+        while running:
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                node = running.pop(task)
+                task.result()
+                if results[node]["status"] == "completed":
+                    done.add(node)
+                    continue
+                for descendant in graph.descendants(node):
+                    if descendant not in blocked:
+                        blocked.add(descendant)
+                        results[descendant] = {"status": "skipped", "error": f"upstream node '{node}' failed"}
+                        _publish("node.skipped", descendant, reason=results[descendant]["error"])
+                blocked.add(node)
+            _schedule()
+    finally:
+        for task in running:
+            task.cancel()
+
+    failed = [node for node in graph.order if results.get(node, {}).get("status") == "failed"]
+    if failed:
+        raise RuntimeError(f"Graph nodes failed: {', '.join(failed)}. Resubmit with resume_from to re-run them.")
+
+    sinks = graph.sinks
+    if len(sinks) == 1:
+        return results[sinks[0]]["output"]
+    return _render_outputs({sink: results[sink]["output"] for sink in sinks}).strip()
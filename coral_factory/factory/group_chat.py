@@ -0,0 +1,225 @@
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents import Agent  # type: ignore
+from agents.model_settings import ModelSettings  # type: ignore
+
+from factory.context import RunContext, result_usage
+from factory.handoff import count_tokens
+from factory.prompts import cache_settings
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Marker the finishing agent uses to end the chat
+DONE_MARKER = "[DONE]"
+
+TURN_PROMPT = """Group chat objective: {objective}
+User task: {user_task}
+
+Participants:
+{participants}
+{summary}
+Recent messages:
+{messages}
+
+It is your turn, {speaker}. Add your contribution to the conversation; do not repeat what others already said.
+{closing}"""
+
+SELECTOR_PROMPT = """You moderate a group chat between agents. Given the participants and the recent messages,
+answer with the name of the participant who should speak next and nothing else."""
+
+SUMMARY_PROMPT = """You keep the running summary of a group chat. Merge the earlier summary and the new messages
+into one concise summary that keeps every decision, result and open question. Answer with the summary only."""
+
+
+class GroupChat:
+    """
+    Turn-based conversation between the agents of a `group-chat` workflow.
+
+    Each turn one speaker is selected (round robin, or by a selector agent in "auto" mode) and
+    sees at most `window` recent messages verbatim plus a rolling summary of everything older, so the
+    prompt stays bounded however long the chat runs. The chat ends when the `finisher` agent
+    answers with [DONE], or after `max_turns` turns or once `max_tokens` total tokens are spent.
+    Token usage of every turn (including selector and summary calls) is kept in `turns`.
+
+    `max_tokens` is checked before every model call: a call whose prompt does not fit in what is
+    left is not made (the selector falls back to round robin, the summary waits, a speaker turn
+    ends the chat) and the output of the others is capped to the rest. Prompt sizes are estimated
+    and a speaker using tools makes several calls per turn, so the total can still overshoot a little.
+    """
+
+    def __init__(
+        self,
+        agents: Dict[str, Agent],
+        run_context: RunContext,
+        objective: str,
+        model_name: str,
+        run_config=None,
+        finisher: Optional[str] = None,
+        speaker_selection: str = "round_robin",
+        max_turns: int = 12,
+        max_tokens: Optional[int] = None,
+        window: int = 6,
+    ):
+        if finisher is not None and finisher not in agents:
+            raise ValueError(f"Finisher agent '{finisher}' not found")
+        self.agents = agents
+        self.run_context = run_context
+        self.objective = objective
+        self.model_name = model_name
+        self.run_config = run_config
+        self.finisher = finisher
+        self.speaker_selection = speaker_selection
+        self.max_turns = max(1, max_turns)
+        self.max_tokens = max_tokens
+        self.window = max(1, window)
+        self.user_task = ""
+        self.transcript: List[Tuple[str, str]] = []
+        self.summary = ""
+        self._summarized = 0
+        self.turns: List[Dict[str, Any]] = run_context.turn_usage
+        self.total_tokens = 0
+
+    async def run(self, user_task: str) -> str:
+        self.user_task = user_task
+        stop_reason = "max_turns"
+        for turn in range(1, self.max_turns + 1):
+            if self.max_tokens is not None and self.total_tokens >= self.max_tokens:
+                stop_reason = "max_tokens"
+                break
+
+            speaker = await self._select_speaker(turn)
+            prompt = self._turn_prompt(speaker)
+            agent = self._within_budget(self.agents[speaker], prompt)
+            if agent is None:
+                stop_reason = "max_tokens"
+                break
+            logging.info(f"[GROUP_CHAT] 💬 Turn {turn}/{self.max_turns}: {speaker}")
+            started = time.perf_counter()
+            result = await self.run_context.run_agent(agent, prompt, self.run_config)
+            message = str(result.final_output)
+            self._record(turn, speaker, "message", result, time.perf_counter() - started)
+
+            if speaker == self.finisher and DONE_MARKER in message:
+                message = message.replace(DONE_MARKER, "").strip()
+                self.transcript.append((speaker, message))
+                stop_reason = "done"
+                break
+
+            self.transcript.append((speaker, message))
+            await self._compact(turn)
+
+        logging.info(
+            f"[GROUP_CHAT] Chat ended ({stop_reason}) after {len(self.transcript)} messages, "
+            f"{self.total_tokens} tokens"
+        )
+        if self.run_context.events is not None:
+            self.run_context.events.publish("chat.ended", reason=stop_reason, total_tokens=self.total_tokens)
+        if not self.transcript:
+            raise RuntimeError(f"Group chat ended before anybody spoke ({stop_reason})")
+        return self.transcript[-1][1]
+
+    async def _select_speaker(self, turn: int) -> str:
+        names = list(self.agents)
+        previous = self.transcript[-1][0] if self.transcript else None
+        fallback = names[(turn - 1) % len(names)]
+        if self.speaker_selection != "auto" or not self.transcript or len(names) == 1:
+            return fallback
+
+        selector = Agent(
+            name="speaker selector",
+            instructions=SELECTOR_PROMPT,
+            model=self.model_name,
+            model_settings=cache_settings(SELECTOR_PROMPT, self.model_name),
+        )
+        prompt = (
+            f"Objective: {self.objective}\nParticipants:\n{self._participants()}\n\n"
+            f"Recent messages:\n{self._messages()}\n\nThe last speaker was {previous}."
+        )
+        selector = self._within_budget(selector, prompt)
+        if selector is None:
+            return fallback
+        result = await self.run_context.run_agent(selector, prompt, self.run_config)
+        self._record(turn, "speaker selector", "selection", result)
+        choice = str(result.final_output).strip().strip(".\"'")
+        for name in names:
+            if name.lower() == choice.lower():
+                return name
+        logging.warning(f"[GROUP_CHAT] Selector chose unknown participant '{choice}', using {fallback}")
+        return fallback
+
+    async def _compact(self, turn: int) -> None:
+        """Fold older messages into the rolling summary once more than `window` are unsummarized."""
+        if len(self.transcript) - self._summarized <= self.window:
+            return
+        # Keep half a window verbatim so the summary is not rewritten every turn
+        evicted = self.transcript[self._summarized:len(self.transcript) - max(1, self.window // 2)]
+
+        summarizer = Agent(
+            name="chat summarizer",
+            instructions=SUMMARY_PROMPT,
+            model=self.model_name,
+            model_settings=cache_settings(SUMMARY_PROMPT, self.model_name),
+        )
+        new_messages = "\n".join(f"[{name}]: {text}" for name, text in evicted)
+        prompt = f"Earlier summary:\n{self.summary or '(none)'}\n\nNew messages:\n{new_messages}"
+        summarizer = self._within_budget(summarizer, prompt)
+        if summarizer is None:
+            logging.info("[GROUP_CHAT] Token budget too low to summarize, keeping the messages verbatim")
+            return
+        result = await self.run_context.run_agent(summarizer, prompt, self.run_config)
+        self._record(turn, "chat summarizer", "summary", result)
+        self.summary = str(result.final_output).strip()
+        self._summarized += len(evicted)
+
+    def _turn_prompt(self, speaker: str) -> str:
+        if speaker == self.finisher:
+            closing = f"When the user task is fully solved, give the final answer and end it with {DONE_MARKER}."
+        elif self.finisher is not None:
+            closing = f"{self.finisher} will give the final answer once the task is solved."
+        else:
+            closing = ""
+        summary = f"\nSummary of the earlier conversation:\n{self.summary}\n" if self.summary else ""
+        return TURN_PROMPT.format(
+            objective=self.objective,
+            user_task=self.user_task,
+            participants=self._participants(),
+            summary=summary,
+            messages=self._messages() or "(no messages yet)",
+            speaker=speaker,
+            closing=closing,
+        )
+
+    def _within_budget(self, agent: Agent, prompt: str) -> Optional[Agent]:
+        """
+        `agent` with its output capped to the tokens left after `prompt`, or None when the prompt
+        alone would exhaust the budget.
+        """
+        if self.max_tokens is None:
+            return agent
+        instructions = agent.instructions if isinstance(agent.instructions, str) else getattr(agent.instructions, "static_prompt", "")
+        output_tokens = self.max_tokens - self.total_tokens - count_tokens(f"{instructions}\n{prompt}", self.model_name)
+        if output_tokens <= 0:
+            return None
+        if agent.model_settings.max_tokens is not None:
+            output_tokens = min(output_tokens, agent.model_settings.max_tokens)
+        return agent.clone(model_settings=agent.model_settings.resolve(ModelSettings(max_tokens=output_tokens)))
+
+    def _participants(self) -> str:
+        return "\n".join(f"- {name}" for name in self.agents)
+
+    def _messages(self) -> str:
+        recent = self.transcript[self._summarized:]
+        return "\n\n".join(f"[{name}]: {text}" for name, text in recent)
+
+    def _record(self, turn: int, speaker: str, kind: str, result: Any, seconds: Optional[float] = None) -> None:
+        usage = result_usage(result)
+        self.total_tokens += usage["total_tokens"]
+        entry = {"turn": turn, "speaker": speaker, "kind": kind, **usage}
+        if seconds is not None:
+            entry["seconds"] = seconds
+        self.turns.append(entry)
+        if self.run_context.events is not None:
+            self.run_context.events.publish("chat.turn", **entry)
@@ -0,0 +1,205 @@
+import json
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Literal, Optional
+
+from agents import Agent  # type: ignore
+from pydantic import BaseModel
+
+from factory.context import RunContext, result_usage
+from factory.prompts import cache_settings
+
+try:
+    import tiktoken  # type: ignore
+except ImportError:
+    tiktoken = None
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Model condensing outputs for "summarize" hand-offs when the policy names none (default: the workflow model)
+HANDOFF_SUMMARY_MODEL = os.getenv("FACTORY_HANDOFF_SUMMARY_MODEL", "")
+
+# Rough characters per token when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+HANDOFF_TASK = "Previous step output from {agent}: {output}\n\nYour task: Continue the workflow by processing this output."
+
+SUMMARY_PROMPT = """You condense the output of one workflow step for the agent doing the next step. Keep every fact,
+figure, name, decision and open item the next step needs; drop reasoning, repetition and formatting.
+Answer with the condensed output only."""
+
+TRUNCATED_MARKER = "\n[... truncated]"
+
+
+class HandoffPolicy(BaseModel):
+    """
+    How the output of a chain step is handed to the next agent.
+
+    "full" passes the whole output, "truncate" keeps its first `max_tokens` tokens, "fields" keeps
+    the named `fields` of a JSON (or "field: value" lines) output and "summarize" has `model`
+    condense it. `max_tokens` caps what is handed over in every mode.
+    """
+    mode: Literal["full", "truncate", "fields", "summarize"] = "full"
+    max_tokens: Optional[int] = None
+    fields: List[str] = []
+    model: Optional[str] = None
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model.split("/")[-1])
+    except KeyError:
+        pass
+    except Exception as e:
+        logger.warning(f"[HANDOFF] No tokenizer for {model}, estimating token counts: {e}")
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"[HANDOFF] No tokenizer for {model}, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model: str) -> str:
+    """First `max_tokens` tokens of `text`, marked as truncated when anything was cut."""
+    encoding = _encoding(model)
+    if encoding is None:
+        limit = max_tokens * CHARS_PER_TOKEN
+        return text if len(text) <= limit else text[:limit] + TRUNCATED_MARKER
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens]) + TRUNCATED_MARKER
+
+
+def extract_fields(output: str, fields: List[str]) -> Optional[str]:
+    """The named fields of a JSON object output, or of "field: value" lines; None if none is found."""
+    text = output.strip()
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1).strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        picked = {field: data[field] for field in fields if field in data}
+        return json.dumps(picked, default=str) if picked else None
+
+    lines = []
+    for field in fields:
+        match = re.search(rf"^\W*{re.escape(field)}\W*[:=]\s*(.+)$", output, re.IGNORECASE | re.MULTILINE)
+        if match:
+            lines.append(f"{field}: {match.group(1).strip()}")
+    return "\n".join(lines) or None
+
+
+async def run_chain(
+    agents: Dict[str, Agent],
+    user_task: str,
+    run_context: RunContext,
+    run_config=None,
+    model_name: str = "",
+    handoff: Optional[HandoffPolicy] = None,
+    handoffs: Optional[Dict[str, HandoffPolicy]] = None,
+) -> Any:
+    """
+    Run the agents one after the other, each on the hand-off of the previous step's output.
+
+    The hand-off after each agent follows its entry in `handoffs` (by agent name) or the default
+    `handoff` policy. Token usage and duration of every step and hand-off are kept in
+    `run_context.turn_usage`.
+    """
+    handoff = handoff or HandoffPolicy()
+    handoffs = handoffs or {}
+    for name in handoffs:
+        if name not in agents:
+            raise ValueError(f"Hand-off policy for unknown agent '{name}'")
+
+    names = list(agents)
+    logging.info(f"[CHAIN]   Agent chain order: {names}")
+    current_task = user_task
+    total_tokens = 0
+    for step, name in enumerate(names, 1):
+        logging.info(f"[CHAIN] 🔗 Chain step {step}/{len(names)}: Running agent '{name}'")
+        logging.info(f"[CHAIN]   Input: {current_task[:200]}...")
+        started = time.perf_counter()
+        result = await run_context.run_agent(agents[name], current_task, run_config)
+        output = result.final_output
+        total_tokens += _record(run_context, step, name, "step", result, time.perf_counter() - started)
+        logging.info(f"[CHAIN] ✅ Agent '{name}' completed")
+        logging.info(f"[CHAIN]   Output: {str(output)[:200]}...")
+
+        if step == len(names):
+            logging.info(f"[CHAIN] ✅ Chain completed, {total_tokens} tokens")
+            return output
+
+        policy = handoffs.get(name, handoff)
+        started = time.perf_counter()
+        text, summary = await _hand_off(str(output), name, policy, run_context, run_config, model_name)
+        source_tokens = count_tokens(str(output), model_name)
+        handoff_tokens = count_tokens(text, model_name)
+        total_tokens += _record(
+            run_context, step, name, "handoff", summary, time.perf_counter() - started,
+            policy=policy.mode, source_tokens=source_tokens, handoff_tokens=handoff_tokens,
+        )
+        logging.info(f"[CHAIN]   Passing output to {names[step]} ({policy.mode}: {source_tokens} -> {handoff_tokens} tokens)")
+        current_task = HANDOFF_TASK.format(agent=name, output=text)
+
+
+async def _hand_off(
+    output: str,
+    agent_name: str,
+    policy: HandoffPolicy,
+    run_context: RunContext,
+    run_config,
+    model_name: str,
+):
+    """Text handed to the next step and the summarizer run, if one was needed."""
+    summary = None
+    text = output
+    if policy.mode == "fields":
+        text = extract_fields(output, policy.fields)
+        if text is None:
+            logger.warning(f"[CHAIN] No field of {policy.fields} found in the output of {agent_name}, passing it whole")
+            text = output
+    elif policy.mode == "summarize" and (
+        policy.max_tokens is None or count_tokens(output, model_name) > policy.max_tokens
+    ):
+        summary_model = policy.model or HANDOFF_SUMMARY_MODEL or model_name
+        summarizer = Agent(
+            name="handoff summarizer",
+            instructions=SUMMARY_PROMPT,
+            model=summary_model,
+            model_settings=cache_settings(SUMMARY_PROMPT, summary_model, max_tokens=policy.max_tokens),
+        )
+        limit = f"Condense it to at most {policy.max_tokens} tokens.\n\n" if policy.max_tokens else ""
+        summary = await run_context.run_agent(summarizer, f"{limit}Output of {agent_name}:\n{output}", run_config)
+        text = str(summary.final_output).strip()
+
+    if policy.max_tokens is not None:
+        text = truncate_tokens(text, policy.max_tokens, model_name)
+    return text, summary
+
+
+def _record(run_context: RunContext, step: int, agent: str, kind: str, result: Any, seconds: float, **extra: Any) -> int:
+    usage = result_usage(result)
+    entry = {"turn": step, "speaker": agent, "kind": kind, **usage, "seconds": seconds, **extra}
+    run_context.turn_usage.append(entry)
+    if run_context.events is not None:
+        run_context.events.publish("chain.step", **entry)
+    return usage["total_tokens"]
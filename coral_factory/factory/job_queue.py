@@ -0,0 +1,230 @@
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from factory.scheduler import DEFAULT_MAX_QUEUE_SIZE, DEFAULT_MAX_QUEUED_PER_USER, QueueFullError
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Shared job queue configuration
+FACTORY_JOB_QUEUE_PATH = os.getenv("FACTORY_JOB_QUEUE_PATH", "runs/jobs.db")
+FACTORY_JOB_LEASE_SECONDS = float(os.getenv("FACTORY_JOB_LEASE_SECONDS", "120"))
+
+
+class JobQueue(abc.ABC):
+    """
+    Queue of workflow jobs shared by the API tier and factory.worker processes.
+
+    A worker claims a job, heartbeats its claims while the job runs and acks the job when it is
+    done. Claims that are not renewed within the lease are handed to another worker.
+    """
+
+    name = "queue"
+
+    @abc.abstractmethod
+    def put(self, trace_id: str, user_id: str, payload: Dict[str, Any]) -> None:
+        """Enqueue a job or raise QueueFullError if the queue or the user is at capacity."""
+
+    @abc.abstractmethod
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Claim the next job (trace_id, user_id, payload, enqueued_at, cancel_requested), or None if
+        nothing is queued. A job whose cancellation was requested while another worker held it
+        comes back with cancel_requested set and must be finished as cancelled, not run.
+        """
+
+    @abc.abstractmethod
+    def heartbeat(self, worker_id: str) -> None:
+        """Renew the leases of the jobs claimed by `worker_id`."""
+
+    @abc.abstractmethod
+    def ack(self, trace_id: str) -> None:
+        """Remove a finished job."""
+
+    @abc.abstractmethod
+    def release(self, trace_id: str) -> None:
+        """Put a claimed job back in the queue."""
+
+    @abc.abstractmethod
+    def release_all(self, worker_id: str) -> int:
+        """Put every job claimed by `worker_id` back in the queue. Returns the number released."""
+
+    @abc.abstractmethod
+    def cancel(self, trace_id: str) -> Optional[str]:
+        """
+        Cancel a job: "cancelled" if it was still queued (it is removed), "requested" if a worker
+        holds it (the worker cancels it on its next poll), None if there is no such job.
+        """
+
+    @abc.abstractmethod
+    def cancellations(self, worker_id: str) -> List[str]:
+        """Trace ids of the jobs claimed by `worker_id` whose cancellation was requested."""
+
+    @abc.abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Queued and claimed job counts."""
+
+    def close(self) -> None:
+        """Release connections."""
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    Job queue in an SQLite database, shared by every process on the node using the same file.
+
+    The next job is taken from the user with the fewest claimed jobs, oldest first, so one user
+    cannot take over every worker.
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        path: str = FACTORY_JOB_QUEUE_PATH,
+        max_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        max_per_user: int = DEFAULT_MAX_QUEUED_PER_USER,
+        lease_seconds: float = FACTORY_JOB_LEASE_SECONDS,
+    ):
+        self.path = path
+        self.max_size = max_size
+        self.max_per_user = max_per_user
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " trace_id TEXT PRIMARY KEY,"
+                " user_id TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " enqueued_at REAL NOT NULL,"
+                " claimed_by TEXT,"
+                " lease_expires_at REAL,"
+                " cancel_requested INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "cancel_requested" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (claimed_by, enqueued_at)")
+
+    def put(self, trace_id: str, user_id: str, payload: Dict[str, Any]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            queued, queued_for_user = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(user_id = ?), 0) FROM jobs WHERE claimed_by IS NULL", (user_id,)
+            ).fetchone()
+            if queued >= self.max_size:
+                raise QueueFullError(f"Job queue is full ({self.max_size} queued jobs)")
+            if queued_for_user >= self.max_per_user:
+                raise QueueFullError(f"Too many queued jobs for user '{user_id}' ({self.max_per_user})")
+            conn.execute(
+                "INSERT INTO jobs (trace_id, user_id, payload, enqueued_at) VALUES (?, ?, ?, ?)",
+                (trace_id, user_id, json.dumps(payload, default=str), time.time()),
+            )
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Jobs of workers that stopped heartbeating go back to the queue
+            expired = conn.execute(
+                "UPDATE jobs SET claimed_by = NULL, lease_expires_at = NULL"
+                " WHERE claimed_by IS NOT NULL AND lease_expires_at <= ?", (now,)
+            ).rowcount
+            if expired:
+                logger.warning(f"[JOB_QUEUE] Requeued {expired} jobs with expired leases")
+
+            row = conn.execute(
+                "SELECT trace_id, user_id, payload, enqueued_at, cancel_requested FROM jobs AS job WHERE claimed_by IS NULL"
+                " ORDER BY cancel_requested DESC, (SELECT COUNT(*) FROM jobs AS claimed"
+                "           WHERE claimed.user_id = job.user_id AND claimed.claimed_by IS NOT NULL),"
+                " enqueued_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET claimed_by = ?, lease_expires_at = ? WHERE trace_id = ?",
+                (worker_id, now + self.lease_seconds, row[0]),
+            )
+        return {
+            "trace_id": row[0], "user_id": row[1], "payload": json.loads(row[2]), "enqueued_at": row[3],
+            "cancel_requested": bool(row[4]),
+        }
+
+    def heartbeat(self, worker_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE claimed_by = ?",
+                (time.time() + self.lease_seconds, worker_id),
+            )
+
+    def ack(self, trace_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE trace_id = ?", (trace_id,))
+
+    def release(self, trace_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET claimed_by = NULL, lease_expires_at = NULL WHERE trace_id = ?", (trace_id,))
+
+    def release_all(self, worker_id: str) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET claimed_by = NULL, lease_expires_at = NULL WHERE claimed_by = ?", (worker_id,)
+            ).rowcount
+
+    def cancel(self, trace_id: str) -> Optional[str]:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT claimed_by FROM jobs WHERE trace_id = ?", (trace_id,)).fetchone()
+            if row is None:
+                return None
+            if row[0] is None:
+                conn.execute("DELETE FROM jobs WHERE trace_id = ?", (trace_id,))
+                return "cancelled"
+            conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE trace_id = ?", (trace_id,))
+            return "requested"
+
+    def cancellations(self, worker_id: str) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT trace_id FROM jobs WHERE claimed_by = ? AND cancel_requested = 1", (worker_id,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        queued, claimed = self._connect().execute(
+            "SELECT COALESCE(SUM(claimed_by IS NULL), 0), COALESCE(SUM(claimed_by IS NOT NULL), 0) FROM jobs"
+        ).fetchone()
+        workers = self._connect().execute(
+            "SELECT claimed_by, COUNT(*) FROM jobs WHERE claimed_by IS NOT NULL GROUP BY claimed_by"
+        ).fetchall()
+        return {
+            "queue": self.name,
+            "queue_depth": queued,
+            "queue_max_size": self.max_size,
+            "claimed": claimed,
+            "claimed_per_worker": {worker: count for worker, count in workers},
+        }
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Transactions are managed explicitly (BEGIN IMMEDIATE) where claims must be atomic
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
@@ -0,0 +1,286 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents.mcp import MCPServerStreamableHttp, MCPServerSse  # type: ignore
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Pool configuration
+MCP_POOL_IDLE_TIMEOUT = float(os.getenv("MCP_POOL_IDLE_TIMEOUT", "300"))
+MCP_POOL_MAX_SESSIONS = int(os.getenv("MCP_POOL_MAX_SESSIONS", "4"))
+MCP_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("MCP_POOL_HEALTH_CHECK_INTERVAL", "30"))
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "30"))
+
+PoolKey = Tuple[str, str, str]
+
+
+def normalize_mcp_config(server_cfg: Dict[str, Any], index: int = 1) -> Dict[str, Any]:
+    """Validate an MCP server config and return a copy with defaults filled in."""
+    params = dict(server_cfg.get("params") or {})
+    if not params.get("url"):
+        if not server_cfg.get("url"):
+            raise Exception("URL is required")
+        params["url"] = server_cfg["url"]
+
+    server_type = (server_cfg.get("server_type") or "HTTP").lower()
+    return {
+        "name": server_cfg.get("name") or f"MCP {index}",
+        "server_type": "sse" if server_type == "sse" else "http",
+        "params": params,
+        "timeout_seconds": int(server_cfg.get("timeout_seconds", 60)),
+        "cache_tools_list": bool(server_cfg.get("cache_tools_list", True)),
+    }
+
+
+def mcp_pool_key(server_cfg: Dict[str, Any]) -> PoolKey:
+    """Sessions are shared between configs with the same type, url and connection params."""
+    settings = {
+        "params": server_cfg["params"],
+        "timeout_seconds": server_cfg["timeout_seconds"],
+        "cache_tools_list": server_cfg["cache_tools_list"],
+    }
+    return (
+        server_cfg["server_type"],
+        server_cfg["params"]["url"],
+        json.dumps(settings, sort_keys=True, default=str),
+    )
+
+
+class PooledMCPSession:
+    """A connected MCP server owned by the pool, leased to agents for the length of a run."""
+
+    def __init__(self, key: PoolKey, server: Any):
+        self.key = key
+        self.server = server
+        self.leases = 0
+        self.last_used = time.monotonic()
+        self.last_checked = time.monotonic()
+        self.ready: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.closing = asyncio.Event()
+        self.owner: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return (
+            self.ready.done()
+            and not self.ready.cancelled()
+            and self.ready.exception() is None
+            and self.owner is not None
+            and not self.owner.done()
+            and not self.closing.is_set()
+        )
+
+
+class _LoopPool:
+    """Pool state of a single event loop; MCP sessions cannot move between loops."""
+
+    def __init__(self):
+        self.sessions: Dict[PoolKey, List[PooledMCPSession]] = {}
+        self.locks: Dict[PoolKey, asyncio.Lock] = {}
+        self.reaper: Optional[asyncio.Task] = None
+
+
+class MCPSessionPool:
+    """
+    Reuses warm MCP sessions across runs.
+
+    Sessions are keyed on (server_type, url, params). An idle session is preferred, a new one is
+    opened while the server has fewer than `max_sessions_per_server`, and beyond that the least
+    loaded session is shared. Sessions idle for longer than `health_check_interval` are pinged
+    before reuse and sessions idle for `idle_timeout` are closed.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = MCP_POOL_IDLE_TIMEOUT,
+        max_sessions_per_server: int = MCP_POOL_MAX_SESSIONS,
+        health_check_interval: float = MCP_POOL_HEALTH_CHECK_INTERVAL,
+        connect_timeout: float = MCP_CONNECT_TIMEOUT,
+    ):
+        self.idle_timeout = idle_timeout
+        self.max_sessions_per_server = max(1, max_sessions_per_server)
+        self.health_check_interval = health_check_interval
+        self.connect_timeout = connect_timeout
+        self._lock = threading.Lock()
+        self._pools: Dict[asyncio.AbstractEventLoop, _LoopPool] = {}
+        self.opened = 0
+        self.reused = 0
+        self.closed = 0
+        self.failed_health_checks = 0
+
+    async def acquire(self, server_cfg: Dict[str, Any]) -> PooledMCPSession:
+        """Lease a connected session for `server_cfg` (see normalize_mcp_config). Pair with release()."""
+        key = mcp_pool_key(server_cfg)
+        pool = self._pool()
+        lock = pool.locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            sessions = pool.sessions.setdefault(key, [])
+            sessions[:] = [s for s in sessions if s.alive]
+
+            session = None
+            for candidate in sorted(sessions, key=lambda s: s.leases):
+                if candidate.leases > 0 and len(sessions) < self.max_sessions_per_server:
+                    break
+                # Sessions in use by other runs are shared as they are
+                if candidate.leases > 0 or await self._healthy(candidate):
+                    session = candidate
+                    break
+                sessions.remove(candidate)
+                await self._close(candidate)
+
+            if session is None:
+                session = await self._open(key, server_cfg, sessions)
+            else:
+                self.reused += 1
+
+            session.leases += 1
+            session.last_used = time.monotonic()
+            return session
+
+    def release(self, session: PooledMCPSession, discard: bool = False) -> None:
+        """
+        Return a leased session to the pool.
+
+        With `discard` (the run was cancelled, possibly mid-call) the session is closed once no
+        other run holds it, and a session still shared is health checked before its next lease.
+        """
+        session.leases = max(0, session.leases - 1)
+        session.last_used = time.monotonic()
+        if discard:
+            if session.leases == 0:
+                session.closing.set()
+            else:
+                session.last_checked = 0.0
+
+    async def close_current(self) -> None:
+        """Close every session of the running event loop. Call before the loop shuts down."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pool = self._pools.pop(loop, None)
+        if pool is None:
+            return
+
+        if pool.reaper is not None:
+            pool.reaper.cancel()
+        for sessions in pool.sessions.values():
+            for session in sessions:
+                await self._close(session)
+        logger.info(f"[MCP_POOL] Closed MCP sessions of event loop {id(loop)}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pools = list(self._pools.values())
+        sessions = [s for pool in pools for group in list(pool.sessions.values()) for s in list(group)]
+        return {
+            "sessions": len(sessions),
+            "leased": sum(1 for s in sessions if s.leases > 0),
+            "opened": self.opened,
+            "reused": self.reused,
+            "closed": self.closed,
+            "failed_health_checks": self.failed_health_checks,
+        }
+
+    def _pool(self) -> _LoopPool:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pool = self._pools.get(loop)
+            if pool is None:
+                pool = self._pools[loop] = _LoopPool()
+        if pool.reaper is None or pool.reaper.done():
+            pool.reaper = loop.create_task(self._reap(pool))
+        return pool
+
+    async def _open(self, key: PoolKey, server_cfg: Dict[str, Any], sessions: List[PooledMCPSession]) -> PooledMCPSession:
+        logger.info(f"[MCP_POOL] Opening MCP session to {key[1]} ({key[0]})")
+        server_class = MCPServerSse if server_cfg["server_type"] == "sse" else MCPServerStreamableHttp
+        server = server_class(
+            name=server_cfg["name"],
+            params=server_cfg["params"],
+            client_session_timeout_seconds=server_cfg["timeout_seconds"],
+            cache_tools_list=server_cfg["cache_tools_list"],
+        )
+
+        session = PooledMCPSession(key, server)
+        session.owner = asyncio.get_running_loop().create_task(self._own(session))
+        try:
+            await asyncio.wait_for(asyncio.shield(session.ready), timeout=self.connect_timeout)
+        except BaseException:
+            await self._close(session)
+            raise
+
+        sessions.append(session)
+        self.opened += 1
+        return session
+
+    async def _own(self, session: PooledMCPSession) -> None:
+        # MCP transports must be entered and exited by the same task, so each session gets one
+        try:
+            await session.server.connect()
+        except BaseException as e:
+            if not session.ready.done():
+                session.ready.set_exception(e)
+            return
+
+        if not session.ready.done():
+            session.ready.set_result(None)
+        try:
+            await session.closing.wait()
+        finally:
+            try:
+                await session.server.cleanup()
+            except Exception as e:
+                logger.warning(f"[MCP_POOL] Error closing MCP session to {session.key[1]}: {e}")
+
+    async def _healthy(self, session: PooledMCPSession) -> bool:
+        if time.monotonic() - session.last_checked < self.health_check_interval:
+            return True
+
+        try:
+            client_session = getattr(session.server, "session", None)
+            if client_session is None:
+                return False
+            await asyncio.wait_for(client_session.send_ping(), timeout=self.connect_timeout)
+        except Exception as e:
+            self.failed_health_checks += 1
+            logger.warning(f"[MCP_POOL] Health check failed for {session.key[1]}, reconnecting: {e}")
+            return False
+
+        session.last_checked = time.monotonic()
+        return True
+
+    async def _close(self, session: PooledMCPSession) -> None:
+        session.closing.set()
+        if session.owner is not None and not session.owner.done():
+            try:
+                await asyncio.wait_for(session.owner, timeout=self.connect_timeout)
+            except BaseException:
+                session.owner.cancel()
+        # Consume a connect error nobody awaited
+        if session.ready.done() and not session.ready.cancelled():
+            session.ready.exception()
+        self.closed += 1
+
+    async def _reap(self, pool: _LoopPool) -> None:
+        while True:
+            await asyncio.sleep(max(1.0, self.idle_timeout / 2))
+            now = time.monotonic()
+            for key, sessions in list(pool.sessions.items()):
+                async with pool.locks[key]:
+                    idle = [
+                        s for s in sessions
+                        if s.leases == 0 and (now - s.last_used >= self.idle_timeout or not s.alive)
+                    ]
+                    for session in idle:
+                        sessions.remove(session)
+                        logger.info(f"[MCP_POOL] Closing idle MCP session to {key[1]}")
+                        await self._close(session)
+
+
+mcp_pool = MCPSessionPool()
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from agents import tracing  # type: ignore
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Spans kept by the per-run profiler
+FACTORY_PROFILE_MAX_SPANS = int(os.getenv("FACTORY_PROFILE_MAX_SPANS", "2000"))
+
+# Span types whose duration is time spent waiting for the model
+LLM_SPAN_TYPES = ("response", "generation")
+
+
+class RunTimings:
+    """
+    Wall-clock seconds spent per stage of a workflow run, in total and per agent.
+
+    Stages are queue_wait, agent_build, arcade_tool_fetch, mcp_connect, llm, tool_execution and
+    tracing. Agents and tools run concurrently, so stage totals can add up to more than the run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str, float] = {}
+        self.agents: Dict[str, Dict[str, float]] = {}
+
+    def add(self, stage: str, seconds: float, agent: Optional[str] = None) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+            if agent is not None:
+                per_agent = self.agents.setdefault(agent, {})
+                per_agent[stage] = per_agent.get(stage, 0.0) + seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "stages": {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+                "agents": {
+                    agent: {stage: round(seconds, 6) for stage, seconds in stages.items()}
+                    for agent, stages in self.agents.items()
+                },
+            }
+
+
+# Timings of the run executing in the current task; tasks started by the run inherit it
+_current_timings: ContextVar[Optional[RunTimings]] = ContextVar("factory_run_timings", default=None)
+
+
+def set_current_timings(timings: Optional[RunTimings]):
+    return _current_timings.set(timings)
+
+
+def reset_current_timings(token) -> None:
+    _current_timings.reset(token)
+
+
+def record_stage(stage: str, seconds: float, agent: Optional[str] = None) -> None:
+    """Add `seconds` to `stage` of the current run, if there is one."""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds, agent)
+
+
+@contextmanager
+def timed(stage: str, agent: Optional[str] = None) -> Iterator[None]:
+    """Time the block as `stage` of the current run."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started, agent)
+
+
+def _span_seconds(span: tracing.Span) -> Optional[float]:
+    if not span.started_at or not span.ended_at:
+        return None
+    return (datetime.fromisoformat(span.ended_at) - datetime.fromisoformat(span.started_at)).total_seconds()
+
+
+class StageTimingProcessor(tracing.TracingProcessor):  # type: ignore[misc]
+    """
+    Attributes model time (response and generation spans) to the agent of each span.
+
+    With a `profile` list it also keeps a timeline of every span of the run (offset from the run
+    start, duration, type, name and agent), up to FACTORY_PROFILE_MAX_SPANS spans.
+    """
+
+    def __init__(self, timings: RunTimings, profile: Optional[List[Dict[str, Any]]] = None, started_at: Optional[float] = None):
+        self.timings = timings
+        self.profile = profile
+        self.started_at = started_at or time.time()
+        self._lock = threading.Lock()
+        # Agent each open span runs under, inherited from its parent span
+        self._span_agents: Dict[str, Optional[str]] = {}
+
+    def on_trace_start(self, trace: tracing.Trace) -> None:
+        pass
+
+    def on_trace_end(self, trace: tracing.Trace) -> None:
+        pass
+
+    def on_span_start(self, span: tracing.Span) -> None:
+        with self._lock:
+            if span.span_data.type == "agent":
+                self._span_agents[span.span_id] = span.span_data.name
+            else:
+                self._span_agents[span.span_id] = self._span_agents.get(span.parent_id)
+
+    def on_span_end(self, span: tracing.Span) -> None:
+        span_type = span.span_data.type
+        with self._lock:
+            agent = self._span_agents.pop(span.span_id, None)
+        seconds = _span_seconds(span)
+        if seconds is None:
+            return
+        if span_type in LLM_SPAN_TYPES:
+            self.timings.add("llm", seconds, agent)
+        if self.profile is not None:
+            self._record(span, span_type, agent, seconds)
+
+    def _record(self, span: tracing.Span, span_type: str, agent: Optional[str], seconds: float) -> None:
+        with self._lock:
+            if len(self.profile) >= FACTORY_PROFILE_MAX_SPANS:
+                return
+            self.profile.append({
+                "type": span_type,
+                "name": getattr(span.span_data, "name", None),
+                "agent": agent,
+                "offset_seconds": round(datetime.fromisoformat(span.started_at).timestamp() - self.started_at, 6),
+                "seconds": round(seconds, 6),
+                "error": (span.error or {}).get("message"),
+            })
+
+    def shutdown(self) -> None:
+        pass
+
+    def force_flush(self) -> None:
+        pass
@@ -0,0 +1,96 @@
+import hashlib
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from agents.model_settings import ModelSettings  # type: ignore
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Send a prompt_cache_key derived from the static prompt with OpenAI requests, so runs sharing a
+# prompt prefix are routed to the same prompt cache
+FACTORY_PROMPT_CACHE_KEY = os.getenv("FACTORY_PROMPT_CACHE_KEY", "1") != "0"
+
+# Key of the run context holding the time the run started, rendered into the prompt tail
+TIME_KEY = "__time__"
+
+# Static part of an agent's system prompt; it only depends on the workflow config, so it is
+# byte-identical across runs, users and turns and forms the cacheable prefix
+AGENT_PROMPT = """You are a {persona}. Use your tools to answer the users request. Format your final answer as desribed in "Expected output".
+Think step by step and make sure to solve your issues. Always start by explaining how you achieved the answer.
+
+Guidelines:
+- Perform the task requested by the user and answer the user's question. Do not ask new questions to the user. Only explain what you have done to get to the answer.
+{guidelines}
+
+Expected output:
+{output}
+{notes}"""
+
+# Volatile part of the system prompt, appended after the static part when the agent runs
+CONTEXT_PROMPT = """
+Context:
+{context}
+"""
+
+MANAGER_PROMPT = """You are a manager agent. Solve the user's task by delegating tasks to the appropriate agents.
+Think step by step and do not ask the user for clarification, just execute the task as best as you can.
+Delegate independent sub-tasks in the same turn by calling delegate_task several times at once, they run in parallel.
+You have access to the following agents:
+{agents}
+"""
+
+
+def format_guidelines(guidelines: Union[str, Iterable[str], None]) -> str:
+    """Guidelines as "- " bullets, from a list or one guideline per line."""
+    if not guidelines:
+        return ""
+    if isinstance(guidelines, str):
+        guidelines = guidelines.splitlines()
+    lines = [line.strip().lstrip("-*").strip() for line in guidelines]
+    return "\n".join(f"- {line}" for line in lines if line)
+
+
+def agent_prompt(persona: str, guidelines: Union[str, List[str], None], output: str, context: Optional[Dict[str, Any]] = None) -> str:
+    """Static system prompt of an agent; `__system__` notes of its configured context are part of it."""
+    notes = (context or {}).get("__system__") or ""
+    return AGENT_PROMPT.format(
+        persona=persona,
+        guidelines=format_guidelines(guidelines),
+        output=output,
+        notes=f"\n{notes}\n" if notes else "",
+    )
+
+
+def manager_prompt(agents: List[Dict[str, Any]]) -> str:
+    """System prompt of the manager and triage agents, listing the agents in config order."""
+    return MANAGER_PROMPT.format(agents="\n".join(f"{agent['name']}: {agent['persona']}" for agent in agents))
+
+
+def run_time() -> str:
+    """Time rendered into the prompts of a run, taken once when the run starts."""
+    return time.asctime()
+
+
+def context_prompt(context: Dict[str, Any]) -> str:
+    """Volatile tail of a system prompt: the run's start time and its `__system__` notes."""
+    context_string = f"- The time is: {context.get(TIME_KEY) or run_time()}\n"
+    context_string += (context.get("__system__") or "")
+    return CONTEXT_PROMPT.format(context=context_string)
+
+
+def prompt_cache_key(prompt: str) -> str:
+    return "factory-" + hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:24]
+
+
+def cache_settings(prompt: str, model: Any, **settings: Any) -> ModelSettings:
+    """
+    ModelSettings routing requests that start with `prompt` to one provider prompt cache.
+
+    The key is only sent to OpenAI models; other providers get the plain settings.
+    """
+    if FACTORY_PROMPT_CACHE_KEY and isinstance(model, str) and ("/" not in model or model.startswith("openai/")):
+        settings["extra_args"] = {**(settings.get("extra_args") or {}), "prompt_cache_key": prompt_cache_key(prompt)}
+    return ModelSettings(**settings)
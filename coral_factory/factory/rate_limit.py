@@ -0,0 +1,449 @@
+import asyncio
+import fnmatch
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple, TypeVar
+
+import httpx
+from agents.models.interface import Model, ModelProvider  # type: ignore
+
+from factory.metrics import metrics
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Retry configuration for LLM and Arcade calls
+FACTORY_RETRY_ATTEMPTS = int(os.getenv("FACTORY_RETRY_ATTEMPTS", "4"))
+FACTORY_RETRY_BASE_DELAY = float(os.getenv("FACTORY_RETRY_BASE_DELAY", "0.5"))
+FACTORY_RETRY_MAX_DELAY = float(os.getenv("FACTORY_RETRY_MAX_DELAY", "30"))
+
+# Circuit breaker: consecutive upstream failures that open it, and seconds before a trial call
+FACTORY_BREAKER_FAILURES = int(os.getenv("FACTORY_BREAKER_FAILURES", "5"))
+FACTORY_BREAKER_RESET_SECONDS = float(os.getenv("FACTORY_BREAKER_RESET_SECONDS", "30"))
+
+# JSON object of limits by "provider:name" pattern, e.g.
+# {"openai:gpt-4o*": {"rate": 5, "burst": 10, "concurrency": 32}, "arcade:*": {"concurrency": 64}}
+# rate is calls per second (0 for no pacing), concurrency the calls in flight (0 for no cap)
+FACTORY_RATE_LIMITS = os.getenv("FACTORY_RATE_LIMITS", "")
+
+T = TypeVar("T")
+
+upstream_retries = metrics.counter(
+    "factory_upstream_retries_total", "LLM and Arcade calls retried, by provider, name and status", ("provider", "name", "status"),
+)
+upstream_rejections = metrics.counter(
+    "factory_upstream_circuit_rejections_total", "Calls refused while the circuit of their key was open", ("provider", "name"),
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket; callers reserve a token and sleep for the returned delay."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def reserve(self) -> float:
+        """Take a token and return the seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if self.rate <= 0:
+                return wait
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens < 0:
+                wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller of this bucket back for `seconds`, e.g. after a Retry-After."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class ConcurrencyLimit:
+    """
+    Cap on calls in flight, shared by every event loop of the process.
+
+    Waiters on other loops are woken with call_soon_threadsafe, like factory.scheduler.FairJobQueue.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._lock = threading.Lock()
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> None:
+        if self.limit <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self.active < self.limit:
+                    self.active += 1
+                    return
+                waiter = loop.create_future()
+                self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                    elif self.active < self.limit:
+                        # We were woken for a free slot we will not take, pass it on
+                        self._wake_one()
+                raise
+
+    def release(self) -> None:
+        if self.limit <= 0:
+            return
+        with self._lock:
+            self.active -= 1
+            self._wake_one()
+
+    def _wake_one(self) -> None:
+        # Lock must be held
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.get_loop().call_soon_threadsafe(self._notify, waiter)
+                return
+
+    def _notify(self, waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.set_result(None)
+            return
+        with self._lock:
+            if self.active < self.limit:
+                self._wake_one()
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream after `failures` consecutive failures.
+
+    While open every call is refused; after `reset_seconds` one trial call is let through and
+    its outcome closes the circuit again or keeps it open.
+    """
+
+    def __init__(self, failures: int = FACTORY_BREAKER_FAILURES, reset_seconds: float = FACTORY_BREAKER_RESET_SECONDS):
+        self.failures = max(1, failures)
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self.state = "half_open"
+                self._trial_in_flight = False
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def abandon(self) -> None:
+        """The call was cancelled before it had an outcome; let another trial through."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failures:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class UpstreamLimits:
+    """Pacing, concurrency cap and circuit breaker of one (provider, name, api key)."""
+
+    def __init__(self, rate: float = 0.0, burst: float = 1.0, concurrency: int = 0):
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = ConcurrencyLimit(concurrency)
+        self.breaker = CircuitBreaker()
+        self.calls = 0
+        self.retries = 0
+
+
+LimitKey = Tuple[str, str, str]
+
+
+class RateLimiter:
+    """
+    Shared limits for LLM and Arcade calls, keyed by (provider, model or tool, api key).
+
+    Each call waits for a token of its key's bucket and a concurrency slot, and is retried with
+    jittered exponential backoff on 429, 5xx and connection errors, honouring Retry-After. A 429
+    with Retry-After pauses the whole key. Keys failing repeatedly are circuit broken.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict[str, float]]] = None,
+        attempts: int = FACTORY_RETRY_ATTEMPTS,
+        base_delay: float = FACTORY_RETRY_BASE_DELAY,
+        max_delay: float = FACTORY_RETRY_MAX_DELAY,
+    ):
+        self.limits = limits if limits is not None else _configured_limits()
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._keys: Dict[LimitKey, UpstreamLimits] = {}
+
+    def upstream(self, provider: str, name: str, api_key: Optional[str] = None) -> UpstreamLimits:
+        key = (provider, name, _key_id(api_key))
+        with self._lock:
+            upstream = self._keys.get(key)
+            if upstream is None:
+                upstream = self._keys[key] = UpstreamLimits(**self._config_for(f"{provider}:{name}"))
+            return upstream
+
+    async def call(
+        self,
+        provider: str,
+        name: str,
+        fn: Callable[[], Awaitable[T]],
+        api_key: Optional[str] = None,
+        retry_server_errors: bool = True,
+    ) -> T:
+        """
+        Run `fn` within the limits of (provider, name, api_key).
+
+        With `retry_server_errors` False only 429s are retried, for calls that must not run twice
+        (a 5xx or dropped connection may come after the upstream did the work).
+        """
+        upstream = self.upstream(provider, name, api_key)
+        error: Optional[BaseException] = None
+        for attempt in range(1, self.attempts + 1):
+            # Checked before every attempt: the retries of this call or other calls may have opened it
+            if not upstream.breaker.allow():
+                upstream_rejections.inc(provider, name)
+                raise CircuitOpenError(f"{provider} {name} is failing, calls are paused for up to {upstream.breaker.reset_seconds:.0f}s") from error
+            wait = upstream.bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await upstream.concurrency.acquire()
+            try:
+                upstream.calls += 1
+                result = await fn()
+            except Exception as e:
+                status = error_status(e)
+                if not _transient(e, status):
+                    # The upstream answered, the request itself was at fault
+                    upstream.breaker.record_success()
+                    raise
+                upstream.breaker.record_failure()
+                error = e
+                if attempt == self.attempts or (status != 429 and not retry_server_errors):
+                    raise
+                delay = retry_after(e)
+                if delay is not None and status == 429:
+                    upstream.bucket.pause(delay)
+                delay = min(self.max_delay, delay if delay is not None else self._backoff(attempt))
+                upstream.retries += 1
+                upstream_retries.inc(provider, name, str(status or "connection"))
+                logger.warning(
+                    f"[RATE_LIMIT] {provider} {name} failed ({status or type(e).__name__}), "
+                    f"retry {attempt}/{self.attempts - 1} in {delay:.2f}s"
+                )
+            except asyncio.CancelledError:
+                upstream.breaker.abandon()
+                raise
+            else:
+                upstream.breaker.record_success()
+                return result
+            finally:
+                upstream.concurrency.release()
+            await asyncio.sleep(delay)
+        raise AssertionError("unreachable")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            keys = list(self._keys.items())
+        return {
+            "attempts": self.attempts,
+            "upstreams": {
+                f"{provider}:{name}" + (f"@{key_id}" if key_id else ""): {
+                    "rate": upstream.bucket.rate,
+                    "concurrency_limit": upstream.concurrency.limit,
+                    "in_flight": upstream.concurrency.active,
+                    "calls": upstream.calls,
+                    "retries": upstream.retries,
+                    "circuit": upstream.breaker.state,
+                    "consecutive_failures": upstream.breaker.consecutive_failures,
+                }
+                for (provider, name, key_id), upstream in sorted(keys)
+            },
+        }
+
+    def _config_for(self, key: str) -> Dict[str, Any]:
+        # First matching pattern wins
+        for pattern, config in self.limits.items():
+            if fnmatch.fnmatchcase(key, pattern):
+                return {
+                    "rate": float(config.get("rate", 0)),
+                    "burst": float(config.get("burst", max(1.0, float(config.get("rate", 0))))),
+                    "concurrency": int(config.get("concurrency", 0)),
+                }
+        return {}
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter keeps clients that failed together from retrying together
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """HTTP status of an OpenAI, Arcade or httpx error, if it has one."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """Seconds from the Retry-After (or retry-after-ms) header of an error response."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return max(0.0, float(headers["retry-after"]))
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def _transient(error: BaseException, status: Optional[int]) -> bool:
+    """Rate limited, server error or connection failure: worth retrying later."""
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError)) or type(error).__name__ in (
+        "APIConnectionError", "APITimeoutError",
+    )
+
+
+def _key_id(api_key: Optional[str]) -> str:
+    # Keys are never kept or shown, only a short digest to tell quotas apart
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:8] if api_key else ""
+
+
+def _configured_limits() -> Dict[str, Dict[str, float]]:
+    if not FACTORY_RATE_LIMITS:
+        return {}
+    try:
+        limits = json.loads(FACTORY_RATE_LIMITS)
+        if not isinstance(limits, dict):
+            raise ValueError("expected a JSON object")
+        return limits
+    except ValueError as e:
+        logger.error(f"[RATE_LIMIT] Ignoring invalid FACTORY_RATE_LIMITS: {e}")
+        return {}
+
+
+rate_limiter = RateLimiter()
+
+# Marks a model stream that ended before its first event
+_STREAM_END = object()
+
+
+class RateLimitedModel(Model):
+    """
+    Model whose requests go through the rate limiter.
+
+    Streamed requests are retried until their first event; after that a failure is final, since
+    the caller has already consumed part of the response.
+    """
+
+    def __init__(self, model: Model, provider: str, name: str, api_key: Optional[str] = None, limiter: RateLimiter = rate_limiter):
+        self.model = model
+        self.provider = provider
+        self.name = name
+        self.api_key = api_key
+        self.limiter = limiter
+
+    async def get_response(self, *args, **kwargs):
+        return await self.limiter.call(
+            self.provider, self.name, lambda: self.model.get_response(*args, **kwargs), api_key=self.api_key,
+        )
+
+    async def stream_response(self, *args, **kwargs) -> AsyncIterator[Any]:
+        stream = None
+
+        async def _first_event() -> Any:
+            nonlocal stream
+            stream = self.model.stream_response(*args, **kwargs)
+            try:
+                return await stream.__anext__()
+            except StopAsyncIteration:
+                return _STREAM_END
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        event = await self.limiter.call(self.provider, self.name, _first_event, api_key=self.api_key)
+        if event is _STREAM_END:
+            return
+        yield event
+        async for event in stream:
+            yield event
+
+    def get_retry_advice(self, request):
+        return self.model.get_retry_advice(request)
+
+    async def close(self) -> None:
+        await self.model.close()
+
+    async def _cleanup_on_run_end(self, owner: object) -> None:
+        await self.model._cleanup_on_run_end(owner)
+
+
+class RateLimitedModelProvider(ModelProvider):
+    """Wraps the models of `provider` (the SDK's MultiProvider) in RateLimitedModel."""
+
+    def __init__(self, provider: ModelProvider, limiter: RateLimiter = rate_limiter):
+        self.provider = provider
+        self.limiter = limiter
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        name = model_name or "default"
+        # "litellm/anthropic/..." is paced as litellm, bare names go to OpenAI
+        upstream = name.split("/", 1)[0] if "/" in name else "openai"
+        api_key = os.getenv("OPENAI_API_KEY") if upstream == "openai" else None
+        return RateLimitedModel(self.provider.get_model(model_name), upstream, name, api_key, self.limiter)
+
+    async def aclose(self) -> None:
+        await self.provider.aclose()
@@ -0,0 +1,178 @@
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Result cache configuration (opt-in)
+TOOL_RESULT_CACHE_ENABLED = os.getenv("TOOL_RESULT_CACHE", "false").lower() in ("1", "true", "yes")
+TOOL_RESULT_CACHE_SIZE = int(os.getenv("TOOL_RESULT_CACHE_SIZE", "2048"))
+# JSON object of extra cacheable tools and their TTL in seconds, e.g. {"Slack.ListChannels": 300}
+TOOL_RESULT_CACHE_TTLS = os.getenv("TOOL_RESULT_CACHE_TTLS", "")
+DELEGATE_RESULT_CACHE_TTL = float(os.getenv("DELEGATE_RESULT_CACHE_TTL", "0"))
+
+# Side-effect-free tools and how long their results are reused
+DEFAULT_CACHEABLE_TOOLS: Dict[str, float] = {
+    "GoogleFinance.GetStockSummary": 60,
+    "GoogleFinance.GetStockHistoricalData": 3600,
+    "X.LookupSingleUserByUsername": 600,
+    "X.LookupTweetById": 300,
+    "X.SearchRecentTweetsByUsername": 120,
+    "X.SearchRecentTweetsByKeywords": 120,
+    "Gmail.ListEmails": 30,
+    "Gmail.ListEmailsByHeader": 30,
+    "Gmail.ListDraftEmails": 30,
+    "Gmail.ListThreads": 30,
+    "Gmail.SearchThreads": 30,
+    "Gmail.GetThread": 60,
+}
+
+# Tools that change something are never cached, whatever the configuration says
+SIDE_EFFECT_PATTERN = re.compile(
+    r"(send|post|reply|delete|trash|write|update|create|remove|add|set|invite|archive|upload|move)",
+    re.IGNORECASE,
+)
+
+CacheKey = Tuple[str, str, str]
+
+
+def canonical_tool_name(tool_name: str) -> str:
+    """Arcade tools are named "Toolkit.Tool" in configs and "Toolkit_Tool" on the agent."""
+    return tool_name.replace(".", "_").lower()
+
+
+def has_side_effects(tool_name: str) -> bool:
+    action = re.split(r"[._]", tool_name, maxsplit=1)[-1]
+    return bool(SIDE_EFFECT_PATTERN.match(action))
+
+
+def canonical_args(args: Any) -> str:
+    """Tool arguments as canonical JSON, so equivalent calls share an entry."""
+    if isinstance(args, str):
+        try:
+            args = json.loads(args) if args.strip() else {}
+        except ValueError:
+            return args
+    return json.dumps(args, sort_keys=True, default=str, separators=(",", ":"))
+
+
+class ToolResultCache:
+    """
+    Memoizes results of side-effect-free tools and delegations per user.
+
+    Entries are keyed on (user_id, tool, canonical arguments). Only tools on the allowlist are
+    cached, each with its own TTL; tools whose name looks like an action (send, post, delete...)
+    never are. Results are copied in and out so callers cannot mutate cached values.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = TOOL_RESULT_CACHE_ENABLED,
+        max_entries: int = TOOL_RESULT_CACHE_SIZE,
+        ttls: Optional[Dict[str, float]] = None,
+        delegate_ttl: float = DELEGATE_RESULT_CACHE_TTL,
+    ):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.delegate_ttl = delegate_ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self._ttls: Dict[str, float] = {}
+        for tool_name, ttl in {**DEFAULT_CACHEABLE_TOOLS, **(ttls if ttls is not None else _configured_ttls())}.items():
+            if has_side_effects(tool_name):
+                logger.warning(f"[RESULT_CACHE] Not caching {tool_name}, it looks like it has side effects")
+                continue
+            self._ttls[canonical_tool_name(tool_name)] = float(ttl)
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self.evictions = 0
+
+    def ttl(self, tool_name: str) -> float:
+        """Seconds results of `tool_name` are reused, 0 when the tool is not cached."""
+        if not self.enabled or has_side_effects(tool_name):
+            return 0.0
+        return self._ttls.get(canonical_tool_name(tool_name), 0.0)
+
+    def delegate_ttl_for(self, agent: Any) -> float:
+        """Delegations are cached only if every tool of the agent is cacheable (and it has no MCP servers)."""
+        if not self.enabled or self.delegate_ttl <= 0 or getattr(agent, "mcp_servers", None):
+            return 0.0
+        if any(self.ttl(getattr(tool, "name", "")) <= 0 for tool in getattr(agent, "tools", None) or []):
+            return 0.0
+        return self.delegate_ttl
+
+    def get(self, user_id: str, tool_name: str, args: Any) -> Tuple[bool, Any]:
+        """(True, result) on a hit, (False, None) otherwise."""
+        key = (user_id, canonical_tool_name(tool_name), self._digest(args))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits[tool_name] = self.hits.get(tool_name, 0) + 1
+                return True, copy.deepcopy(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses[tool_name] = self.misses.get(tool_name, 0) + 1
+            return False, None
+
+    def put(self, user_id: str, tool_name: str, args: Any, result: Any, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        key = (user_id, canonical_tool_name(tool_name), self._digest(args))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, user_id: Optional[str] = None) -> int:
+        with self._lock:
+            keys = [key for key in self._entries if user_id is None or key[0] == user_id]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = sum(self.hits.values())
+            misses = sum(self.misses.values())
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "evictions": self.evictions,
+                "per_tool": {
+                    tool: {"hits": self.hits.get(tool, 0), "misses": self.misses.get(tool, 0)}
+                    for tool in sorted(set(self.hits) | set(self.misses))
+                },
+            }
+
+    @staticmethod
+    def _digest(args: Any) -> str:
+        return hashlib.sha256(canonical_args(args).encode("utf-8")).hexdigest()
+
+
+def _configured_ttls() -> Dict[str, float]:
+    if not TOOL_RESULT_CACHE_TTLS:
+        return {}
+    try:
+        return {name: float(ttl) for name, ttl in json.loads(TOOL_RESULT_CACHE_TTLS).items()}
+    except (ValueError, AttributeError) as e:
+        logger.error(f"[RESULT_CACHE] Ignoring invalid TOOL_RESULT_CACHE_TTLS: {e}")
+        return {}
+
+
+result_cache = ToolResultCache()
@@ -0,0 +1,252 @@
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Run store configuration
+RUN_STORE = os.getenv("RUN_STORE", "memory")  # "memory" or "sqlite"
+RUN_STORE_PATH = os.getenv("RUN_STORE_PATH", "runs/runs.db")
+RUN_STORE_TTL = float(os.getenv("RUN_STORE_TTL", "3600"))
+RUN_STORE_ACTIVE_TTL = float(os.getenv("RUN_STORE_ACTIVE_TTL", "86400"))
+RUN_STORE_MAX_SIZE = int(os.getenv("RUN_STORE_MAX_SIZE", "10000"))
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+@dataclass
+class RunRecord:
+    """Status, timings and result of a workflow run; what the API serves once a run is submitted."""
+    trace_id: str
+    user_id: str
+    status: str = "pending"
+    result: Any = None
+    created_at: float = field(default_factory=time.time)
+    # What the run was asked to do, so a resume can check it reruns the same workflow and task
+    config_hash: Optional[str] = None
+    user_task: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    build_timings: Dict[str, float] = field(default_factory=dict)
+    workflow_cache_hit: Optional[bool] = None
+    nodes: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    turns: List[Dict[str, Any]] = field(default_factory=list)
+    usage: Dict[str, int] = field(default_factory=dict)
+    timings: Dict[str, Any] = field(default_factory=dict)
+    profile: Optional[List[Dict[str, Any]]] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RunRecord":
+        known = {name: data[name] for name in cls.__dataclass_fields__ if name in data}
+        return cls(**known)
+
+
+class RunStore(abc.ABC):
+    """
+    Run records by trace_id.
+
+    Finished runs expire `ttl` seconds after their last update; pending and running runs after
+    `active_ttl`, so runs lost in a crash do not stay "running" forever.
+    """
+
+    name = "store"
+
+    def __init__(self, ttl: float = RUN_STORE_TTL, active_ttl: float = RUN_STORE_ACTIVE_TTL):
+        self.ttl = ttl
+        self.active_ttl = active_ttl
+
+    @abc.abstractmethod
+    def put(self, record: RunRecord) -> None:
+        """Insert or replace a record."""
+
+    @abc.abstractmethod
+    def get(self, trace_id: str) -> Optional[RunRecord]:
+        """The record of `trace_id`, or None if it is unknown or expired."""
+
+    @abc.abstractmethod
+    def delete(self, trace_id: str) -> bool:
+        """Remove a record. Returns False if there was none."""
+
+    @abc.abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Record counts per status."""
+
+    def update(self, trace_id: str, **fields: Any) -> Optional[RunRecord]:
+        """Change fields of an existing record."""
+        record = self.get(trace_id)
+        if record is None:
+            return None
+        for name, value in fields.items():
+            setattr(record, name, value)
+        self.put(record)
+        return record
+
+    def close(self) -> None:
+        """Release connections."""
+
+    def _expires_at(self, record: RunRecord, now: float) -> float:
+        return now + (self.ttl if record.finished else self.active_ttl)
+
+
+class MemoryRunStore(RunStore):
+    """In-process store bounded by `max_size`; the oldest finished runs are evicted first."""
+
+    name = "memory"
+
+    def __init__(self, ttl: float = RUN_STORE_TTL, active_ttl: float = RUN_STORE_ACTIVE_TTL, max_size: int = RUN_STORE_MAX_SIZE):
+        super().__init__(ttl, active_ttl)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._records: "OrderedDict[str, tuple[float, RunRecord]]" = OrderedDict()
+        self.evictions = 0
+
+    def put(self, record: RunRecord) -> None:
+        now = time.time()
+        with self._lock:
+            self._records.pop(record.trace_id, None)
+            self._records[record.trace_id] = (self._expires_at(record, now), RunRecord.from_dict(record.to_dict()))
+            self._evict(now)
+
+    def get(self, trace_id: str) -> Optional[RunRecord]:
+        with self._lock:
+            entry = self._records.get(trace_id)
+            if entry is None:
+                return None
+            expires_at, record = entry
+            if expires_at <= time.time():
+                del self._records[trace_id]
+                self.evictions += 1
+                return None
+            # Callers get a copy, updates go through put()
+            return RunRecord.from_dict(record.to_dict())
+
+    def delete(self, trace_id: str) -> bool:
+        with self._lock:
+            return self._records.pop(trace_id, None) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._evict(time.time())
+            statuses: Dict[str, int] = {}
+            for _, record in self._records.values():
+                statuses[record.status] = statuses.get(record.status, 0) + 1
+            return {"store": self.name, "records": len(self._records), "statuses": statuses, "evictions": self.evictions}
+
+    def _evict(self, now: float) -> None:
+        # Lock must be held
+        for trace_id, (expires_at, _) in list(self._records.items()):
+            if expires_at <= now:
+                del self._records[trace_id]
+                self.evictions += 1
+
+        if len(self._records) <= self.max_size:
+            return
+        finished = [trace_id for trace_id, (_, record) in self._records.items() if record.finished]
+        active = [trace_id for trace_id, (_, record) in self._records.items() if not record.finished]
+        for trace_id in finished + active:
+            if len(self._records) <= self.max_size:
+                break
+            del self._records[trace_id]
+            self.evictions += 1
+
+
+class SQLiteRunStore(RunStore):
+    """
+    Run records in an embedded SQLite database.
+
+    Status survives restarts and is shared by every process on the node using the same file
+    (e.g. several uvicorn workers). Each thread gets its own connection.
+    """
+
+    name = "sqlite"
+
+    # Expired rows are purged at most this often
+    PURGE_INTERVAL = 60.0
+
+    def __init__(self, path: str = RUN_STORE_PATH, ttl: float = RUN_STORE_TTL, active_ttl: float = RUN_STORE_ACTIVE_TTL):
+        super().__init__(ttl, active_ttl)
+        self.path = path
+        self._local = threading.local()
+        self._last_purge = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " trace_id TEXT PRIMARY KEY,"
+                " user_id TEXT NOT NULL,"
+                " status TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS runs_expires_at ON runs (expires_at)")
+
+    def put(self, record: RunRecord) -> None:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO runs (trace_id, user_id, status, data, updated_at, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    record.trace_id, record.user_id, record.status,
+                    json.dumps(record.to_dict(), default=str), now, self._expires_at(record, now),
+                ),
+            )
+            if now - self._last_purge >= self.PURGE_INTERVAL:
+                self._last_purge = now
+                conn.execute("DELETE FROM runs WHERE expires_at <= ?", (now,))
+
+    def get(self, trace_id: str) -> Optional[RunRecord]:
+        row = self._connect().execute(
+            "SELECT data FROM runs WHERE trace_id = ? AND expires_at > ?", (trace_id, time.time())
+        ).fetchone()
+        return RunRecord.from_dict(json.loads(row[0])) if row is not None else None
+
+    def delete(self, trace_id: str) -> bool:
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM runs WHERE trace_id = ?", (trace_id,)).rowcount > 0
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self._connect().execute(
+            "SELECT status, COUNT(*) FROM runs WHERE expires_at > ? GROUP BY status", (time.time(),)
+        ).fetchall()
+        statuses = {status: count for status, count in rows}
+        return {"store": self.name, "records": sum(statuses.values()), "statuses": statuses}
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+
+def create_run_store(kind: Optional[str] = None) -> RunStore:
+    """Create the run store selected by `kind` or the RUN_STORE environment variable."""
+    kind = (kind or RUN_STORE).lower()
+    if kind == "memory":
+        return MemoryRunStore()
+    if kind == "sqlite":
+        return SQLiteRunStore()
+    raise ValueError(f"Unknown run store: {kind}")
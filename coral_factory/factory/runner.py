@@ -1,43 +1,195 @@
 import asyncio
-from threading import Thread
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
 from factory.builder import WorkflowConfig
 from factory.builder import start_agents
+from factory.context import RunContext
+from factory.events import run_events
+from factory.run_store import RunRecord, RunStore
+from factory.workflow_cache import workflow_config_hash
 
 import logging
 logger = logging.getLogger(__name__)
 
-class WorkflowRunner(Thread):
-    def __init__(self, workflow_config: WorkflowConfig, user_id: str, user_task: str, trace_id: str):
-        super().__init__()
+
+# Default deadline of a run in seconds, 0 for none; requests can set their own deadline_seconds
+FACTORY_RUN_DEADLINE_SECONDS = float(os.getenv("FACTORY_RUN_DEADLINE_SECONDS", "0"))
+
+
+class WorkflowRunner:
+    """
+    A single workflow run, executed by a worker of factory.scheduler.WorkflowScheduler.
+
+    The runner only lives while the run is queued or executing; its status, timings and result
+    are written to `run_store`, which is what the API serves. A run can be cancelled from any
+    thread with cancel(), and is cancelled when it exceeds `deadline_seconds`.
+    """
+
+    def __init__(
+        self,
+        workflow_config: WorkflowConfig,
+        user_id: str,
+        user_task: str,
+        trace_id: str,
+        run_store: Optional[RunStore] = None,
+        resume_nodes: Optional[Dict[str, Dict[str, Any]]] = None,
+        queued_at: Optional[float] = None,
+        profile: bool = False,
+        deadline_seconds: Optional[float] = None,
+    ):
         self.workflow_config = workflow_config
         self.trace_id = trace_id
         self.user_id = user_id
         self.user_task = user_task
         self.status = "pending"
-        self.result = None
+        self.result: Any = None
+        self.enqueued_at: Optional[float] = None
+        # Wall-clock time the run was accepted, when it waited in a queue before this runner existed
+        self.queued_at = queued_at
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.deadline_seconds = deadline_seconds or FACTORY_RUN_DEADLINE_SECONDS or None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cancel_reason: Optional[str] = None
+        self.events = run_events.create(trace_id)
+        self.run_context = RunContext(user_id=user_id, run_id=trace_id, events=self.events)
+        if profile:
+            self.run_context.profile = []
+        # Graph nodes completed by an earlier run are not executed again
+        self.run_context.node_results.update(resume_nodes or {})
+        self.run_store = run_store
+        # Runs from the shared job queue already have a record
+        if run_store is not None and run_store.get(trace_id) is None:
+            run_store.put(RunRecord(
+                trace_id=trace_id,
+                user_id=user_id,
+                config_hash=workflow_config_hash(workflow_config.model_dump()),
+                user_task=user_task,
+            ))
 
-    def run(self):
+    async def run(self):
+        with self._lock:
+            if self.status == "cancelled":
+                return
+            self.status = "running"
+            self._task = asyncio.current_task()
+            self._loop = asyncio.get_running_loop()
         logger.info(f"Running workflow {self.trace_id}")
-        self.status = "running"
+        self.started_at = time.monotonic()
+        self.run_context.started_at = time.time()
+        if self.queued_at is not None:
+            self.run_context.timings.add("queue_wait", max(0.0, self.run_context.started_at - self.queued_at))
+        elif self.enqueued_at is not None:
+            self.run_context.timings.add("queue_wait", self.started_at - self.enqueued_at)
+        self.events.publish("run.started", relations_type=self.workflow_config.relations_type)
+        self._save(status="running", started_at=time.time())
+        deadline = asyncio.timeout(self.deadline_seconds)
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-
-            # Run async func
-            out = loop.run_until_complete(
-                start_agents(
-                    self.workflow_config, 
-                    user_task=self.user_task, 
-                    user_id=self.user_id
+            async with deadline:
+                out = await start_agents(
+                    self.workflow_config,
+                    user_task=self.user_task,
+                    user_id=self.user_id,
+                    run_context=self.run_context
                 )
-            )
-            loop.close()
         except Exception as e:
+            if deadline.expired():
+                self._finish_cancelled(f"Workflow exceeded its deadline of {self.deadline_seconds}s")
+                return
             logger.error(f"Workflow {self.trace_id} failed: {e}")
             self.status = "failed"
             self.result = str(e)
+            self._save_finished()
+            self.events.publish("run.failed", error=self.result)
             return
+        except asyncio.CancelledError:
+            if self._cancel_reason is None:
+                # The scheduler is stopping, not a cancel() of this run
+                self._interrupted()
+                raise
+            # Cancelled through cancel(): the run ends here and the worker moves on to the next job
+            self._finish_cancelled(self._cancel_reason)
+            if self._task.uncancel() == 0:
+                return
+            raise
+        finally:
+            self.finished_at = time.monotonic()
         self.result = out
         self.status = "completed"
-        logger.info(f"Workflow {self.trace_id} completed")
-        return out
\ No newline at end of file
+        self._save_finished()
+        self.events.publish(
+            "run.completed",
+            output=out,
+            duration_seconds=self.finished_at - self.started_at,
+            build_timings=self.run_context.build_timings,
+            timings=self.run_context.timings.to_dict(),
+            usage=self.run_context.usage,
+        )
+        usage = self.run_context.usage
+        logger.info(
+            f"Workflow {self.trace_id} completed: {usage['total_tokens']} tokens, "
+            f"{usage['cached_tokens']} of {usage['input_tokens']} input tokens cached"
+        )
+        return out
+
+    def cancel(self, reason: str = "Workflow cancelled") -> bool:
+        """
+        Cancel the run from any thread. A queued run is finished right away; a running run has
+        its task tree (agents, delegations, tool calls) cancelled on its event loop, which also
+        closes its MCP sessions. Returns False if the run already finished.
+        """
+        with self._lock:
+            if self.status not in ("pending", "running") or self._cancel_reason is not None:
+                return False
+            self._cancel_reason = reason
+            if self._task is None:
+                self.status = "cancelled"
+        if self._loop is None:
+            self._finish_cancelled(reason)
+        else:
+            self._loop.call_soon_threadsafe(self._cancel_task)
+        return True
+
+    def _cancel_task(self) -> None:
+        if self.status == "running" and self._task is not None:
+            logger.info(f"Cancelling workflow {self.trace_id}: {self._cancel_reason}")
+            self._task.cancel()
+
+    def _finish_cancelled(self, reason: str) -> None:
+        logger.warning(f"Workflow {self.trace_id} cancelled: {reason}")
+        self.status = "cancelled"
+        self.result = reason
+        self._save_finished()
+        self.events.publish("run.cancelled", reason=reason)
+
+    def _interrupted(self) -> None:
+        """The run was stopped by a scheduler shutdown; nothing will resume it here."""
+        self._finish_cancelled("Workflow interrupted by a shutdown")
+
+    def _save(self, **fields: Any) -> None:
+        if self.run_store is None:
+            return
+        try:
+            self.run_store.update(self.trace_id, **fields)
+        except Exception as e:
+            logger.error(f"Failed to save state of workflow {self.trace_id}: {e}")
+
+    def _save_finished(self) -> None:
+        if self.started_at is not None:
+            self.run_context.timings.add("total", time.monotonic() - self.started_at)
+        self._save(
+            status=self.status,
+            result=self.result,
+            finished_at=time.time(),
+            build_timings=self.run_context.build_timings,
+            workflow_cache_hit=self.run_context.workflow_cache_hit,
+            nodes=self.run_context.node_results,
+            turns=self.run_context.turn_usage,
+            usage=self.run_context.usage,
+            timings=self.run_context.timings.to_dict(),
+            profile=self.run_context.profile,
+        )
@@ -0,0 +1,389 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Scheduler configuration
+DEFAULT_EVENT_LOOPS = int(os.getenv("FACTORY_EVENT_LOOPS", "2"))
+DEFAULT_WORKERS_PER_LOOP = int(os.getenv("FACTORY_WORKERS_PER_LOOP", "8"))
+DEFAULT_MAX_QUEUE_SIZE = int(os.getenv("FACTORY_MAX_QUEUE_SIZE", "500"))
+DEFAULT_MAX_QUEUED_PER_USER = int(os.getenv("FACTORY_MAX_QUEUED_PER_USER", "50"))
+
+# Number of recent wait times kept for percentile reporting
+WAIT_SAMPLE_SIZE = 1000
+
+
+class QueueFullError(Exception):
+    """Raised when admission control rejects a job."""
+
+
+class FairJobQueue:
+    """
+    Bounded, thread-safe job queue that round-robins between tenants.
+
+    Jobs are grouped per tenant (user_id) and get() serves one job per tenant in turn, so a
+    single user flooding the queue cannot starve everybody else. Consumers may await get()
+    from different event loops.
+    """
+
+    def __init__(self, max_size: int, max_per_tenant: int):
+        self.max_size = max_size
+        self.max_per_tenant = max_per_tenant
+        self._lock = threading.Lock()
+        self._tenants: "OrderedDict[str, Deque[Any]]" = OrderedDict()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._size = 0
+
+    def qsize(self) -> int:
+        with self._lock:
+            return self._size
+
+    def tenant_depths(self) -> Dict[str, int]:
+        with self._lock:
+            return {tenant: len(pending) for tenant, pending in self._tenants.items()}
+
+    def put_nowait(self, tenant: str, job: Any) -> None:
+        """Enqueue a job or raise QueueFullError if the queue or the tenant is at capacity."""
+        with self._lock:
+            if self._size >= self.max_size:
+                raise QueueFullError(f"Job queue is full ({self.max_size} queued jobs)")
+
+            pending = self._tenants.get(tenant)
+            if pending is not None and len(pending) >= self.max_per_tenant:
+                raise QueueFullError(f"Too many queued jobs for user '{tenant}' ({self.max_per_tenant})")
+
+            if pending is None:
+                pending = self._tenants[tenant] = deque()
+            pending.append(job)
+            self._size += 1
+            self._wake_one()
+
+    def remove(self, tenant: str, job: Any) -> bool:
+        """Take a queued job out of the queue. Returns False if it was not queued."""
+        with self._lock:
+            pending = self._tenants.get(tenant)
+            if pending is None or job not in pending:
+                return False
+            pending.remove(job)
+            self._size -= 1
+            if not pending:
+                del self._tenants[tenant]
+            return True
+
+    async def get(self) -> Any:
+        """Wait for the next job, serving tenants round-robin."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                job = self._pop()
+                if job is not None:
+                    return job
+                waiter = loop.create_future()
+                self._waiters.append(waiter)
+
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._lock:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                raise
+
+    def _pop(self) -> Optional[Any]:
+        # Lock must be held
+        if not self._tenants:
+            return None
+
+        tenant, pending = next(iter(self._tenants.items()))
+        job = pending.popleft()
+        self._size -= 1
+
+        # Tenant goes to the back of the line if it still has work queued
+        if pending:
+            self._tenants.move_to_end(tenant)
+        else:
+            del self._tenants[tenant]
+        return job
+
+    def _wake_one(self) -> None:
+        # Lock must be held
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.get_loop().call_soon_threadsafe(self._notify, waiter)
+                return
+
+    def _notify(self, waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.set_result(None)
+            return
+
+        # The waiter was cancelled before it could be woken, pass the wakeup on
+        with self._lock:
+            if self._size:
+                self._wake_one()
+
+
+class SchedulerMetrics:
+    """Counters and queue wait-time statistics for the scheduler."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.running = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._wait_samples: Deque[float] = deque(maxlen=WAIT_SAMPLE_SIZE)
+
+    def record_submitted(self) -> None:
+        with self._lock:
+            self.submitted += 1
+
+    def record_rejected(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def record_started(self, wait_seconds: float) -> None:
+        with self._lock:
+            self.started += 1
+            self.running += 1
+            self._wait_total += wait_seconds
+            self._wait_max = max(self._wait_max, wait_seconds)
+            self._wait_samples.append(wait_seconds)
+
+    def record_finished(self, status: Optional[str]) -> None:
+        with self._lock:
+            self.running -= 1
+            if status == "failed":
+                self.failed += 1
+            elif status == "cancelled":
+                self.cancelled += 1
+            else:
+                self.completed += 1
+
+    def record_cancelled(self) -> None:
+        """A job cancelled before a worker picked it up."""
+        with self._lock:
+            self.cancelled += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self._wait_samples)
+            return {
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "started": self.started,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "running": self.running,
+                "wait_seconds": {
+                    "avg": self._wait_total / self.started if self.started else 0.0,
+                    "max": self._wait_max,
+                    "p50": _percentile(samples, 0.50),
+                    "p95": _percentile(samples, 0.95),
+                },
+            }
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+class WorkflowScheduler:
+    """
+    Runs workflow jobs on a fixed pool of long-lived event loops.
+
+    Each event loop lives in its own thread and hosts `workers_per_loop` worker coroutines that
+    pull jobs from a shared FairJobQueue. A job is any object with a `user_id` attribute, an
+    `enqueued_at` timestamp and an async `run()` method (see factory.runner.WorkflowRunner).
+    Jobs that also have a `trace_id` and a thread-safe `cancel(reason)` method can be cancelled
+    through cancel(), whether they are still queued or already running.
+    """
+
+    def __init__(
+        self,
+        event_loops: int = DEFAULT_EVENT_LOOPS,
+        workers_per_loop: int = DEFAULT_WORKERS_PER_LOOP,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        max_queued_per_user: int = DEFAULT_MAX_QUEUED_PER_USER,
+    ):
+        if event_loops < 1 or workers_per_loop < 1:
+            raise ValueError("Scheduler needs at least one event loop and one worker per loop")
+
+        self.event_loops = event_loops
+        self.workers_per_loop = workers_per_loop
+        self.queue = FairJobQueue(max_size=max_queue_size, max_per_tenant=max_queued_per_user)
+        self.metrics = SchedulerMetrics()
+        self._threads: List[threading.Thread] = []
+        self._loops: List[asyncio.AbstractEventLoop] = []
+        self._loops_lock = threading.Lock()
+        self._shutdown_hooks: List[Callable[[], Awaitable[None]]] = []
+        self._running = False
+        # Queued and running jobs by trace_id, for cancel()
+        self._jobs: Dict[str, Any] = {}
+        self._jobs_lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.event_loops * self.workers_per_loop
+
+    @property
+    def in_flight(self) -> int:
+        """Jobs queued or running."""
+        return self.queue.qsize() + self.metrics.running
+
+    def add_shutdown_hook(self, hook: Callable[[], Awaitable[None]]) -> None:
+        """Register a coroutine function run on every event loop before it closes, e.g. to close loop-bound clients."""
+        self._shutdown_hooks.append(hook)
+
+    def start(self) -> None:
+        """Start the event loop threads and their workers."""
+        if self._running:
+            return
+
+        logger.info(
+            f"[SCHEDULER] Starting {self.event_loops} event loops x {self.workers_per_loop} workers "
+            f"(queue size: {self.queue.max_size}, per user: {self.queue.max_per_tenant})"
+        )
+        self._running = True
+        for index in range(self.event_loops):
+            ready = threading.Event()
+            thread = threading.Thread(
+                target=self._run_loop,
+                args=(index, ready),
+                name=f"workflow-loop-{index}",
+                daemon=True,
+            )
+            thread.start()
+            ready.wait()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop all event loops, cancelling in-flight jobs."""
+        if not self._running:
+            return
+
+        logger.info(f"[SCHEDULER] Stopping scheduler")
+        self._running = False
+        with self._loops_lock:
+            for loop in self._loops:
+                loop.call_soon_threadsafe(loop.stop)
+
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def submit(self, job: Any) -> None:
+        """Admit a job to the queue, raising QueueFullError when it is at capacity."""
+        if not self._running:
+            raise RuntimeError("Scheduler is not running")
+
+        job.enqueued_at = time.monotonic()
+        trace_id = getattr(job, "trace_id", None)
+        if trace_id is not None:
+            with self._jobs_lock:
+                self._jobs[trace_id] = job
+        try:
+            self.queue.put_nowait(job.user_id, job)
+        except QueueFullError:
+            self._forget(job)
+            self.metrics.record_rejected()
+            raise
+        self.metrics.record_submitted()
+
+    def cancel(self, trace_id: str, reason: str = "Workflow cancelled") -> bool:
+        """
+        Cancel a queued or running job. A queued job leaves the queue at once; a running job is
+        cancelled on its event loop and its worker moves on. Returns False for unknown jobs.
+        """
+        with self._jobs_lock:
+            job = self._jobs.get(trace_id)
+        if job is None:
+            return False
+
+        if self.queue.remove(job.user_id, job):
+            self._forget(job)
+            self.metrics.record_cancelled()
+        return job.cancel(reason)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, worker utilisation and wait-time metrics."""
+        return {
+            "event_loops": self.event_loops,
+            "workers_per_loop": self.workers_per_loop,
+            "capacity": self.capacity,
+            "queue_depth": self.queue.qsize(),
+            "queue_max_size": self.queue.max_size,
+            "queued_per_user": self.queue.tenant_depths(),
+            **self.metrics.snapshot(),
+        }
+
+    def _run_loop(self, index: int, ready: threading.Event) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        with self._loops_lock:
+            self._loops.append(loop)
+
+        workers = [
+            loop.create_task(self._worker(f"{index}.{slot}"))
+            for slot in range(self.workers_per_loop)
+        ]
+        ready.set()
+
+        try:
+            loop.run_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            loop.run_until_complete(asyncio.gather(*workers, return_exceptions=True))
+            for hook in self._shutdown_hooks:
+                try:
+                    loop.run_until_complete(hook())
+                except Exception as e:
+                    logger.warning(f"[SCHEDULER] Shutdown hook failed on event loop {index}: {e}")
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            with self._loops_lock:
+                self._loops.remove(loop)
+            loop.close()
+            logger.info(f"[SCHEDULER] Event loop {index} stopped")
+
+    async def _worker(self, name: str) -> None:
+        while True:
+            job = await self.queue.get()
+            wait_seconds = time.monotonic() - job.enqueued_at
+            self.metrics.record_started(wait_seconds)
+            logger.info(f"[SCHEDULER] Worker {name} picked up job for user {job.user_id} after {wait_seconds:.3f}s in queue")
+
+            status = "failed"
+            try:
+                await job.run()
+                status = getattr(job, "status", None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"[SCHEDULER] Worker {name} job crashed: {e}")
+            finally:
+                self._forget(job)
+                self.metrics.record_finished(status)
+
+    def _forget(self, job: Any) -> None:
+        trace_id = getattr(job, "trace_id", None)
+        if trace_id is not None:
+            with self._jobs_lock:
+                if self._jobs.get(trace_id) is job:
+                    del self._jobs[trace_id]
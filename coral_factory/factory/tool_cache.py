@@ -0,0 +1,176 @@
+import asyncio
+import concurrent.futures
+import dataclasses
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from agents_arcade import get_arcade_tools  # type: ignore
+
+from factory.clients import rebind_arcade_tool
+from factory.rate_limit import rate_limiter
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Cache configuration
+DEFAULT_TTL_SECONDS = float(os.getenv("ARCADE_TOOL_CACHE_TTL", "3600"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("ARCADE_TOOL_CACHE_SIZE", "512"))
+
+ToolKey = Tuple[str, Optional[str]]
+
+
+def tool_cache_key(tool_name: str) -> ToolKey:
+    """Split an Arcade tool reference such as "Gmail.SendEmail@1.2.0" into (name, version)."""
+    name, _, version = tool_name.partition("@")
+    return name, version or None
+
+
+@dataclasses.dataclass
+class _CacheEntry:
+    tool: Any
+    expires_at: float
+
+
+class ToolDefinitionCache:
+    """
+    Process-wide cache of Arcade tool definitions.
+
+    Entries are keyed on (tool name, toolkit version), expire after `ttl_seconds` and the least
+    recently used entries are evicted beyond `max_entries`. Concurrent misses for the same tool
+    share a single Arcade request, even when they come from different event loops.
+    """
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[ToolKey, _CacheEntry]" = OrderedDict()
+        self._inflight: Dict[ToolKey, concurrent.futures.Future] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    async def get_tools(self, client: Any, tool_names: List[str]) -> List[Any]:
+        """Return FunctionTools for `tool_names`, fetching only the ones not cached."""
+        return list(await asyncio.gather(*(self.get(client, name) for name in tool_names)))
+
+    async def get(self, client: Any, tool_name: str) -> Any:
+        """Return a FunctionTool for `tool_name`, fetching its definition from Arcade on a miss."""
+        key = tool_cache_key(tool_name)
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._instantiate(entry.tool, client)
+                if entry is not None:
+                    del self._entries[key]
+
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._inflight[key] = concurrent.futures.Future()
+                    generation = self._generation
+                    self.misses += 1
+                else:
+                    self.coalesced += 1
+
+            if not leader:
+                # Shield so that cancelling this waiter does not cancel the shared fetch
+                template = await asyncio.shield(asyncio.wrap_future(flight))
+                if template is None:
+                    # The fetching task was cancelled, try again
+                    continue
+                return self._instantiate(template, client)
+
+            try:
+                template = await self._fetch(client, tool_name)
+            except Exception as e:
+                self._finish_flight(key, flight)
+                flight.set_exception(e)
+                raise
+            except BaseException:
+                self._finish_flight(key, flight)
+                flight.set_result(None)
+                raise
+
+            self._store(key, template, generation)
+            self._finish_flight(key, flight)
+            flight.set_result(template)
+            return self._instantiate(template, client)
+
+    def invalidate(self, tool_name: Optional[str] = None, toolkit: Optional[str] = None) -> int:
+        """Drop cached definitions for a tool, a toolkit, or everything. Returns the number removed."""
+        with self._lock:
+            self._generation += 1
+            if tool_name is None and toolkit is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+
+            name = tool_cache_key(tool_name)[0] if tool_name else None
+            prefix = f"{toolkit}.".lower() if toolkit else None
+            stale = [
+                key for key in self._entries
+                if (name is not None and key[0] == name)
+                or (prefix is not None and key[0].lower().startswith(prefix))
+            ]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "in_flight": len(self._inflight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+            }
+
+    async def _fetch(self, client: Any, tool_name: str) -> Any:
+        logger.info(f"[TOOL_CACHE] Fetching tool definition from Arcade: {tool_name}")
+        tools = await rate_limiter.call(
+            "arcade", "tools.definitions", lambda: get_arcade_tools(client, tools=[tool_name]),
+            api_key=getattr(client, "api_key", None),
+        )
+        if len(tools) != 1:
+            raise ValueError(f"Expected one tool definition for '{tool_name}', got {len(tools)}")
+        return tools[0]
+
+    def _store(self, key: ToolKey, template: Any, generation: int) -> None:
+        with self._lock:
+            # Skip results fetched before an invalidation
+            if generation != self._generation:
+                return
+            self._entries[key] = _CacheEntry(tool=template, expires_at=time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _finish_flight(self, key: ToolKey, flight: concurrent.futures.Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+
+    @staticmethod
+    def _instantiate(template: Any, client: Any) -> Any:
+        # Callers wrap on_invoke_tool in place, so every agent gets its own copy, and the copy
+        # must call Arcade through the caller's client rather than the one that fetched it
+        return rebind_arcade_tool(dataclasses.replace(template), client)
+
+
+tool_cache = ToolDefinitionCache()
@@ -0,0 +1,85 @@
+"""
+Measure the tracing overhead of each trace sink.
+
+Pushes synthetic trace and span writes through a BatchTraceExporter and reports the time spent
+in the tracing callbacks (enqueue) and in the sink (write).
+
+    python -m factory.trace_bench --sinks jsonl sqlite --traces 200 --spans 20
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+from factory.trace_sinks import JsonlFileSink, SQLiteSink, TraceSink, WriteOp, create_sink
+from factory.trace_stream import BatchTraceExporter
+
+
+def _make_sink(kind: str, directory: str) -> TraceSink:
+    if kind == "jsonl":
+        return JsonlFileSink(path=os.path.join(directory, "bench.jsonl"))
+    if kind == "sqlite":
+        return SQLiteSink(path=os.path.join(directory, "bench.db"))
+    sink = create_sink(kind)
+    if sink is None:
+        raise ValueError(f"Trace sink {kind} is disabled")
+    return sink
+
+
+def bench_sink(kind: str, traces: int, spans: int, directory: str) -> Dict[str, Any]:
+    exporter = BatchTraceExporter(
+        _make_sink(kind, directory), max_queue_size=traces * (spans + 1) * 2, flush_interval=0.05, drop_policy="block",
+    )
+    exporter.start()
+
+    payload = {"input": "x" * 256, "output": "y" * 256}
+    started = time.perf_counter()
+    for _ in range(traces):
+        trace_id = f"trace_{uuid.uuid4().hex}"
+        trace_path = ("users", "bench", "traces")
+        exporter.enqueue(WriteOp(kind="set", collection=trace_path, document_id=trace_id, data={
+            "trace_id": trace_id, "started_at": datetime.now(timezone.utc), "status": "running",
+        }))
+        span_path = trace_path + (trace_id, "spans")
+        for _ in range(spans):
+            span_id = f"span_{uuid.uuid4().hex}"
+            exporter.enqueue(WriteOp(kind="set", collection=span_path, document_id=span_id, data={
+                "span_id": span_id, "trace_id": trace_id, "started_at": datetime.now(timezone.utc), **payload,
+            }))
+            exporter.enqueue(WriteOp(kind="merge", collection=span_path, document_id=span_id, data={
+                "ended_at": datetime.now(timezone.utc), "status": "completed",
+            }))
+        exporter.enqueue(WriteOp(kind="merge", collection=trace_path, document_id=trace_id, data={
+            "ended_at": datetime.now(timezone.utc), "status": "completed",
+        }))
+    enqueued_in = time.perf_counter() - started
+    exporter.shutdown(timeout=None)
+    total = time.perf_counter() - started
+
+    stats = exporter.stats()
+    return {
+        **stats,
+        "ops_per_second": stats["flushed"] / total if total else 0.0,
+        "enqueue_seconds": round(enqueued_in, 4),
+        "total_seconds": round(total, 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark trace sinks")
+    parser.add_argument("--sinks", nargs="+", default=["jsonl", "sqlite"])
+    parser.add_argument("--traces", type=int, default=100)
+    parser.add_argument("--spans", type=int, default=20, help="spans per trace")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for kind in args.sinks:
+            print(json.dumps(bench_sink(kind, args.traces, args.spans, directory)))
+
+
+if __name__ == "__main__":
+    main()
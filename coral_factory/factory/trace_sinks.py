@@ -0,0 +1,246 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+import abc
+import gzip
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+
+# Sink configuration
+TRACE_SINK = os.getenv("TRACE_SINK")  # "firestore", "jsonl", "sqlite" or "none"
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH", "traces/traces.jsonl")
+TRACE_JSONL_MAX_BYTES = int(os.getenv("TRACE_JSONL_MAX_BYTES", str(64 * 1024 * 1024)))
+TRACE_JSONL_BACKUP_COUNT = int(os.getenv("TRACE_JSONL_BACKUP_COUNT", "10"))
+TRACE_SQLITE_PATH = os.getenv("TRACE_SQLITE_PATH", "traces/traces.db")
+
+
+@dataclass
+class WriteOp:
+    """A pending trace write to `collection/document_id`: a full `set`, or a `merge` of fields."""
+    kind: str
+    collection: Tuple[str, ...]
+    document_id: str
+    data: Dict[str, Any]
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+def coalesce_ops(ops: List[WriteOp]) -> List[WriteOp]:
+    """Collapse writes to the same document within a batch into one write."""
+    writes: Dict[Tuple[Tuple[str, ...], str], WriteOp] = {}
+    for op in ops:
+        key = (op.collection, op.document_id)
+        pending = writes.get(key)
+        if pending is None:
+            writes[key] = WriteOp(kind=op.kind, collection=op.collection, document_id=op.document_id, data=dict(op.data))
+        elif op.kind == "set":
+            pending.kind = "set"
+            pending.data = dict(op.data)
+        else:
+            pending.data.update(op.data)
+    return list(writes.values())
+
+
+class TraceSink(abc.ABC):
+    """Destination of exported trace documents. write() is only called from the exporter thread."""
+
+    name = "sink"
+
+    @abc.abstractmethod
+    def write(self, ops: List[WriteOp]) -> None:
+        """Apply a batch of writes, raising if the batch could not be stored."""
+
+    def close(self) -> None:
+        """Release files and connections."""
+
+
+class FirestoreSink(TraceSink):
+    """Writes trace documents to Firestore in WriteBatches of up to 500 operations."""
+
+    name = "firestore"
+    max_batch_size = 500
+
+    def __init__(self, firebase_project_id: Optional[str] = None, firebase_service_account_path: Optional[str] = None, db=None):
+        if db is None:
+            import firebase_admin
+            from firebase_admin import credentials, firestore
+
+            # Initialize Firebase Admin SDK
+            if not firebase_admin._apps:
+                if firebase_service_account_path:
+                    cred = credentials.Certificate(firebase_service_account_path)
+                    firebase_admin.initialize_app(cred, {
+                        'projectId': firebase_project_id
+                    })
+                else:
+                    # Use default credentials (for Cloud Run, etc.)
+                    firebase_admin.initialize_app()
+            db = firestore.client()
+            logger.info("Successfully connected to Firebase Firestore")
+        self.db = db
+
+    def write(self, ops: List[WriteOp]) -> None:
+        batch = self.db.batch()
+        for op in ops:
+            ref = self._collection(op.collection).document(op.document_id)
+            batch.set(ref, op.data, merge=(op.kind == "merge"))
+        batch.commit()
+
+    def _collection(self, path: Tuple[str, ...]):
+        ref = self.db.collection(path[0])
+        for i in range(1, len(path), 2):
+            ref = ref.document(path[i]).collection(path[i + 1])
+        return ref
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+class JsonlFileSink(TraceSink):
+    """
+    Appends every write as one JSON line to a local file.
+
+    The file is rotated once it exceeds `max_bytes`; rotated files are gzip-compressed and the
+    `backup_count` most recent ones are kept. Replaying the lines in order rebuilds the documents.
+    """
+
+    name = "jsonl"
+
+    def __init__(self, path: str = TRACE_JSONL_PATH, max_bytes: int = TRACE_JSONL_MAX_BYTES, backup_count: int = TRACE_JSONL_BACKUP_COUNT):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._file = None
+
+    def write(self, ops: List[WriteOp]) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+        lines = [
+            json.dumps({
+                "op": op.kind,
+                "collection": "/".join(op.collection),
+                "document_id": op.document_id,
+                "data": op.data,
+                "written_at": datetime.now(timezone.utc).isoformat(),
+            }, default=_json_default)
+            for op in ops
+        ]
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self) -> None:
+        self.close()
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        base, ext = os.path.splitext(self.path)
+        rotated = f"{base}.{stamp}{ext}"
+        os.replace(self.path, rotated)
+
+        with open(rotated, "rb") as source, gzip.open(rotated + ".gz", "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.remove(rotated)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        prefix = os.path.basename(base) + "."
+        backups = sorted(
+            name for name in os.listdir(directory)
+            if name.startswith(prefix) and name.endswith(ext + ".gz")
+        )
+        for name in backups[:-self.backup_count] if self.backup_count > 0 else backups:
+            os.remove(os.path.join(directory, name))
+        logger.info(f"Rotated trace file to {rotated}.gz")
+
+
+class SQLiteSink(TraceSink):
+    """Stores trace documents in an embedded SQLite database, one row per document."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = TRACE_SQLITE_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def write(self, ops: List[WriteOp]) -> None:
+        conn = self._connect()
+        with conn:
+            for op in ops:
+                collection = "/".join(op.collection)
+                data = op.data
+                if op.kind == "merge":
+                    row = conn.execute(
+                        "SELECT data FROM trace_documents WHERE collection = ? AND document_id = ?",
+                        (collection, op.document_id),
+                    ).fetchone()
+                    if row is not None:
+                        data = {**json.loads(row[0]), **op.data}
+                conn.execute(
+                    "INSERT OR REPLACE INTO trace_documents (collection, document_id, data, updated_at) VALUES (?, ?, ?, ?)",
+                    (collection, op.document_id, json.dumps(data, default=_json_default), time.time()),
+                )
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Written from the exporter thread only, closed after it stops
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS trace_documents ("
+                " collection TEXT NOT NULL,"
+                " document_id TEXT NOT NULL,"
+                " data TEXT NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (collection, document_id))"
+            )
+        return self._conn
+
+
+def create_sink(kind: Optional[str] = None) -> Optional[TraceSink]:
+    """
+    Create the trace sink selected by `kind` or the TRACE_SINK environment variable.
+
+    Without TRACE_SINK, traces go to Firestore when Firebase credentials are configured and
+    are not exported otherwise.
+    """
+    kind = (kind or TRACE_SINK or "").lower()
+    if not kind:
+        if os.getenv("FIREBASE_PROJECT_ID") and os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH"):
+            kind = "firestore"
+        else:
+            kind = "none"
+
+    if kind == "none":
+        return None
+    if kind == "firestore":
+        return FirestoreSink(
+            firebase_project_id=os.getenv("FIREBASE_PROJECT_ID"),
+            firebase_service_account_path=os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH"),
+        )
+    if kind == "jsonl":
+        return JsonlFileSink()
+    if kind == "sqlite":
+        return SQLiteSink()
+    raise ValueError(f"Unknown trace sink: {kind}")
@@ -1,11 +1,14 @@
 from agents import tracing  # type: ignore[import]
+import asyncio
 from datetime import datetime, timezone
-from uuid import uuid4
-from typing import Optional
-import firebase_admin
-from firebase_admin import credentials, firestore
+from typing import Any, Dict, List, Optional
 import logging
 import os
+import queue
+import threading
+import time
+
+from factory.trace_sinks import FirestoreSink, TraceSink, WriteOp, coalesce_ops, create_sink
 
 required = (
     "TracingProcessor",
@@ -22,6 +25,226 @@ FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID")
 FIREBASE_SERVICE_ACCOUNT_PATH = os.getenv("FIREBASE_SERVICE_ACCOUNT_PATH")
 logger = logging.getLogger(__name__)
 
+# Export pipeline configuration
+TRACE_EXPORT_QUEUE_SIZE = int(os.getenv("TRACE_EXPORT_QUEUE_SIZE", "10000"))
+TRACE_EXPORT_BATCH_SIZE = int(os.getenv("TRACE_EXPORT_BATCH_SIZE", "500"))
+TRACE_EXPORT_FLUSH_INTERVAL = float(os.getenv("TRACE_EXPORT_FLUSH_INTERVAL", "1.0"))
+TRACE_EXPORT_DROP_POLICY = os.getenv("TRACE_EXPORT_DROP_POLICY", "drop")  # "drop" or "block"
+TRACE_EXPORT_BLOCK_TIMEOUT = float(os.getenv("TRACE_EXPORT_BLOCK_TIMEOUT", "0.05"))
+# Retries of a failed batch write, with exponential backoff from TRACE_EXPORT_RETRY_DELAY seconds
+TRACE_EXPORT_RETRIES = int(os.getenv("TRACE_EXPORT_RETRIES", "3"))
+TRACE_EXPORT_RETRY_DELAY = float(os.getenv("TRACE_EXPORT_RETRY_DELAY", "0.5"))
+TRACE_EXPORT_RETRY_MAX_DELAY = 5.0
+
+
+class BatchTraceExporter:
+    """
+    Background exporter that applies trace writes to a TraceSink in batches.
+
+    The tracing callbacks run inline in the agent's event loop, so they only enqueue a WriteOp.
+    A worker thread drains the bounded queue and hands batches of up to `batch_size` writes to
+    the sink whenever a batch fills up or `flush_interval` elapses. When the queue is full,
+    writes are dropped ("drop") or the caller waits up to `block_timeout` first ("block").
+    Documents are addressed directly by id, so no write needs a read first and a failed batch
+    can be written again: it is retried `retries` times with backoff before it is given up.
+    """
+
+    def __init__(
+        self,
+        sink: TraceSink,
+        max_queue_size: int = TRACE_EXPORT_QUEUE_SIZE,
+        batch_size: int = TRACE_EXPORT_BATCH_SIZE,
+        flush_interval: float = TRACE_EXPORT_FLUSH_INTERVAL,
+        drop_policy: str = TRACE_EXPORT_DROP_POLICY,
+        block_timeout: float = TRACE_EXPORT_BLOCK_TIMEOUT,
+        retries: int = TRACE_EXPORT_RETRIES,
+        retry_delay: float = TRACE_EXPORT_RETRY_DELAY,
+    ):
+        self.sink = sink
+        self.batch_size = max(1, min(batch_size, getattr(sink, "max_batch_size", batch_size)))
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+        self.retries = max(0, retries)
+        self.retry_delay = retry_delay
+        self._queue: "queue.Queue[Optional[WriteOp]]" = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+        self.write_seconds = 0.0
+        self.enqueue_seconds = 0.0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name=f"trace-export-{self.sink.name}", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, op: WriteOp) -> bool:
+        """Queue a write without blocking the agent loop. Returns False if it was dropped."""
+        if self._stopped:
+            self._count("dropped")
+            return False
+
+        started = time.perf_counter()
+        try:
+            if self.drop_policy == "block":
+                self._queue.put(op, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(op)
+        except queue.Full:
+            self._count("dropped")
+            logger.warning(f"Trace export queue full, dropped {op.kind} of {'/'.join(op.collection)}/{op.document_id}")
+            return False
+
+        with self._lock:
+            self.enqueued += 1
+            self.enqueue_seconds += time.perf_counter() - started
+        return True
+
+    def force_flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued write has been stored (or failed). Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def shutdown(self, timeout: Optional[float] = 10.0) -> None:
+        """Flush pending writes, stop the worker thread and close the sink."""
+        self.force_flush(timeout)
+        self._stopped = True
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+        self.sink.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sink": self.sink.name,
+                "queue_depth": self._queue.qsize(),
+                "enqueued": self.enqueued,
+                "dropped": self.dropped,
+                "flushed": self.flushed,
+                "failed": self.failed,
+                "retried": self.retried,
+                "batches": self.batches,
+                "avg_enqueue_us": 1e6 * self.enqueue_seconds / self.enqueued if self.enqueued else 0.0,
+                "avg_write_ms_per_op": 1e3 * self.write_seconds / self.flushed if self.flushed else 0.0,
+            }
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            ops: List[WriteOp] = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(ops) < self.batch_size:
+                try:
+                    op = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if op is None:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                ops.append(op)
+
+            if not ops:
+                continue
+            try:
+                self._write(ops)
+            finally:
+                for _ in ops:
+                    self._queue.task_done()
+
+    def _write(self, ops: List[WriteOp]) -> None:
+        writes = coalesce_ops(ops)
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                self.sink.write(writes)
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    self._count("failed", len(ops))
+                    logger.exception(f"Error writing {len(writes)} trace documents to {self.sink.name}, giving up: {e}")
+                    return
+                delay = min(TRACE_EXPORT_RETRY_MAX_DELAY, self.retry_delay * 2 ** attempt)
+                self._count("retried")
+                logger.warning(
+                    f"Error writing {len(writes)} trace documents to {self.sink.name}, "
+                    f"retry {attempt + 1}/{self.retries} in {delay:.1f}s: {e}"
+                )
+                time.sleep(delay)
+
+        with self._lock:
+            self.flushed += len(ops)
+            self.batches += 1
+            self.write_seconds += time.perf_counter() - started
+        logger.debug(f"Wrote {len(writes)} trace documents to {self.sink.name} ({len(ops)} queued)")
+
+
+_exporter: Optional[BatchTraceExporter] = None
+_exporter_configured = False
+_exporter_lock = threading.Lock()
+
+
+def get_trace_exporter() -> Optional[BatchTraceExporter]:
+    """Process-wide exporter for the sink selected by TRACE_SINK, or None when tracing is off."""
+    global _exporter, _exporter_configured
+    with _exporter_lock:
+        if not _exporter_configured:
+            sink = create_sink()
+            _exporter = BatchTraceExporter(sink) if sink is not None else None
+            _exporter_configured = True
+        if _exporter is not None:
+            _exporter.start()
+        return _exporter
+
+
+def shutdown_trace_exporter(timeout: Optional[float] = 10.0) -> None:
+    """Flush and stop the shared exporter, if one was started."""
+    with _exporter_lock:
+        exporter = _exporter
+    if exporter is not None:
+        exporter.shutdown(timeout)
+
+
+def trace_exporter_stats() -> Dict[str, Any]:
+    with _exporter_lock:
+        exporter = _exporter
+    return exporter.stats() if exporter is not None else {}
+
+
+def _ending_status() -> str:
+    """Status of a trace ending now: "cancelled" when the task running it is being cancelled."""
+    # Cancelled runs and runs past their deadline (asyncio.timeout) end their traces while the
+    # CancelledError unwinds the run's task
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        return "completed"
+    return "cancelled" if task is not None and task.cancelling() else "completed"
 
 
 class OpenAIAgentsTracingProcessor(tracing.TracingProcessor):  # type: ignore[no-redef]
@@ -33,6 +256,7 @@ class OpenAIAgentsTracingProcessor(tracing.TracingProcessor):  # type: ignore[no
             firebase_project_id: Optional[str] = None,
             firebase_service_account_path: Optional[str] = None,
             *,
+            exporter: Optional[BatchTraceExporter] = None,
             user_id: Optional[str] = None,
             metadata: Optional[dict] = None,
             tags: Optional[list[str]] = None,
@@ -46,24 +270,19 @@ class OpenAIAgentsTracingProcessor(tracing.TracingProcessor):  # type: ignore[no
             self._name = name
             self._first_response_inputs: dict = {}
             self._last_response_outputs: dict = {}
-            
-            # Initialize Firebase Admin SDK
-            try:
-                if not firebase_admin._apps:
-                    if self.firebase_service_account_path:
-                        cred = credentials.Certificate(self.firebase_service_account_path)
-                        firebase_admin.initialize_app(cred, {
-                            'projectId': self.firebase_project_id
-                        })
-                    else:
-                        # Use default credentials (for Cloud Run, etc.)
-                        firebase_admin.initialize_app()
-                
-                self.db = firestore.client()
-                logger.info("Successfully connected to Firebase Firestore")
-            except Exception as e:
-                logger.error(f"Failed to connect to Firebase Firestore: {e}")
-                raise
+
+            # Without an exporter, export straight to Firestore
+            if exporter is None:
+                try:
+                    exporter = BatchTraceExporter(FirestoreSink(
+                        firebase_project_id=self.firebase_project_id,
+                        firebase_service_account_path=self.firebase_service_account_path,
+                    ))
+                    exporter.start()
+                except Exception as e:
+                    logger.error(f"Failed to connect to Firebase Firestore: {e}")
+                    raise
+            self._writer = exporter
 
             self._active_traces: dict[str, dict] = {}
             self._active_spans: dict[str, dict] = {}
@@ -71,7 +290,7 @@ class OpenAIAgentsTracingProcessor(tracing.TracingProcessor):  # type: ignore[no
 
 
         def on_trace_start(self, trace: tracing.Trace) -> None:
-            """Start a new trace and store it in Firestore."""
+            """Start a new trace and export it."""
             if self._name:
                 trace_name = self._name
             elif trace.name:
@@ -79,7 +298,6 @@ class OpenAIAgentsTracingProcessor(tracing.TracingProcessor):  # type: ignore[no
             else:
                 trace_name = "Agent workflow"
             
-            trace_id = str(uuid4())
             start_time = datetime.now(timezone.utc)
             
             trace_dict = trace.export() or {}
@@ -103,17 +321,18 @@ class OpenAIAgentsTracingProcessor(tracing.TracingProcessor):  # type: ignore[no
                 "user_id": self.user_id,
             }
             
-            try:
-                # Store in users/{user_id}/agent_traces/{trace_id}
-                trace_ref = self.db.collection('users').document(self.user_id).collection('agent_traces').document(trace_id)
-                trace_ref.set(trace_document)
-                self._active_traces[trace.trace_id] = trace_document
-                logger.debug(f"Started trace: {trace.trace_id}")
-            except Exception as e:
-                logger.exception(f"Error creating trace in Firestore: {e}")
+            # Store in users/{user_id}/agent_traces/{trace_id}, keyed on the SDK trace id
+            self._writer.enqueue(WriteOp(
+                kind="set",
+                collection=('users', self.user_id, 'agent_traces'),
+                document_id=trace.trace_id,
+                data=trace_document,
+            ))
+            self._active_traces[trace.trace_id] = trace_document
+            logger.debug(f"Started trace: {trace.trace_id}")
 
         def on_trace_end(self, trace: tracing.Trace) -> None:
-            """End a trace and update it in Firestore."""
+            """End a trace and export the update."""
             if trace.trace_id not in self._active_traces:
                 logger.warning(f"Trace {trace.trace_id} not found in active traces")
                 return
@@ -127,7 +346,7 @@ class OpenAIAgentsTracingProcessor(tracing.TracingProcessor):  # type: ignore[no
             
             update_data = {
                 "end_time": end_time,
-                "status": "completed",
+                "status": _ending_status(),
                 "inputs": final_inputs,
                 "outputs": final_outputs,
                 "metadata": {
@@ -137,30 +356,22 @@ class OpenAIAgentsTracingProcessor(tracing.TracingProcessor):  # type: ignore[no
                 "updated_at": end_time,
             }
             
-            try:
-                # Find the trace document to update
-                trace_doc = self._active_traces[trace.trace_id]
-                if "trace_id" in trace_doc:
-                    # Update the trace using a query to find the document by trace_id
-                    traces_ref = self.db.collection('users').document(self.user_id).collection('agent_traces')
-                    docs = traces_ref.where('trace_id', '==', trace.trace_id).get()
-                    
-                    for doc in docs:
-                        doc.reference.update(update_data)
-                        break
-                
-                self._active_traces.pop(trace.trace_id, None)
-                logger.debug(f"Completed trace: {trace.trace_id}")
-            except Exception as e:
-                logger.exception(f"Error updating trace in Firestore: {e}")
+            # Blind write to the trace document, no lookup needed
+            self._writer.enqueue(WriteOp(
+                kind="merge",
+                collection=('users', self.user_id, 'agent_traces'),
+                document_id=trace.trace_id,
+                data=update_data,
+            ))
+            self._active_traces.pop(trace.trace_id, None)
+            logger.debug(f"Completed trace: {trace.trace_id}")
 
         def on_span_start(self, span: tracing.Span) -> None:
-            """Start a new span and store it in Firestore."""
+            """Start a new span and export it."""
             if span.trace_id not in self._active_traces:
                 logger.warning(f"Parent trace {span.trace_id} not found for span {span.span_id}")
                 return
                 
-            span_id = str(uuid4())
             start_time = (
                 datetime.fromisoformat(span.started_at)
                 if span.started_at
@@ -193,17 +404,18 @@ class OpenAIAgentsTracingProcessor(tracing.TracingProcessor):  # type: ignore[no
                 "user_id": self.user_id,
             }
             
-            try:
-                # Store in users/{user_id}/agent_spans/{span_id}
-                span_ref = self.db.collection('users').document(self.user_id).collection('agent_spans').document(span_id)
-                span_ref.set(span_document)
-                self._active_spans[span.span_id] = span_document
-                logger.debug(f"Started span: {span.span_id}")
-            except Exception as e:
-                logger.exception(f"Error creating span in Firestore: {e}")
+            # Store in users/{user_id}/agent_spans/{span_id}, keyed on the SDK span id
+            self._writer.enqueue(WriteOp(
+                kind="set",
+                collection=('users', self.user_id, 'agent_spans'),
+                document_id=span.span_id,
+                data=span_document,
+            ))
+            self._active_spans[span.span_id] = span_document
+            logger.debug(f"Started span: {span.span_id}")
 
         def on_span_end(self, span: tracing.Span) -> None:
-            """End a span and update it in Firestore."""
+            """End a span and export the update."""
             if span.span_id not in self._active_spans:
                 logger.warning(f"Span {span.span_id} not found in active spans")
                 return
@@ -233,19 +445,15 @@ class OpenAIAgentsTracingProcessor(tracing.TracingProcessor):  # type: ignore[no
                 )
                 self._last_response_outputs[span.trace_id] = outputs
             
-            try:
-                # Find the span document to update
-                spans_ref = self.db.collection('users').document(self.user_id).collection('agent_spans')
-                docs = spans_ref.where('span_id', '==', span.span_id).get()
-                
-                for doc in docs:
-                    doc.reference.update(update_data)
-                    break
-                
-                self._active_spans.pop(span.span_id, None)
-                logger.debug(f"Completed span: {span.span_id}")
-            except Exception as e:
-                logger.exception(f"Error updating span in Firestore: {e}")
+            # Blind write to the span document, no lookup needed
+            self._writer.enqueue(WriteOp(
+                kind="merge",
+                collection=('users', self.user_id, 'agent_spans'),
+                document_id=span.span_id,
+                data=update_data,
+            ))
+            self._active_spans.pop(span.span_id, None)
+            logger.debug(f"Completed span: {span.span_id}")
 
         def _extract_span_inputs(self, span: tracing.Span) -> dict:
             """Extract inputs from span data."""
@@ -276,14 +484,10 @@ class OpenAIAgentsTracingProcessor(tracing.TracingProcessor):  # type: ignore[no
                 return {}
 
         def shutdown(self) -> None:
-            """Clean up Firebase connection."""
-            try:
-                # Firebase Admin SDK doesn't require explicit connection closing
-                logger.debug("Firebase connection cleaned up")
-            except Exception as e:
-                logger.exception(f"Error cleaning up Firebase connection: {e}")
+            """Flush this run's pending writes; the shared exporter keeps running for other runs."""
+            self.force_flush()
 
         def force_flush(self) -> None:
-            """Force flush any pending operations."""
-            # Firestore operations are synchronous by default, so no explicit flush needed
-            pass
\ No newline at end of file
+            """Block until every queued trace write has been stored by the sink."""
+            if not self._writer.force_flush(timeout=30.0):
+                logger.warning(f"Timed out flushing trace writes to {self._writer.sink.name}")
\ No newline at end of file
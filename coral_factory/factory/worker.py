@@ -0,0 +1,162 @@
+"""
+Workflow worker process for the distributed deployment mode.
+
+The API tier (FACTORY_MODE=distributed) only enqueues runs to the shared job queue; workers
+claim them, execute them on a local WorkflowScheduler and write status and results to the
+shared run store. Start as many workers per node as there are cores to spare:
+
+    python -m factory.worker
+"""
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from factory.builder import WorkflowConfig
+from factory.clients import arcade_clients, openai_clients
+from factory.job_queue import FACTORY_JOB_LEASE_SECONDS, JobQueue, SQLiteJobQueue
+from factory.mcp_pool import mcp_pool
+from factory.run_store import RunStore, create_run_store
+from factory.runner import WorkflowRunner
+from factory.scheduler import QueueFullError, WorkflowScheduler
+from factory.trace_stream import shutdown_trace_exporter
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Worker configuration
+FACTORY_WORKER_POLL_INTERVAL = float(os.getenv("FACTORY_WORKER_POLL_INTERVAL", "0.5"))
+
+
+class QueuedWorkflowRunner(WorkflowRunner):
+    """WorkflowRunner claimed from the shared job queue; acks the job when the run ends."""
+
+    def __init__(self, job_queue: JobQueue, **kwargs):
+        super().__init__(**kwargs)
+        self.job_queue = job_queue
+
+    async def run(self):
+        out = await super().run()
+        self.job_queue.ack(self.trace_id)
+        return out
+
+    def _finish_cancelled(self, reason: str) -> None:
+        # Also reached through cancel() before the run started, when run() never returns to ack
+        super()._finish_cancelled(reason)
+        self.job_queue.ack(self.trace_id)
+
+    def _interrupted(self) -> None:
+        # Worker is shutting down, let another worker pick the run up
+        self.job_queue.release(self.trace_id)
+        self._save(status="pending", result=None, started_at=None, finished_at=None)
+
+
+class Worker:
+    """Claims jobs from `job_queue` while the local scheduler has free workers."""
+
+    def __init__(
+        self,
+        job_queue: JobQueue,
+        run_store: RunStore,
+        scheduler: Optional[WorkflowScheduler] = None,
+        worker_id: Optional[str] = None,
+        poll_interval: float = FACTORY_WORKER_POLL_INTERVAL,
+    ):
+        self.job_queue = job_queue
+        self.run_store = run_store
+        self.scheduler = scheduler or WorkflowScheduler()
+        self.scheduler.add_shutdown_hook(arcade_clients.aclose_current)
+        self.scheduler.add_shutdown_hook(openai_clients.aclose_current)
+        self.scheduler.add_shutdown_hook(mcp_pool.close_current)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.poll_interval = poll_interval
+        self._stopping = threading.Event()
+
+    def run(self) -> None:
+        logger.info(f"[WORKER] Worker {self.worker_id} starting (capacity: {self.scheduler.capacity})")
+        self.scheduler.start()
+        heartbeat_every = max(1.0, FACTORY_JOB_LEASE_SECONDS / 3)
+        last_heartbeat = 0.0
+        try:
+            while not self._stopping.is_set():
+                now = time.monotonic()
+                if now - last_heartbeat >= heartbeat_every:
+                    self.job_queue.heartbeat(self.worker_id)
+                    last_heartbeat = now
+
+                for trace_id in self.job_queue.cancellations(self.worker_id):
+                    self.scheduler.cancel(trace_id)
+
+                if not self._fill():
+                    self._stopping.wait(self.poll_interval)
+        finally:
+            logger.info(f"[WORKER] Worker {self.worker_id} stopping")
+            self.scheduler.stop()
+            # Runs still queued on the local scheduler never started, hand them to other workers
+            # instead of letting them wait out their lease
+            released = self.job_queue.release_all(self.worker_id)
+            if released:
+                logger.info(f"[WORKER] Worker {self.worker_id} released {released} unfinished jobs")
+            shutdown_trace_exporter()
+            self.job_queue.close()
+            self.run_store.close()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def _fill(self) -> int:
+        """Claim jobs up to the scheduler's free capacity. Returns the number of jobs claimed."""
+        claimed = 0
+        while self.scheduler.in_flight < self.scheduler.capacity:
+            job = self.job_queue.claim(self.worker_id)
+            if job is None:
+                break
+            if job["cancel_requested"]:
+                # Cancelled while a worker that has since died or shut down held it
+                logger.info(f"[WORKER] Workflow {job['trace_id']} was cancelled before it could run")
+                self.run_store.update(job["trace_id"], status="cancelled", result="Workflow cancelled", finished_at=time.time())
+                self.job_queue.ack(job["trace_id"])
+                continue
+
+            payload = job["payload"]
+            runner = QueuedWorkflowRunner(
+                job_queue=self.job_queue,
+                workflow_config=WorkflowConfig(**payload["workflow_config"]),
+                user_id=job["user_id"],
+                user_task=payload["user_task"],
+                trace_id=job["trace_id"],
+                run_store=self.run_store,
+                resume_nodes=payload.get("resume_nodes"),
+                queued_at=job["enqueued_at"],
+                profile=payload.get("profile", False),
+                deadline_seconds=payload.get("deadline_seconds"),
+            )
+            try:
+                self.scheduler.submit(runner)
+            except QueueFullError:
+                self.job_queue.release(job["trace_id"])
+                break
+            claimed += 1
+            logger.info(f"[WORKER] Worker {self.worker_id} claimed workflow {job['trace_id']}")
+        return claimed
+
+
+def main() -> None:
+    load_dotenv()
+    logging.basicConfig(level=os.getenv("FACTORY_LOG_LEVEL", "INFO"))
+
+    # Status and results must be visible to the API tier
+    worker = Worker(job_queue=SQLiteJobQueue(), run_store=create_run_store(os.getenv("RUN_STORE", "sqlite")))
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: worker.stop())
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
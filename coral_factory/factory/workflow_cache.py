@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Cache configuration
+WORKFLOW_CACHE_SIZE = int(os.getenv("FACTORY_WORKFLOW_CACHE_SIZE", "128"))
+WORKFLOW_CACHE_MB = float(os.getenv("FACTORY_WORKFLOW_CACHE_MB", "64"))
+
+CacheKey = Tuple[int, str]
+
+
+def workflow_config_hash(json_config: Dict[str, Any]) -> str:
+    """Content hash of a WorkflowConfig dump; identical configs compile to identical agents."""
+    canonical = json.dumps(json_config, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CompiledWorkflow:
+    """
+    Built agents of a workflow, ready to be bound to a run.
+
+    The agents carry their prompts and wrapped tools but no per-user state: the user id and the
+    time context are read from the run context when the agents run, and MCP sessions are leased
+    per run and attached with Agent.clone().
+    """
+
+    def __init__(
+        self,
+        config_hash: str,
+        agents: Dict[str, Any],
+        overview: str,
+        mcp_configs: Dict[str, List[Dict[str, Any]]],
+        build_timings: Dict[str, float],
+    ):
+        self.config_hash = config_hash
+        self.agents = agents
+        self.overview = overview
+        self.mcp_configs = mcp_configs
+        self.build_timings = build_timings
+        self.size_bytes = self._estimate_size()
+
+    def _estimate_size(self) -> int:
+        size = len(self.overview)
+        for agent in self.agents.values():
+            instructions = getattr(agent, "instructions", "")
+            size += len(getattr(instructions, "static_prompt", instructions) or "")
+            for tool in getattr(agent, "tools", []) or []:
+                size += len(getattr(tool, "description", "") or "")
+                size += len(json.dumps(getattr(tool, "params_json_schema", {}) or {}, default=str))
+        size += len(json.dumps(self.mcp_configs, default=str))
+        # Agent and tool objects themselves
+        size += 2048 * (1 + len(self.agents))
+        return size
+
+
+class CompiledWorkflowCache:
+    """
+    LRU cache of compiled workflows bounded by entry count and an approximate memory budget.
+
+    Compiled agents hold tools bound to the Arcade client of the event loop that built them, so
+    entries are kept per event loop.
+    """
+
+    def __init__(self, max_entries: int = WORKFLOW_CACHE_SIZE, max_megabytes: float = WORKFLOW_CACHE_MB):
+        self.max_entries = max_entries
+        self.max_bytes = int(max_megabytes * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, CompiledWorkflow]" = OrderedDict()
+        self._bytes = 0
+        self._build_locks: "weakref.WeakValueDictionary[CacheKey, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(config_hash: str) -> CacheKey:
+        return id(asyncio.get_running_loop()), config_hash
+
+    def get(self, config_hash: str, count: bool = True) -> Optional[CompiledWorkflow]:
+        """Cached workflow of `config_hash`; `count` False for repeat lookups that must not skew the hit ratio."""
+        key = self.key(config_hash)
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is None:
+                if count:
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if count:
+                self.hits += 1
+            return compiled
+
+    def put(self, compiled: CompiledWorkflow) -> None:
+        key = self.key(compiled.config_hash)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size_bytes
+            if compiled.size_bytes > self.max_bytes:
+                logger.info(f"[WORKFLOW_CACHE] Workflow {compiled.config_hash[:12]} exceeds the cache budget, not cached")
+                return
+
+            self._entries[key] = compiled
+            self._bytes += compiled.size_bytes
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size_bytes
+                self.evictions += 1
+
+    def build_lock(self, config_hash: str) -> asyncio.Lock:
+        """Lock serialising compiles of the same workflow on the running loop."""
+        key = self.key(config_hash)
+        with self._lock:
+            lock = self._build_locks.get(key)
+            if lock is None:
+                lock = asyncio.Lock()
+                self._build_locks[key] = lock
+            return lock
+
+    def clear(self) -> int:
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+workflow_cache = CompiledWorkflowCache()
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from starlette.requests import ClientDisconnect
+
+from factory.batch import WorkflowBatch
+from factory.run_store import MemoryRunStore, RunRecord
+from factory.scheduler import QueueFullError
+from tests.test_worker import WORKFLOW_CONFIG
+
+
+class FakeRuns:
+    """submit() for a batch: records a pending run, or refuses it while `full` is set."""
+
+    def __init__(self, run_store: MemoryRunStore):
+        self.run_store = run_store
+        self.submitted = []
+        self.cancelled = []
+        self.full = False
+
+    def submit(self, item) -> None:
+        if self.full:
+            raise QueueFullError("full")
+        self.run_store.put(RunRecord(trace_id=item.trace_id, user_id="alice"))
+        self.submitted.append(item.trace_id)
+
+    def finish(self, status: str = "completed") -> None:
+        for trace_id in self.submitted:
+            record = self.run_store.get(trace_id)
+            if not record.finished:
+                self.run_store.update(trace_id, status=status, result="done")
+
+    def cancel(self, trace_id: str) -> str:
+        self.cancelled.append(trace_id)
+        self.run_store.update(trace_id, status="cancelled")
+        return "cancelled"
+
+
+class WorkflowBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.run_store = MemoryRunStore()
+        self.runs = FakeRuns(self.run_store)
+
+    def batch(self, **kwargs) -> WorkflowBatch:
+        return WorkflowBatch("alice", self.runs.submit, self.run_store, poll_interval=0.01, **kwargs)
+
+    def test_dispatches_at_most_max_concurrency_runs(self):
+        async def main():
+            batch = self.batch(max_concurrency=2)
+            for i in range(5):
+                batch.add(f"task {i}")
+            batch.close()
+            task = asyncio.create_task(batch.run())
+            while batch.finished_at is None:
+                await asyncio.sleep(0.02)
+                self.assertLessEqual(len(self.runs.submitted) - batch.counts().get("completed", 0), 2)
+                self.runs.finish()
+            await task
+            return batch
+
+        batch = asyncio.run(main())
+        self.assertEqual(batch.status, "completed")
+        self.assertEqual(batch.counts(), {"completed": 5})
+        self.assertEqual(len(self.runs.submitted), 5)
+        self.assertEqual(batch.progress(include_results=True)["items"][0]["result"], "done")
+
+    def test_waits_for_queue_capacity(self):
+        async def main():
+            batch = self.batch()
+            batch.add("task")
+            batch.close()
+            self.runs.full = True
+            task = asyncio.create_task(batch.run())
+            await asyncio.sleep(0.05)
+            self.assertEqual(batch.counts(), {"waiting": 1})
+            self.runs.full = False
+            while not self.runs.submitted:
+                await asyncio.sleep(0.01)
+            self.runs.finish()
+            await task
+            return batch
+
+        self.assertEqual(asyncio.run(main()).counts(), {"completed": 1})
+
+    def test_cancel_stops_dispatching_and_cancels_runs_in_flight(self):
+        async def main():
+            batch = self.batch(max_concurrency=1)
+            batch.add("first")
+            batch.add("second")
+            task = asyncio.create_task(batch.run())
+            while not self.runs.submitted:
+                await asyncio.sleep(0.01)
+            batch.cancel(self.runs.cancel)
+            await asyncio.wait_for(task, timeout=1)
+            return batch
+
+        batch = asyncio.run(main())
+        self.assertEqual(batch.status, "cancelled")
+        self.assertEqual(self.runs.cancelled, self.runs.submitted)
+        self.assertEqual(batch.counts(), {"cancelled": 2})
+        with self.assertRaises(ValueError):
+            batch.add("late")
+
+
+class JsonlUploadTest(unittest.TestCase):
+    def test_client_disconnect_cancels_the_started_batch(self):
+        import app
+
+        run_store = MemoryRunStore()
+        runs = FakeRuns(run_store)
+        started = []
+        start_batch = app.start_batch
+
+        def capture(options):
+            batch = start_batch(options)
+            batch.poll_interval = 0.01
+            started.append(batch)
+            return batch
+
+        class DisconnectingRequest:
+            async def stream(self):
+                yield json.dumps({"workflow_config": WORKFLOW_CONFIG, "user_id": "alice"}).encode() + b"\n"
+                yield b'"first task"\n'
+                # Let the first item start running before the upload breaks off
+                await asyncio.sleep(0.05)
+                raise ClientDisconnect()
+
+        async def main():
+            with self.assertRaises(ClientDisconnect):
+                await app.run_workflow_batch_jsonl(DisconnectingRequest(), token="token")
+            await asyncio.wait_for(app.batches._tasks[started[0].batch_id], timeout=1)
+
+        with mock.patch.object(app, "run_store", run_store), \
+                mock.patch.object(app, "start_batch", capture), \
+                mock.patch.object(app, "submit_run", lambda request, trace_id: runs.submit(mock.Mock(trace_id=trace_id))), \
+                mock.patch.object(app, "cancel_run", runs.cancel):
+            asyncio.run(main())
+
+        batch = started[0]
+        self.assertEqual(batch.status, "cancelled")
+        self.assertIsNotNone(batch.finished_at)
+        self.assertEqual(len(runs.submitted), 1)
+        self.assertEqual(runs.cancelled, runs.submitted)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from fastapi import HTTPException
+
+from factory.graph import WorkflowEdge, WorkflowGraph, run_graph
+from factory.run_store import MemoryRunStore
+from tests.test_worker import WORKFLOW_CONFIG
+
+
+def edges(*pairs):
+    return [WorkflowEdge(source=source, target=target) for source, target in pairs]
+
+
+class FakeRunContext:
+    """Runs a node by calling `outputs[node](task)`; records the task each node was given."""
+
+    def __init__(self, outputs, node_results=None):
+        self.outputs = outputs
+        self.node_results = dict(node_results or {})
+        self.events = None
+        self.tasks = {}
+
+    async def run_agent(self, agent, task, run_config=None):
+        self.tasks[agent] = task
+        await asyncio.sleep(0)
+        return SimpleNamespace(final_output=self.outputs[agent](task))
+
+
+def fail(task):
+    raise RuntimeError("boom")
+
+
+class WorkflowGraphTest(unittest.TestCase):
+    def test_topological_order(self):
+        graph = WorkflowGraph(["d", "c", "b", "a"], edges(("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")))
+        order = graph.order
+        for source, target in (("a", "b"), ("a", "c"), ("b", "d"), ("c", "d")):
+            self.assertLess(order.index(source), order.index(target))
+        self.assertEqual(graph.sinks, ["d"])
+        self.assertEqual(graph.descendants("b"), ["d"])
+
+    def test_cycle_is_rejected(self):
+        with self.assertRaisesRegex(ValueError, "cycle"):
+            WorkflowGraph(["a", "b", "c"], edges(("a", "b"), ("b", "c"), ("c", "b")))
+
+    def test_unknown_node_is_rejected(self):
+        with self.assertRaisesRegex(ValueError, "unknown agent 'x'"):
+            WorkflowGraph(["a"], edges(("a", "x")))
+
+
+class RunGraphTest(unittest.TestCase):
+    def test_nodes_receive_the_outputs_of_their_inputs(self):
+        graph = WorkflowGraph(["a", "b", "c"], edges(("a", "c"), ("b", "c")))
+        context = FakeRunContext({"a": lambda task: "A", "b": lambda task: "B", "c": lambda task: "C"})
+        output = asyncio.run(run_graph(graph, {node: node for node in graph.nodes}, "task", context))
+        self.assertEqual(output, "C")
+        self.assertEqual(context.tasks["a"], "task")
+        self.assertIn("### a\nA", context.tasks["c"])
+        self.assertIn("### b\nB", context.tasks["c"])
+
+    def test_descendants_of_a_failed_node_are_skipped(self):
+        graph = WorkflowGraph(["a", "b", "c", "d"], edges(("a", "b"), ("b", "c"), ("a", "d")))
+        context = FakeRunContext({"a": lambda task: "A", "b": fail, "c": lambda task: "C", "d": lambda task: "D"})
+        with self.assertRaisesRegex(RuntimeError, "Graph nodes failed: b"):
+            asyncio.run(run_graph(graph, {node: node for node in graph.nodes}, "task", context))
+
+        results = context.node_results
+        self.assertEqual({node: result["status"] for node, result in results.items()},
+                         {"a": "completed", "b": "failed", "c": "skipped", "d": "completed"})
+        self.assertNotIn("c", context.tasks)
+
+    def test_resume_only_runs_nodes_that_did_not_complete(self):
+        graph = WorkflowGraph(["a", "b", "c"], edges(("a", "b"), ("b", "c")))
+        previous = {
+            "a": {"status": "completed", "output": "A", "attempts": 1},
+            "b": {"status": "failed", "error": "boom", "attempts": 1},
+            "c": {"status": "skipped", "error": "upstream node 'b' failed"},
+        }
+        context = FakeRunContext({"a": fail, "b": lambda task: "B", "c": lambda task: "C"}, previous)
+        output = asyncio.run(run_graph(graph, {node: node for node in graph.nodes}, "task", context))
+        self.assertEqual(output, "C")
+        self.assertNotIn("a", context.tasks)
+        self.assertEqual(context.node_results["b"]["attempts"], 2)
+
+
+class ResumeRequestTest(unittest.TestCase):
+    def setUp(self):
+        import app
+        from factory.runner import WorkflowRunner
+
+        self.app = app
+        self.run_store = MemoryRunStore()
+        patcher = mock.patch.object(app, "run_store", self.run_store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        # A finished run with one completed node
+        self.request = app.RunWorkflowRequest(workflow_config=WORKFLOW_CONFIG, user_id="alice", user_task="task")
+        WorkflowRunner(
+            workflow_config=self.request.workflow_config, user_id="alice", user_task="task",
+            trace_id="previous", run_store=self.run_store,
+        )
+        self.run_store.update("previous", status="failed", nodes={"agent": {"status": "completed", "output": "A"}})
+
+    def resubmit(self, **changes):
+        return self.app.resumable_nodes(self.request.model_copy(update={"resume_from": "previous", **changes}))
+
+    def test_same_config_and_task_reuse_the_nodes(self):
+        self.assertEqual(self.resubmit(), {"agent": {"status": "completed", "output": "A"}})
+
+    def test_different_config_is_refused(self):
+        config = self.request.workflow_config.model_copy(update={"objective": "something else"})
+        with self.assertRaises(HTTPException) as raised:
+            self.resubmit(workflow_config=config)
+        self.assertEqual(raised.exception.status_code, 409)
+
+    def test_different_task_is_refused(self):
+        with self.assertRaises(HTTPException) as raised:
+            self.resubmit(user_task="another task")
+        self.assertEqual(raised.exception.status_code, 409)
+
+    def test_other_users_run_is_not_found(self):
+        with self.assertRaises(HTTPException) as raised:
+            self.resubmit(user_id="bob")
+        self.assertEqual(raised.exception.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+
+from agents import Agent, RunConfig  # type: ignore
+from agents.items import ModelResponse  # type: ignore
+from agents.models.interface import Model, ModelProvider  # type: ignore
+from agents.usage import Usage  # type: ignore
+from openai.types.responses import ResponseOutputMessage, ResponseOutputText
+from openai.types.responses.response_usage import InputTokensDetails, OutputTokensDetails
+
+from factory.context import RunContext
+from factory.group_chat import GroupChat
+
+
+class BudgetModel(Model):
+    """Answers "ok" and reports a fixed token usage per call; records the output cap of each call."""
+
+    def __init__(self, tokens_per_call: int):
+        self.tokens_per_call = tokens_per_call
+        self.caps = []
+
+    async def get_response(self, system_instructions, input, model_settings, *args, **kwargs):
+        self.caps.append(model_settings.max_tokens)
+        message = ResponseOutputMessage(
+            id="msg", role="assistant", status="completed", type="message",
+            content=[ResponseOutputText(text="ok", type="output_text", annotations=[])],
+        )
+        usage = Usage(
+            requests=1,
+            input_tokens=self.tokens_per_call,
+            output_tokens=0,
+            total_tokens=self.tokens_per_call,
+            input_tokens_details=InputTokensDetails(cached_tokens=0, cache_write_tokens=0),
+            output_tokens_details=OutputTokensDetails(reasoning_tokens=0),
+        )
+        return ModelResponse(output=[message], usage=usage, response_id=None)
+
+    def stream_response(self, *args, **kwargs):
+        raise NotImplementedError
+
+
+class BudgetProvider(ModelProvider):
+    def __init__(self, model: Model):
+        self.model = model
+
+    def get_model(self, model_name):
+        return self.model
+
+
+class GroupChatBudgetTest(unittest.TestCase):
+    def chat(self, model: BudgetModel, **kwargs) -> GroupChat:
+        agents = {name: Agent(name=name, instructions="You help.", model="gpt-4o") for name in ("alice", "bob")}
+        return GroupChat(
+            agents,
+            RunContext("user"),
+            objective="test",
+            model_name="gpt-4o",
+            run_config=RunConfig(model_provider=BudgetProvider(model), tracing_disabled=True),
+            **kwargs,
+        )
+
+    def test_speaker_output_is_capped_to_the_budget_left(self):
+        model = BudgetModel(tokens_per_call=400)
+        chat = self.chat(model, max_turns=5, max_tokens=1000)
+        asyncio.run(chat.run("task"))
+
+        # Nothing is left for a fourth turn
+        self.assertEqual(len(model.caps), 3)
+        for spent, cap in zip((0, 400, 800), model.caps):
+            self.assertTrue(0 < cap < 1000 - spent)
+
+    def test_chat_stops_before_a_turn_whose_prompt_does_not_fit(self):
+        model = BudgetModel(tokens_per_call=10)
+        chat = self.chat(model, max_turns=5, max_tokens=40)
+        with self.assertRaises(RuntimeError):
+            asyncio.run(chat.run("task " * 200))
+        self.assertEqual(model.caps, [])
+
+    def test_no_budget_sets_no_cap(self):
+        model = BudgetModel(tokens_per_call=300)
+        asyncio.run(self.chat(model, max_turns=2).run("task"))
+        self.assertEqual(model.caps, [None, None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import tempfile
+import time
+import unittest
+
+from factory.job_queue import SQLiteJobQueue
+from factory.scheduler import QueueFullError
+
+
+class SQLiteJobQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.queue = SQLiteJobQueue(path=os.path.join(self.tmp.name, "jobs.db"), max_size=10, max_per_user=2, lease_seconds=60)
+
+    def tearDown(self):
+        self.queue.close()
+        self.tmp.cleanup()
+
+    def test_claim_ack(self):
+        self.queue.put("run-1", "alice", {"user_task": "a"})
+        job = self.queue.claim("worker-1")
+        self.assertEqual(job["trace_id"], "run-1")
+        self.assertEqual(job["payload"], {"user_task": "a"})
+        self.assertIsNone(self.queue.claim("worker-2"))
+        self.assertEqual(self.queue.stats()["claimed_per_worker"], {"worker-1": 1})
+
+        self.queue.ack("run-1")
+        self.assertEqual(self.queue.stats()["claimed"], 0)
+        self.assertEqual(self.queue.stats()["queue_depth"], 0)
+
+    def test_admission_limits(self):
+        self.queue.put("run-1", "alice", {})
+        self.queue.put("run-2", "alice", {})
+        with self.assertRaises(QueueFullError):
+            self.queue.put("run-3", "alice", {})
+        self.queue.put("run-4", "bob", {})
+
+    def test_claim_prefers_users_with_fewer_claims(self):
+        self.queue.put("alice-1", "alice", {})
+        self.queue.put("alice-2", "alice", {})
+        self.queue.put("bob-1", "bob", {})
+        self.assertEqual(self.queue.claim("w")["trace_id"], "alice-1")
+        self.assertEqual(self.queue.claim("w")["trace_id"], "bob-1")
+        self.assertEqual(self.queue.claim("w")["trace_id"], "alice-2")
+
+    def test_release_requeues(self):
+        self.queue.put("run-1", "alice", {})
+        self.queue.claim("worker-1")
+        self.queue.release("run-1")
+        self.assertEqual(self.queue.claim("worker-2")["trace_id"], "run-1")
+
+    def test_release_all_requeues_the_jobs_of_one_worker(self):
+        self.queue.put("run-1", "alice", {})
+        self.queue.put("run-2", "bob", {})
+        self.queue.claim("worker-1")
+        self.queue.claim("worker-2")
+        self.assertEqual(self.queue.release_all("worker-1"), 1)
+        self.assertEqual(self.queue.stats()["claimed_per_worker"], {"worker-2": 1})
+        self.assertEqual(self.queue.stats()["queue_depth"], 1)
+
+    def test_expired_lease_is_reclaimed_and_heartbeat_renews(self):
+        self.queue.lease_seconds = 0.2
+        self.queue.put("run-1", "alice", {})
+        self.queue.put("run-2", "alice", {})
+        self.queue.claim("worker-1")
+        self.queue.claim("worker-2")
+
+        time.sleep(0.15)
+        self.queue.heartbeat("worker-1")
+        time.sleep(0.1)
+        # worker-2 stopped heartbeating, its job is handed out again; worker-1 keeps its own
+        job = self.queue.claim("worker-3")
+        self.assertEqual(job["trace_id"], "run-2")
+        self.assertIsNone(self.queue.claim("worker-3"))
+        self.assertEqual(self.queue.stats()["claimed_per_worker"], {"worker-1": 1, "worker-3": 1})
+
+    def test_cancel_queued_job_removes_it(self):
+        self.queue.put("run-1", "alice", {})
+        self.assertEqual(self.queue.cancel("run-1"), "cancelled")
+        self.assertIsNone(self.queue.claim("worker-1"))
+        self.assertIsNone(self.queue.cancel("run-1"))
+
+    def test_cancel_claimed_job_is_requested_from_its_worker(self):
+        self.queue.put("run-1", "alice", {})
+        self.queue.claim("worker-1")
+        self.assertEqual(self.queue.cancel("run-1"), "requested")
+        self.assertEqual(self.queue.cancellations("worker-1"), ["run-1"])
+        self.assertEqual(self.queue.cancellations("worker-2"), [])
+
+        self.queue.ack("run-1")
+        self.assertEqual(self.queue.cancellations("worker-1"), [])
+
+    def test_cancel_requested_job_is_not_handed_out_to_run_after_its_lease_expires(self):
+        self.queue.lease_seconds = 0.05
+        self.queue.put("run-1", "alice", {})
+        self.queue.put("run-2", "bob", {})
+        self.assertFalse(self.queue.claim("worker-1")["cancel_requested"])
+        self.queue.cancel("run-1")
+
+        time.sleep(0.1)
+        job = self.queue.claim("worker-2")
+        self.assertEqual(job["trace_id"], "run-1")
+        self.assertTrue(job["cancel_requested"])
+
+
+if __name__ == "__main__":
+    unittest.main()
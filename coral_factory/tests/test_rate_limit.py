@@ -0,0 +1,131 @@
+import asyncio
+import os
+import time
+import unittest
+from unittest import mock
+
+import httpx
+
+from factory.clients import OpenAIClientPool, openai_clients
+from factory.context import RunContext
+from factory.rate_limit import CircuitBreaker, CircuitOpenError, RateLimiter
+
+
+def server_error():
+    request = httpx.Request("POST", "https://upstream.test")
+    return httpx.HTTPStatusError("boom", request=request, response=httpx.Response(503, request=request))
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_open_half_open_closed(self):
+        breaker = CircuitBreaker(failures=2, reset_seconds=0.05)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        # One trial call at a time once the reset delay has passed
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, "half_open")
+        self.assertFalse(breaker.allow())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.allow())
+
+    def test_failed_trial_reopens(self):
+        breaker = CircuitBreaker(failures=1, reset_seconds=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+    def test_abandoned_trial_lets_another_through(self):
+        breaker = CircuitBreaker(failures=1, reset_seconds=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.abandon()
+        self.assertTrue(breaker.allow())
+
+
+class RateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.limiter = RateLimiter(limits={}, attempts=4, base_delay=0.0, max_delay=0.0)
+
+    def test_retries_transient_errors(self):
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            if len(calls) < 3:
+                raise server_error()
+            return "ok"
+
+        self.assertEqual(asyncio.run(self.limiter.call("openai", "model", fn)), "ok")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(self.limiter.upstream("openai", "model").breaker.state, "closed")
+
+    def test_retries_stop_once_the_circuit_opens(self):
+        self.limiter.upstream("openai", "model").breaker.failures = 2
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            raise server_error()
+
+        with self.assertRaises(CircuitOpenError) as raised:
+            asyncio.run(self.limiter.call("openai", "model", fn))
+        self.assertEqual(len(calls), 2)
+        self.assertIsInstance(raised.exception.__cause__, httpx.HTTPStatusError)
+
+        # Later calls are refused without reaching the upstream
+        with self.assertRaises(CircuitOpenError):
+            asyncio.run(self.limiter.call("openai", "model", fn))
+        self.assertEqual(len(calls), 2)
+
+    def test_run_models_leave_retries_to_the_limiter(self):
+        async def main():
+            client = openai_clients.async_client()
+            if client is None:
+                self.skipTest("OPENAI_API_KEY is not set")
+            model = RunContext("alice").run_config().model_provider.get_model("gpt-4o")
+            self.assertIs(model.model._client, client)
+            await openai_clients.aclose_current()
+            return client
+
+        self.assertEqual(asyncio.run(main()).max_retries, 0)
+
+
+class OpenAIClientPoolTest(unittest.TestCase):
+    def test_one_client_per_event_loop(self):
+        pool = OpenAIClientPool()
+
+        async def client():
+            first = pool.async_client()
+            self.assertIs(pool.async_client(), first)
+            return first
+
+        with mock.patch.dict(os.environ, {"OPENAI_API_KEY": "test"}):
+            first = asyncio.run(client())
+            second = asyncio.run(client())
+        self.assertIsNot(first, second)
+        self.assertEqual(pool.client_count(), 2)
+
+    def test_missing_api_key_is_reported_once(self):
+        pool = OpenAIClientPool()
+
+        async def clients():
+            return [pool.async_client(), pool.async_client()]
+
+        with mock.patch.dict(os.environ, {}, clear=True), self.assertLogs("factory.clients", "WARNING") as logs:
+            self.assertEqual(asyncio.run(clients()), [None, None])
+        self.assertEqual(len(logs.records), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from factory.scheduler import FairJobQueue, QueueFullError, WorkflowScheduler
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class Job:
+    """Scheduler job that runs until its gate opens."""
+
+    def __init__(self, user_id: str, trace_id: str, gate: threading.Event, ran: list):
+        self.user_id = user_id
+        self.trace_id = trace_id
+        self.gate = gate
+        self.ran = ran
+        self.status = "pending"
+        self.cancel_reason = None
+
+    async def run(self):
+        self.ran.append(self.trace_id)
+        self.status = "running"
+        while not self.gate.is_set():
+            await asyncio.sleep(0.01)
+        self.status = "completed"
+
+    def cancel(self, reason: str) -> bool:
+        self.cancel_reason = reason
+        self.status = "cancelled"
+        return True
+
+
+class FairJobQueueTest(unittest.TestCase):
+    def test_round_robin_between_tenants(self):
+        queue = FairJobQueue(max_size=10, max_per_tenant=10)
+        for job in ("a1", "a2", "a3"):
+            queue.put_nowait("alice", job)
+        queue.put_nowait("bob", "b1")
+
+        async def drain():
+            return [await queue.get() for _ in range(4)]
+
+        self.assertEqual(asyncio.run(drain()), ["a1", "b1", "a2", "a3"])
+
+    def test_admission_limits(self):
+        queue = FairJobQueue(max_size=3, max_per_tenant=2)
+        queue.put_nowait("alice", 1)
+        queue.put_nowait("alice", 2)
+        with self.assertRaises(QueueFullError):
+            queue.put_nowait("alice", 3)
+        queue.put_nowait("bob", 4)
+        with self.assertRaises(QueueFullError):
+            queue.put_nowait("carol", 5)
+
+    def test_remove(self):
+        queue = FairJobQueue(max_size=10, max_per_tenant=10)
+        queue.put_nowait("alice", 1)
+        self.assertTrue(queue.remove("alice", 1))
+        self.assertFalse(queue.remove("alice", 1))
+        self.assertEqual(queue.qsize(), 0)
+        self.assertEqual(queue.tenant_depths(), {})
+
+
+class WorkflowSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = WorkflowScheduler(event_loops=2, workers_per_loop=1, max_queue_size=10, max_queued_per_user=10)
+        self.scheduler.start()
+        self.addCleanup(self.scheduler.stop)
+        self.gate = threading.Event()
+        self.ran = []
+
+    def job(self, user_id: str, trace_id: str) -> Job:
+        return Job(user_id, trace_id, self.gate, self.ran)
+
+    def test_runs_at_most_capacity_jobs_and_serves_tenants_fairly(self):
+        jobs = [self.job("alice", f"alice-{i}") for i in range(3)] + [self.job("bob", "bob-0")]
+        for job in jobs:
+            self.scheduler.submit(job)
+
+        self.assertTrue(wait_for(lambda: self.scheduler.metrics.running == 2))
+        time.sleep(0.05)
+        self.assertEqual(sorted(self.ran), ["alice-0", "bob-0"])
+        self.assertEqual(self.scheduler.in_flight, 4)
+
+        self.gate.set()
+        self.assertTrue(wait_for(lambda: self.scheduler.stats()["completed"] == 4))
+        self.assertEqual(self.scheduler.in_flight, 0)
+
+    def test_cancel_queued_job(self):
+        running = [self.job("alice", f"running-{i}") for i in range(2)]
+        queued = self.job("alice", "queued")
+        for job in running + [queued]:
+            self.scheduler.submit(job)
+        self.assertTrue(wait_for(lambda: self.scheduler.metrics.running == 2))
+
+        self.assertTrue(self.scheduler.cancel("queued", "stop"))
+        self.assertEqual(queued.cancel_reason, "stop")
+        self.assertEqual(self.scheduler.queue.qsize(), 0)
+        self.assertFalse(self.scheduler.cancel("queued"))
+
+        self.gate.set()
+        self.assertTrue(wait_for(lambda: self.scheduler.stats()["completed"] == 2))
+        self.assertNotIn("queued", self.ran)
+        self.assertEqual(self.scheduler.stats()["cancelled"], 1)
+
+    def test_cancel_running_job_is_delegated_to_the_job(self):
+        job = self.job("alice", "running")
+        self.scheduler.submit(job)
+        self.assertTrue(wait_for(lambda: job.status == "running"))
+        self.assertTrue(self.scheduler.cancel("running"))
+        self.assertEqual(job.cancel_reason, "Workflow cancelled")
+        self.assertFalse(self.scheduler.cancel("unknown"))
+
+    def test_stop_cancels_running_jobs_and_refuses_new_ones(self):
+        job = self.job("alice", "running")
+        self.scheduler.submit(job)
+        self.assertTrue(wait_for(lambda: job.status == "running"))
+        self.scheduler.stop()
+        self.assertEqual(job.status, "running")
+        self.assertEqual(self.scheduler.metrics.running, 0)
+        with self.assertRaises(RuntimeError):
+            self.scheduler.submit(self.job("alice", "late"))
+
+
+if __name__ == "__main__":
+    unittest.main()
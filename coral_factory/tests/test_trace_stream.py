@@ -0,0 +1,132 @@
+import asyncio
+import unittest
+
+from agents import Agent, RunConfig, Runner  # type: ignore
+from agents.items import ModelResponse  # type: ignore
+from agents.models.interface import Model  # type: ignore
+from agents.usage import Usage  # type: ignore
+from openai.types.responses import ResponseOutputMessage, ResponseOutputText
+from agents.tracing import set_trace_processors, set_tracing_disabled  # type: ignore
+
+from factory.trace_sinks import TraceSink, WriteOp
+from factory.trace_stream import BatchTraceExporter, OpenAIAgentsTracingProcessor
+
+
+class RecordingExporter:
+    def __init__(self):
+        self.ops = []
+
+    def enqueue(self, op):
+        self.ops.append(op)
+
+
+class SlowModel(Model):
+    async def get_response(self, *args, **kwargs):
+        await asyncio.sleep(30)
+
+    async def stream_response(self, *args, **kwargs):
+        await asyncio.sleep(30)
+        yield
+
+
+class AnsweringModel(Model):
+    async def get_response(self, *args, **kwargs):
+        message = ResponseOutputMessage(
+            id="msg", role="assistant", status="completed", type="message",
+            content=[ResponseOutputText(text="done", type="output_text", annotations=[])],
+        )
+        return ModelResponse(output=[message], usage=Usage(), response_id=None)
+
+    def stream_response(self, *args, **kwargs):
+        raise NotImplementedError
+
+
+class TraceStatusTest(unittest.TestCase):
+    def setUp(self):
+        self.exporter = RecordingExporter()
+        set_trace_processors([OpenAIAgentsTracingProcessor(exporter=self.exporter, user_id="alice")])
+        self.addCleanup(set_trace_processors, [])
+        # Also when OPENAI_AGENTS_DISABLE_TRACING is set
+        set_tracing_disabled(False)
+        self.addCleanup(set_tracing_disabled, True)
+        self.agent = Agent(name="agent", instructions="test", model=SlowModel())
+
+    def trace_statuses(self):
+        return [op.data["status"] for op in self.exporter.ops if op.collection[-1] == "agent_traces" and op.kind == "merge"]
+
+    def test_finished_run_ends_its_trace_completed(self):
+        agent = Agent(name="agent", instructions="test", model=AnsweringModel())
+        asyncio.run(Runner.run(agent, "task", run_config=RunConfig(tracing_disabled=False)))
+        self.assertEqual(self.trace_statuses(), ["completed"])
+
+    def test_deadline_expired_run_ends_its_trace_cancelled(self):
+        async def main():
+            with self.assertRaises(TimeoutError):
+                async with asyncio.timeout(0.05):
+                    await Runner.run(self.agent, "task", run_config=RunConfig(tracing_disabled=False))
+
+        asyncio.run(main())
+        self.assertEqual(self.trace_statuses(), ["cancelled"])
+
+    def test_cancelled_run_ends_its_trace_cancelled(self):
+        async def main():
+            task = asyncio.create_task(Runner.run(self.agent, "task", run_config=RunConfig(tracing_disabled=False)))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(main())
+        self.assertEqual(self.trace_statuses(), ["cancelled"])
+
+    def test_cancelled_streamed_run_ends_its_trace_cancelled(self):
+        async def main():
+            result = Runner.run_streamed(self.agent, "task", run_config=RunConfig(tracing_disabled=False))
+            await asyncio.sleep(0.05)
+            result.cancel()
+            async for _ in result.stream_events():
+                pass
+
+        asyncio.run(main())
+        self.assertEqual(self.trace_statuses(), ["cancelled"])
+
+
+class FlakySink(TraceSink):
+    name = "flaky"
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.attempts = 0
+        self.written = []
+
+    def write(self, ops):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("sink unavailable")
+        self.written.extend(ops)
+
+
+class BatchTraceExporterTest(unittest.TestCase):
+    def export(self, sink: FlakySink) -> BatchTraceExporter:
+        exporter = BatchTraceExporter(sink, flush_interval=0.5, retries=2, retry_delay=0.01)
+        exporter.start()
+        for document_id in ("a", "b"):
+            exporter.enqueue(WriteOp(kind="set", collection=("traces",), document_id=document_id, data={}))
+        exporter.shutdown(timeout=5)
+        return exporter
+
+    def test_failed_batch_is_retried(self):
+        sink = FlakySink(failures=2)
+        stats = self.export(sink).stats()
+        self.assertEqual(sorted(op.document_id for op in sink.written), ["a", "b"])
+        self.assertEqual((stats["flushed"], stats["failed"], stats["retried"]), (2, 0, 2))
+
+    def test_batch_is_given_up_after_its_retries(self):
+        sink = FlakySink(failures=10)
+        stats = self.export(sink).stats()
+        self.assertEqual(sink.attempts, 3)
+        self.assertEqual((stats["flushed"], stats["failed"], stats["retried"]), (0, 2, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
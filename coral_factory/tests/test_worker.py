@@ -0,0 +1,168 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from factory.builder import WorkflowConfig
+from factory.job_queue import SQLiteJobQueue
+from factory.run_store import RunRecord, SQLiteRunStore
+from factory.scheduler import WorkflowScheduler
+from factory.worker import QueuedWorkflowRunner, Worker
+
+WORKFLOW_CONFIG = {
+    "objective": "test",
+    "relations_type": "chain",
+    "model_name": "gpt-4o",
+    "api_key": "test",
+    "agents": [{
+        "name": "agent", "persona": "tester", "toolkits": [], "output": "text", "guidelines": "", "mcp_servers": [],
+    }],
+}
+
+
+async def slow_workflow(*args, **kwargs):
+    await asyncio.sleep(30)
+    return "done"
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+class WorkerCancellationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.job_queue = SQLiteJobQueue(path=os.path.join(self.tmp.name, "jobs.db"))
+        self.run_store = SQLiteRunStore(path=os.path.join(self.tmp.name, "runs.db"))
+        patcher = mock.patch("factory.runner.start_agents", slow_workflow)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.job_queue.close()
+        self.run_store.close()
+        self.tmp.cleanup()
+
+    def enqueue(self, trace_id):
+        self.run_store.put(RunRecord(trace_id=trace_id, user_id="alice"))
+        self.job_queue.put(trace_id, "alice", {"workflow_config": WORKFLOW_CONFIG, "user_task": "task"})
+
+    def runner(self, job):
+        return QueuedWorkflowRunner(
+            job_queue=self.job_queue,
+            workflow_config=WorkflowConfig(**job["payload"]["workflow_config"]),
+            user_id=job["user_id"],
+            user_task=job["payload"]["user_task"],
+            trace_id=job["trace_id"],
+            run_store=self.run_store,
+        )
+
+    def test_cancel_before_a_scheduler_worker_picks_the_job_up_acks_it(self):
+        scheduler = WorkflowScheduler(event_loops=1, workers_per_loop=1)
+        scheduler.start()
+        try:
+            self.enqueue("running")
+            self.enqueue("queued")
+            running = self.runner(self.job_queue.claim("worker-1"))
+            queued = self.runner(self.job_queue.claim("worker-1"))
+            scheduler.submit(running)
+            scheduler.submit(queued)
+            self.assertTrue(wait_for(lambda: running.status == "running"))
+
+            self.assertEqual(self.job_queue.cancel("queued"), "requested")
+            self.assertTrue(scheduler.cancel("queued"))
+            self.assertEqual(self.run_store.get("queued").status, "cancelled")
+            self.assertEqual(self.job_queue.cancellations("worker-1"), [])
+            self.assertEqual(self.job_queue.stats()["claimed"], 1)
+        finally:
+            scheduler.stop()
+
+    def test_cancel_running_job_through_worker(self):
+        worker = Worker(
+            self.job_queue,
+            self.run_store,
+            scheduler=WorkflowScheduler(event_loops=1, workers_per_loop=2),
+            worker_id="worker-1",
+            poll_interval=0.02,
+        )
+        thread = threading.Thread(target=worker.run)
+        self.enqueue("run-1")
+        thread.start()
+        try:
+            self.assertTrue(wait_for(lambda: self.run_store.get("run-1").status == "running"))
+            self.assertEqual(self.job_queue.cancel("run-1"), "requested")
+            self.assertTrue(wait_for(lambda: self.run_store.get("run-1").status == "cancelled"))
+            self.assertTrue(wait_for(lambda: self.job_queue.stats()["claimed"] == 0))
+
+            # The worker slot is free again
+            self.enqueue("run-2")
+            self.assertTrue(wait_for(lambda: self.run_store.get("run-2").status == "running"))
+        finally:
+            worker.stop()
+            thread.join(timeout=15)
+
+    def test_job_cancelled_under_a_dead_worker_is_not_run(self):
+        self.job_queue.lease_seconds = 0.05
+        self.enqueue("run-1")
+        self.job_queue.claim("dead-worker")
+        self.run_store.update("run-1", status="running")
+        self.assertEqual(self.job_queue.cancel("run-1"), "requested")
+        time.sleep(0.1)
+
+        worker = Worker(
+            self.job_queue,
+            self.run_store,
+            scheduler=WorkflowScheduler(event_loops=1, workers_per_loop=1),
+            worker_id="worker-1",
+            poll_interval=0.02,
+        )
+        thread = threading.Thread(target=worker.run)
+        thread.start()
+        try:
+            self.assertTrue(wait_for(lambda: self.run_store.get("run-1").status == "cancelled"))
+            self.assertIsNone(self.run_store.get("run-1").started_at)
+            self.assertTrue(wait_for(lambda: self.job_queue.stats()["claimed"] + self.job_queue.stats()["queue_depth"] == 0))
+        finally:
+            worker.stop()
+            thread.join(timeout=15)
+
+    def test_shutdown_releases_running_and_queued_jobs(self):
+        worker = Worker(
+            self.job_queue,
+            self.run_store,
+            scheduler=WorkflowScheduler(event_loops=1, workers_per_loop=1),
+            worker_id="worker-1",
+            poll_interval=0.02,
+        )
+        events = []
+        self.enqueue("running")
+        self.enqueue("queued")
+        with mock.patch.object(QueuedWorkflowRunner, "_finish_cancelled", lambda runner, reason: events.append(runner.trace_id)):
+            thread = threading.Thread(target=worker.run)
+            thread.start()
+            self.assertTrue(wait_for(lambda: self.run_store.get("running").status == "running"))
+            # A job claimed but still waiting on the local scheduler
+            job = self.job_queue.claim("worker-1")
+            worker.scheduler.submit(self.runner(job))
+            worker.stop()
+            thread.join(timeout=15)
+
+        self.assertEqual(events, [])
+        self.assertEqual(self.run_store.get("running").status, "pending")
+        self.assertEqual(self.run_store.get("queued").status, "pending")
+        job_queue = SQLiteJobQueue(path=self.job_queue.path)
+        self.addCleanup(job_queue.close)
+        self.assertEqual(job_queue.stats()["claimed"], 0)
+        self.assertEqual(job_queue.stats()["queue_depth"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
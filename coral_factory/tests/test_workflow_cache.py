@@ -0,0 +1,50 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from factory import builder
+from factory.context import RunContext
+from factory.workflow_cache import CompiledWorkflow, CompiledWorkflowCache
+
+
+def compiled(config_hash: str) -> CompiledWorkflow:
+    return CompiledWorkflow(config_hash, agents={}, overview="", mcp_configs={}, build_timings={})
+
+
+class CompiledWorkflowCacheTest(unittest.TestCase):
+    def test_hits_and_misses(self):
+        cache = CompiledWorkflowCache()
+
+        async def main():
+            self.assertIsNone(cache.get("a"))
+            self.assertIsNone(cache.get("a", count=False))
+            cache.put(compiled("a"))
+            self.assertIsNotNone(cache.get("a"))
+            self.assertIsNotNone(cache.get("a", count=False))
+
+        asyncio.run(main())
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_builder_counts_one_lookup_per_build(self):
+        cache = CompiledWorkflowCache()
+
+        async def compile_workflow(json_config, config_hash, *args):
+            await asyncio.sleep(0.01)
+            return compiled(config_hash)
+
+        async def bind_workflow(workflow, run_context):
+            return {}
+
+        async def main():
+            await builder.builder({"objective": "test"}, RunContext("alice"))
+            await builder.builder({"objective": "test"}, RunContext("alice"))
+
+        with mock.patch.object(builder, "workflow_cache", cache), \
+                mock.patch.object(builder, "compile_workflow", compile_workflow), \
+                mock.patch.object(builder, "bind_workflow", bind_workflow):
+            asyncio.run(main())
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()